@@ -1,11 +1,19 @@
-from typing import Any
+import inspect
+from typing import Any, Callable, ClassVar
 
-from pydantic import BaseModel
+from pydantic import BaseModel, PrivateAttr
 
 
 class UserState(BaseModel):
     """User state model for Redis storage - shared across all Archie services"""
 
+    # Heavy sub-documents that storage keeps under separate keys and may load on demand
+    LAZY_FIELDS: ClassVar[tuple[str, ...]] = (
+        "smarthome_light",
+        "smarthome_climate",
+        "smarthome_dashboard",
+    )
+
     user_id: str
     user_name: str | None = None
     default_city: str | None = None
@@ -28,3 +36,39 @@ class UserState(BaseModel):
     smarthome_climate: dict[str, Any] | None = None
     smarthome_dashboard: dict[str, Any] | None = None
     spotify_device_id: str | None = None
+
+    _loader: Callable[[str], Any] | None = PrivateAttr(default=None)
+
+    def __getattribute__(self, name: str) -> Any:
+        # Plain access to an unloaded lazy field must not silently return None
+        if name in UserState.LAZY_FIELDS and self._loader is not None:
+            if name not in self.model_fields_set:
+                return self.get_lazy(name)
+        return super().__getattribute__(name)
+
+    def bind_loader(self, loader: Callable[[str], Any]) -> "UserState":
+        """
+        Attaches a loader for lazy fields that were not passed to the constructor
+
+        Attribute access then loads them through a sync loader, and raises
+        TypeError for a coroutine loader, which needs aget_lazy().
+        """
+        self._loader = loader
+        return self
+
+    def get_lazy(self, field: str) -> Any:
+        """Returns a lazy field, fetching it through the loader on first access"""
+        if self._loader is not None and field not in self.model_fields_set:
+            if inspect.iscoroutinefunction(self._loader):
+                raise TypeError(f"{field} has an async loader, use aget_lazy()")
+            setattr(self, field, self._loader(field))
+        return getattr(self, field)
+
+    async def aget_lazy(self, field: str) -> Any:
+        """Async get_lazy() for states bound to a coroutine loader"""
+        if self._loader is not None and field not in self.model_fields_set:
+            value = self._loader(field)
+            if inspect.isawaitable(value):
+                value = await value
+            setattr(self, field, value)
+        return getattr(self, field)
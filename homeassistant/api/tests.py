@@ -1,3 +1,682 @@
-from django.test import TestCase
+import asyncio
+import json
+import threading
+import time
+from datetime import datetime
+from unittest import skipIf
+from unittest.mock import patch
 
-# Create your tests here.
+from archie_shared.user.models import UserState
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from homeassistant import device_events
+from homeassistant import redis_client as redis_client_module
+from homeassistant.async_redis_client import AsyncRedisClient
+from homeassistant.device_events import DeviceEventLog
+from homeassistant.redis_client import (
+    CODEC_JSON,
+    CODEC_ZLIB,
+    RedisClient,
+    decode_value,
+    encode_fields,
+    get_connection_pool,
+)
+
+try:
+    import fakeredis
+    import lupa
+except ImportError:
+    fakeredis = None
+
+
+@skipIf(fakeredis is None, "fakeredis with lupa (Lua scripting) is not installed")
+class RedisClientHashStorageTest(SimpleTestCase):
+    def setUp(self):
+        self.redis = fakeredis.FakeRedis(decode_responses=True)
+        self.client = RedisClient(self.redis)
+        self.client.set_user_state(
+            "Niko",
+            UserState(
+                user_id="1",
+                user_name="Niko",
+                smarthome_dashboard={"type": "dashboard", "light": {"title": "Light"}},
+            ),
+        )
+
+    def test_state_is_stored_one_field_per_attribute(self):
+        key = "user_state:hash:Niko"
+
+        self.assertEqual(self.redis.type(key), "hash")
+        self.assertEqual(decode_value(self.redis.hget(key, "user_name")), "Niko")
+        self.assertIsNone(self.redis.hget(key, "smarthome_dashboard"))
+        self.assertEqual(
+            decode_value(self.redis.get("user_state:doc:Niko:smarthome_dashboard"))[
+                "type"
+            ],
+            "dashboard",
+        )
+        self.assertFalse(self.redis.exists("user_state:doc:Niko:smarthome_light"))
+
+    def test_lazy_state_fetches_sub_documents_on_demand(self):
+        with patch.object(
+            self.client, "get_user_fields", wraps=self.client.get_user_fields
+        ) as get_user_fields:
+            state = self.client.get_user_state_by_name("Niko", lazy=True)
+            self.assertEqual(state.user_name, "Niko")
+            self.assertEqual(get_user_fields.call_count, 0)
+
+            dashboard = state.smarthome_dashboard
+            state.get_lazy("smarthome_dashboard")
+            self.assertEqual(get_user_fields.call_count, 1)
+
+        self.assertEqual(dashboard["light"]["title"], "Light")
+        self.assertIsNone(state.get_lazy("smarthome_light"))
+        self.assertEqual(
+            self.client.get_user_state_by_name("Niko").smarthome_dashboard, dashboard
+        )
+
+    def test_sub_document_update_follows_hash_ttl(self):
+        self.redis.expire("user_state:hash:Niko", 100)
+
+        self.client.update_user_state(
+            "Niko", {"smarthome_light": {"devices": []}, "smarthome_dashboard": None}
+        )
+
+        self.assertGreater(self.redis.ttl("user_state:doc:Niko:smarthome_light"), 0)
+        self.assertFalse(self.redis.exists("user_state:doc:Niko:smarthome_dashboard"))
+        self.assertEqual(
+            self.client.get_user_fields("Niko", ["smarthome_light", "persona"]),
+            {"smarthome_light": {"devices": []}, "persona": None},
+        )
+
+    def test_sub_documents_stored_inline_are_read_and_moved_out(self):
+        key = "user_state:hash:Anna"
+        self.redis.hset(
+            key,
+            mapping=encode_fields({"user_id": "2", "smarthome_climate": {"t": 21}}),
+        )
+
+        self.assertEqual(
+            self.client.get_user_state_by_name("Anna").smarthome_climate, {"t": 21}
+        )
+        self.client.set_user_field("Anna", "smarthome_climate", {"t": 22})
+
+        self.assertIsNone(self.redis.hget(key, "smarthome_climate"))
+        self.assertEqual(
+            self.client.get_user_field("Anna", "smarthome_climate"), {"t": 22}
+        )
+
+    def test_delete_removes_sub_documents(self):
+        self.assertTrue(self.client.delete_user_state("Niko"))
+        self.assertEqual(self.redis.keys("user_state:*"), [])
+
+    def test_field_update_touches_only_that_field(self):
+        self.assertTrue(
+            self.client.set_user_field("Niko", "spotify_device_id", "device-1")
+        )
+
+        self.assertEqual(
+            self.client.get_user_field("Niko", "spotify_device_id"), "device-1"
+        )
+        state = self.client.get_user_state_by_name("Niko")
+        self.assertEqual(state.spotify_device_id, "device-1")
+        self.assertEqual(state.smarthome_dashboard["light"]["title"], "Light")
+
+    def test_update_validates_field_types(self):
+        self.assertFalse(
+            self.client.update_user_state("Niko", {"transport_preferences": 5})
+        )
+        self.assertFalse(self.client.update_user_state("Unknown", {"persona": "x"}))
+
+    def test_legacy_json_state_is_migrated(self):
+        self.redis.set(
+            "user_state:name:Anna",
+            UserState(user_id="2", persona="friendly").model_dump_json(),
+        )
+
+        self.assertEqual(self.client.get_user_field("Anna", "persona"), "friendly")
+        # Other Archie services still read the legacy key
+        self.assertTrue(self.redis.exists("user_state:name:Anna"))
+        self.assertEqual(self.client.get_user_state_by_name("Anna").user_id, "2")
+
+    def test_migrate_all_legacy_states(self):
+        for name in ("Anna", "Bob"):
+            self.redis.set(
+                f"user_state:name:{name}", UserState(user_id=name).model_dump_json()
+            )
+
+        self.assertEqual(self.client.migrate_legacy_states(), 2)
+        self.assertEqual(self.client.migrate_legacy_states(), 0)
+        # Niko's key is the legacy copy written on save
+        self.assertEqual(len(self.redis.keys("user_state:name:*")), 3)
+
+    def test_legacy_state_never_overwrites_hash(self):
+        self.redis.set(
+            "user_state:name:Niko",
+            UserState(user_id="1", persona="stale").model_dump_json(),
+        )
+
+        self.assertEqual(self.client.migrate_legacy_states(), 0)
+        self.assertNotEqual(self.client.get_user_field("Niko", "persona"), "stale")
+
+    @override_settings(REDIS_LEGACY_STATE_CLEANUP=True)
+    def test_legacy_cleanup_deletes_migrated_key(self):
+        self.redis.set("user_state:name:Anna", UserState(user_id="2").model_dump_json())
+
+        self.assertEqual(self.client.migrate_legacy_states(), 1)
+        self.assertFalse(self.redis.exists("user_state:name:Anna"))
+        self.client.delete_user_state("Niko")
+        self.client.set_user_state("Niko", UserState(user_id="1"))
+        self.assertEqual(self.redis.keys("user_state:name:*"), [])
+
+    def test_saves_keep_legacy_copy_current(self):
+        self.redis.set(
+            "user_state:name:Anna",
+            UserState(user_id="2", persona="friendly").model_dump_json(),
+        )
+        self.client.migrate_legacy_states()
+
+        self.client.set_user_field("Anna", "persona", "calm")
+        self.client.merge_user_states({"Anna": {"language": "de"}})
+        self.client.update_user_states({"Anna": {"spotify_device_id": "device-1"}})
+
+        legacy = UserState(**json.loads(self.redis.get("user_state:name:Anna")))
+        self.assertEqual(
+            (legacy.persona, legacy.language, legacy.spotify_device_id),
+            ("calm", "de", "device-1"),
+        )
+
+    def test_read_computes_current_datetime_without_writing(self):
+        key = "user_state:hash:Niko"
+        self.client.set_user_field("Niko", "current_date", "2000-01-01")
+        before = self.redis.hgetall(key)
+
+        state = self.client.get_user_state_by_name("Niko")
+
+        self.assertEqual(state.current_date, datetime.now().strftime("%Y-%m-%d"))
+        self.assertEqual(
+            self.client.get_user_field("Niko", "current_weekday"),
+            datetime.now().strftime("%A"),
+        )
+        self.assertEqual(self.redis.hgetall(key), before)
+
+    def test_update_does_not_create_missing_state(self):
+        self.assertFalse(self.client.update_user_state("Ghost", {"persona": "x"}))
+        self.assertFalse(self.redis.exists("user_state:hash:Ghost"))
+
+    def test_concurrent_writers_keep_each_others_fields(self):
+        updates = [
+            {"smarthome_light": {"devices": [i]}} if i % 2 else {"persona": f"p{i}"}
+            for i in range(20)
+        ]
+        threads = [
+            threading.Thread(target=self.client.update_user_state, args=("Niko", u))
+            for u in updates
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        state = self.client.get_user_state_by_name("Niko")
+        self.assertIsNotNone(state.smarthome_light)
+        self.assertIsNotNone(state.persona)
+        self.assertEqual(state.smarthome_dashboard["type"], "dashboard")
+
+    def test_batched_update_of_several_users(self):
+        self.client.set_user_state("Anna", UserState(user_id="2"))
+
+        results = self.client.update_user_states(
+            {"Niko": {"persona": "calm"}, "Anna": {"language": "de"}, "Ghost": {}}
+        )
+
+        self.assertEqual(results, {"Niko": True, "Anna": True, "Ghost": False})
+        self.assertEqual(self.client.get_user_field("Anna", "language"), "de")
+
+
+class UserStateCodecTest(SimpleTestCase):
+    @override_settings(REDIS_COMPRESS_MIN_SIZE=256)
+    def test_large_fields_are_compressed_and_small_ones_are_not(self):
+        dashboard = {
+            "devices": [{"name": f"Лампа {i}", "is_on": True} for i in range(50)]
+        }
+
+        fields = encode_fields({"persona": "calm", "smarthome_dashboard": dashboard})
+
+        self.assertTrue(fields["persona"].startswith(CODEC_JSON))
+        self.assertTrue(fields["smarthome_dashboard"].startswith(CODEC_ZLIB))
+        self.assertLess(len(fields["smarthome_dashboard"]), len(json.dumps(dashboard)))
+        self.assertEqual(decode_value(fields["smarthome_dashboard"]), dashboard)
+
+    def test_values_written_before_the_codec_are_decoded(self):
+        self.assertEqual(decode_value('{"type": "dashboard"}'), {"type": "dashboard"})
+        self.assertIsNone(decode_value("null"))
+
+
+class RedisConnectionPoolTest(SimpleTestCase):
+    def setUp(self):
+        redis_client_module._connection_pool = None
+
+    def tearDown(self):
+        redis_client_module._connection_pool = None
+
+    @override_settings(REDIS_MAX_CONNECTIONS=7, REDIS_SOCKET_TIMEOUT=1.5)
+    def test_clients_share_one_configured_pool(self):
+        first, second = RedisClient(), RedisClient()
+
+        pool = first.redis_client.connection_pool
+        self.assertIs(pool, second.redis_client.connection_pool)
+        self.assertIs(pool, get_connection_pool())
+        self.assertEqual(pool.max_connections, 7)
+        self.assertEqual(pool.connection_kwargs["socket_timeout"], 1.5)
+
+
+@skipIf(fakeredis is None, "fakeredis with lupa (Lua scripting) is not installed")
+class RedisClientNearCacheTest(SimpleTestCase):
+    def setUp(self):
+        self.redis = fakeredis.FakeRedis(decode_responses=True)
+        self.client = RedisClient(self.redis, cache_size=2)
+        self.client.set_user_state("Niko", UserState(user_id="1", persona="calm"))
+        self.client.get_user_state_by_name("Niko")
+        self.wait_for(lambda: self.client.near_cache.active)
+
+    def wait_for(self, condition):
+        deadline = time.monotonic() + 3
+        while not condition() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertTrue(condition())
+
+    def test_hot_reads_are_served_from_memory(self):
+        self.client.get_user_state_by_name("Niko")
+
+        with patch.object(self.redis, "hgetall") as hgetall:
+            state = self.client.get_user_state_by_name("Niko")
+            persona = self.client.get_user_field("Niko", "persona")
+
+        hgetall.assert_not_called()
+        self.assertEqual(state.persona, "calm")
+        self.assertEqual(persona, "calm")
+
+    def test_write_from_another_process_invalidates_entry(self):
+        self.client.get_user_state_by_name("Niko")
+        other_process = RedisClient(self.redis)
+
+        other_process.set_user_field("Niko", "persona", "cheerful")
+
+        self.wait_for(
+            lambda: self.client.get_user_field("Niko", "persona") == "cheerful"
+        )
+
+    def test_sub_document_write_invalidates_entry(self):
+        self.client.get_user_state_by_name("Niko")
+
+        self.redis.set(
+            "user_state:doc:Niko:smarthome_light",
+            encode_fields({"smarthome_light": {"devices": [1]}})["smarthome_light"],
+        )
+
+        self.wait_for(
+            lambda: self.client.get_user_state_by_name("Niko").smarthome_light
+            == {"devices": [1]}
+        )
+
+    def test_cache_is_bounded(self):
+        for name in ("Anna", "Bob"):
+            self.client.set_user_state(name, UserState(user_id=name))
+            self.client.get_user_state_by_name(name)
+        self.client.get_user_state_by_name("Niko")
+
+        self.assertLessEqual(len(self.client.near_cache._entries), 2)
+
+
+@skipIf(fakeredis is None, "fakeredis with lupa (Lua scripting) is not installed")
+class AsyncRedisClientTest(SimpleTestCase):
+    def setUp(self):
+        self.server = fakeredis.FakeServer()
+        self.redis = fakeredis.FakeAsyncRedis(server=self.server, decode_responses=True)
+        self.client = AsyncRedisClient(self.redis)
+
+    def run_async(self, coroutine):
+        return asyncio.run(coroutine)
+
+    def test_state_round_trip_and_field_update(self):
+        async def scenario():
+            await self.client.set_user_state(
+                "Niko", UserState(user_id="1", smarthome_dashboard={"type": "x"})
+            )
+            updated = await self.client.update_user_state(
+                "Niko", {"spotify_device_id": "device-1", "persona": "calm"}
+            )
+            state, device_id, raw = await asyncio.gather(
+                self.client.get_user_state_by_name("Niko"),
+                self.client.get_user_field("Niko", "spotify_device_id"),
+                self.redis.hget("user_state:hash:Niko", "persona"),
+            )
+            return updated, state, device_id, raw
+
+        updated, state, device_id, raw = self.run_async(scenario())
+
+        self.assertTrue(updated)
+        self.assertEqual(state.smarthome_dashboard, {"type": "x"})
+        self.assertTrue(
+            self.run_async(self.redis.exists("user_state:doc:Niko:smarthome_dashboard"))
+        )
+        self.assertEqual(state.current_date, datetime.now().strftime("%Y-%m-%d"))
+        self.assertEqual(device_id, "device-1")
+        self.assertEqual(decode_value(raw), "calm")
+
+    def test_missing_state_is_not_created(self):
+        async def scenario():
+            updated = await self.client.update_user_state("Ghost", {"persona": "x"})
+            return updated, await self.redis.exists("user_state:hash:Ghost")
+
+        self.assertEqual(self.run_async(scenario()), (False, 0))
+
+    def test_reads_state_written_by_sync_client(self):
+        sync_redis = fakeredis.FakeRedis(server=self.server, decode_responses=True)
+        RedisClient(sync_redis).set_user_state(
+            "Niko", UserState(user_id="1", language="de")
+        )
+
+        batch = self.run_async(
+            self.client.update_user_states(
+                {"Niko": {"persona": "calm"}, "Ghost": {"persona": "x"}}
+            )
+        )
+
+        self.assertEqual(batch, {"Niko": True, "Ghost": False})
+        self.assertEqual(
+            self.run_async(
+                self.client.get_user_fields("Niko", ["language", "persona"])
+            ),
+            {"language": "de", "persona": "calm"},
+        )
+
+    def test_lazy_state_loads_sub_documents_on_demand(self):
+        async def scenario():
+            await self.client.set_user_state(
+                "Niko", UserState(user_id="1", smarthome_dashboard={"type": "x"})
+            )
+            state = await self.client.get_user_state_by_name("Niko", lazy=True)
+            return state, await state.aget_lazy("smarthome_dashboard")
+
+        state, dashboard = self.run_async(scenario())
+
+        self.assertEqual(dashboard, {"type": "x"})
+        with self.assertRaises(TypeError):
+            state.smarthome_light
+
+    def test_merge_and_legacy_migration_match_sync_client(self):
+        async def scenario():
+            await self.redis.set(
+                "user_state:name:Anna", UserState(user_id="2").model_dump_json()
+            )
+            migrated = await self.client.migrate_legacy_states()
+            merged = await self.client.merge_user_states(
+                {"Anna": {"persona": "calm"}, "Bob": {"user_id": "3"}}
+            )
+            async with self.client.pipeline(transaction=False) as pipe:
+                pipe.hget("user_state:hash:Anna", "user_id")
+                pipe.exists("user_state:hash:Bob")
+                keys = await pipe.execute()
+            return (
+                migrated,
+                merged,
+                keys,
+                await self.client.get_user_field("Anna", "persona"),
+            )
+
+        migrated, merged, keys, persona = self.run_async(scenario())
+
+        self.assertEqual((migrated, merged, persona), (1, True, "calm"))
+        self.assertEqual((decode_value(keys[0]), keys[1]), ("2", 1))
+
+    def test_one_client_per_loop_and_closed_loops_are_dropped(self):
+        client = AsyncRedisClient()
+        created = []
+
+        def factory():
+            created.append(fakeredis.FakeAsyncRedis(server=self.server))
+            return created[-1]
+
+        async def touch():
+            return client.redis_client is client.redis_client
+
+        with patch.object(client, "_client_factory", side_effect=factory):
+            self.assertTrue(self.run_async(touch()))
+            self.run_async(touch())
+
+        self.assertEqual(len(created), 2)
+        self.assertEqual(len(client._clients), 1)
+
+
+@skipIf(fakeredis is None, "fakeredis with lupa (Lua scripting) is not installed")
+class DeviceEventLogTest(SimpleTestCase):
+    def setUp(self):
+        self.redis = fakeredis.FakeRedis(decode_responses=True)
+        self.log = DeviceEventLog(self.redis)
+        self.log.append("light", {"l1": {"is_on": True}, "l2": {"is_on": False}})
+
+    def test_only_changes_are_appended_and_folded_into_snapshot(self):
+        cursor = self.log.last_id("light")
+
+        ids = self.log.append("light", {"l1": {"is_on": True}, "l2": {"is_on": True}})
+
+        self.assertEqual(len(ids), 1)
+        self.assertEqual(self.redis.xlen("device_events:light"), 3)
+        self.assertEqual(
+            self.log.snapshot("light"), {"l1": {"is_on": True}, "l2": {"is_on": True}}
+        )
+        self.assertEqual(
+            [(e["device"], e["state"]) for e in self.log.read_since("light", cursor)],
+            [("l2", {"is_on": True})],
+        )
+
+    def test_stream_length_is_capped(self):
+        with override_settings(DEVICE_EVENTS_MAXLEN=10):
+            for i in range(300):
+                self.log.append("climate", {"c1": {"temperature": i}})
+
+        self.assertLess(self.redis.xlen("device_events:climate"), 300)
+        self.assertEqual(self.log.snapshot("climate"), {"c1": {"temperature": 299}})
+
+    def test_vanished_device_is_removed_from_snapshot(self):
+        cursor = self.log.last_id("light")
+
+        self.log.append("light", {"l1": {"is_on": True}})
+
+        self.assertEqual(self.log.snapshot("light"), {"l1": {"is_on": True}})
+        self.assertEqual(
+            [(e["device"], e["state"]) for e in self.log.read_since("light", cursor)],
+            [("l2", None)],
+        )
+        self.redis.delete("device_state:light")
+        self.assertEqual(self.log.rebuild_snapshot("light"), {"l1": {"is_on": True}})
+
+    def test_snapshot_is_rebuilt_from_stream(self):
+        self.redis.delete("device_state:light")
+
+        self.assertEqual(
+            self.log.rebuild_snapshot("light"),
+            {"l1": {"is_on": True}, "l2": {"is_on": False}},
+        )
+
+    def test_consumer_group_reads_each_change_once(self):
+        self.log.ensure_group("light", "analytics", start="0")
+
+        first = self.log.read_group("light", "analytics", "worker-1")
+        again = self.log.read_group("light", "analytics", "worker-1")
+        pending = self.log.read_pending("light", "analytics", "worker-1")
+        acked = self.log.ack("light", "analytics", [e["id"] for e in first])
+
+        self.assertEqual([e["device"] for e in first], ["l1", "l2"])
+        self.assertEqual(again, [])
+        self.assertEqual(len(pending), 2)
+        self.assertEqual(acked, 2)
+        self.assertEqual(self.log.read_pending("light", "analytics", "worker-1"), [])
+
+    def test_state_service_saves_aggregate_derived_from_snapshot(self):
+        from homeassistant.light.services import LightStateService
+
+        client = RedisClient(self.redis)
+        client.set_user_state("Niko", UserState(user_id="1"))
+        self.redis.delete("device_state:light", "device_events:light")
+
+        with patch("homeassistant.device_events.device_event_log", self.log), patch(
+            "homeassistant.redis_client.redis_client", client
+        ):
+            self.assertEqual(LightStateService().save_to_redis(["Niko"]), 3)
+            self.assertEqual(LightStateService().save_to_redis(["Niko"]), 0)
+
+        light = client.get_user_field("Niko", "smarthome_light")
+        self.assertEqual((light["on_count"], light["total_count"]), (2, 3))
+        self.assertEqual(self.redis.xlen("device_events:light"), 3)
+
+    def test_unchanged_aggregate_is_not_written_again(self):
+        client = RedisClient(self.redis)
+        for name in ("Niko", "Anna"):
+            client.set_user_state(name, UserState(user_id=name))
+        publisher = device_events.AggregatePublisher("light", "smarthome_light")
+
+        with patch.object(device_events, "device_event_log", self.log), patch(
+            "homeassistant.redis_client.redis_client", client
+        ), patch.object(
+            client, "update_user_states", wraps=client.update_user_states
+        ) as update:
+            versions = [
+                publisher.publish({"on_count": 1}, ["Niko"]),
+                publisher.publish({"on_count": 1}, ["Niko"]),
+                publisher.publish({"on_count": 1}, ["Niko", "Anna"]),
+                publisher.publish({"on_count": 2}, ["Niko", "Anna"]),
+            ]
+
+        self.assertEqual(versions, [1, None, 2, 3])
+        self.assertEqual(update.call_count, 3)
+        self.assertEqual(
+            self.log.get_versions("light", "climate"), {"light": 3, "climate": 0}
+        )
+        self.assertEqual(
+            client.get_user_field("Anna", "smarthome_light"),
+            {"on_count": 2, "version": 3},
+        )
+
+    def test_failed_write_is_retried_on_next_poll(self):
+        client = RedisClient(self.redis)
+        publisher = device_events.AggregatePublisher("light", "smarthome_light")
+
+        with patch.object(device_events, "device_event_log", self.log), patch(
+            "homeassistant.redis_client.redis_client", client
+        ):
+            first = publisher.publish({"on_count": 1}, ["Ghost"])
+            second = publisher.publish({"on_count": 1}, ["Ghost"])
+
+        self.assertEqual((first, second), (1, 2))
+
+    def test_published_aggregate_is_announced_to_dashboard_streams(self):
+        client = RedisClient(self.redis)
+        client.set_user_state("Niko", UserState(user_id="1"))
+        publisher = device_events.AggregatePublisher("climate", "smarthome_climate")
+        pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(device_events.UPDATES_CHANNEL)
+
+        with patch.object(device_events, "device_event_log", self.log), patch(
+            "homeassistant.redis_client.redis_client", client
+        ):
+            publisher.publish({"average_temp": 21.5}, ["Niko"])
+            publisher.publish({"average_temp": 21.5}, ["Niko"])
+
+        messages = [pubsub.get_message(timeout=0.05) for _ in range(3)]
+        self.assertEqual(
+            [json.loads(m["data"]) for m in messages if m],
+            [{"class": "climate", "version": 1}],
+        )
+
+    def test_activity_heartbeat_publishes_only_when_it_starts(self):
+        pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(device_events.ACTIVITY_CHANNEL)
+
+        with patch.object(
+            device_events, "activity_tracker", device_events.ActivityTracker(self.redis)
+        ):
+            device_events.mark_activity()
+            # A second process has its own debounce window
+            device_events.ActivityTracker(self.redis).mark()
+            device_events.mark_activity()
+            active = device_events.is_active()
+
+        messages = [pubsub.get_message(timeout=0.05) for _ in range(4)]
+        self.assertTrue(active)
+        self.assertGreater(self.redis.ttl(device_events.ACTIVITY_KEY), 0)
+        self.assertEqual(len([m for m in messages if m]), 1)
+
+    def test_command_wakeups_are_debounced(self):
+        pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+        pubsub.subscribe(device_events.ACTIVITY_CHANNEL)
+
+        with patch.object(
+            device_events, "activity_tracker", device_events.ActivityTracker(self.redis)
+        ):
+            device_events.mark_activity()
+            # A slider drag: only the first command of the burst wakes the pollers
+            for _ in range(20):
+                device_events.mark_activity(command=True)
+
+        messages = [pubsub.get_message(timeout=0.05) for _ in range(4)]
+        self.assertEqual([m["data"] for m in messages if m], ["active", "command"])
+
+
+@skipIf(fakeredis is None, "fakeredis with lupa (Lua scripting) is not installed")
+class UserProfileSyncTest(TestCase):
+    def setUp(self):
+        self.redis = fakeredis.FakeRedis(decode_responses=True)
+        self.client = RedisClient(self.redis)
+        patcher = patch("homeassistant.redis_client.redis_client", self.client)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def create_profile(self, username, **fields):
+        from homeassistant.webapp.models import UserProfile
+
+        user = User.objects.create(username=username)
+        return UserProfile.objects.create(user=user, **fields)
+
+    def test_profile_save_keeps_device_and_dashboard_state(self):
+        profile = self.create_profile("niko", persona="bro")
+        key = profile.state_name
+        self.client.update_user_state(key, {"smarthome_dashboard": {"type": "x"}})
+
+        profile.persona = "butler"
+        profile.save()
+
+        state = self.client.get_user_state_by_name(key)
+        self.assertEqual(state.persona, "butler")
+        self.assertEqual(state.smarthome_dashboard, {"type": "x"})
+
+    @override_settings(REDIS_LEGACY_STATE_CLEANUP=True)
+    def test_bulk_sync_merges_all_profiles_in_batches(self):
+        from homeassistant.webapp.management.commands.sync_user_profiles import (
+            sync_user_profiles,
+        )
+
+        profiles = [self.create_profile(f"user{i}") for i in range(5)]
+        first = profiles[0].state_name
+        self.client.update_user_state(first, {"spotify_device_id": "device-1"})
+        self.redis.hset(
+            f"user_state:hash:{first}", mapping=encode_fields({"language": "de"})
+        )
+
+        with patch.object(
+            self.redis, "pipeline", wraps=self.redis.pipeline
+        ) as pipeline:
+            synced = sync_user_profiles(batch_size=2)
+
+        self.assertEqual(synced, 5)
+        self.assertEqual(pipeline.call_count, 3)
+        self.assertEqual(
+            self.client.get_user_fields(first, ["language", "spotify_device_id"]),
+            {"language": "en", "spotify_device_id": "device-1"},
+        )
+        self.assertEqual(
+            self.client.get_user_field(profiles[4].state_name, "user_name"), "user4"
+        )
@@ -1,8 +1,13 @@
 from django.urls import path
 
-from .views import ChatView, UserStateView
+from .views import ChatView, DeviceEventsView, UserStateView
 
 urlpatterns = [
     path("chat", ChatView.as_view(), name="chat"),
     path("user/state/", UserStateView.as_view(), name="user-state"),
+    path(
+        "devices/<str:device_class>/events/",
+        DeviceEventsView.as_view(),
+        name="device-events",
+    ),
 ]
@@ -6,7 +6,8 @@ from django.utils.decorators import method_decorator
 from django.views import View
 from django.views.decorators.csrf import csrf_exempt
 
-from homeassistant.redis_client import RedisClient
+from homeassistant.device_events import device_event_log
+from homeassistant.redis_client import redis_client
 
 logger = logging.getLogger(__name__)
 
@@ -24,14 +25,17 @@ class UserStateView(View):
     """API endpoint for user state management"""
 
     def get(self, request):
-        """Get user state by user_name query parameter"""
+        """Get user state by user_name query parameter, ?lazy=1 leaves out smarthome_*"""
         user_name = request.GET.get("user_name")
         if not user_name:
             return JsonResponse({"error": "user_name is required"}, status=400)
 
         try:
-            redis_client = RedisClient()
-            state = redis_client.get_user_state_by_name(user_name)
+            lazy = request.GET.get("lazy") == "1"
+            state = redis_client.get_user_state_by_name(user_name, lazy=lazy)
+            if state and lazy:
+                unloaded = set(state.LAZY_FIELDS) - state.model_fields_set
+                return JsonResponse(state.model_dump(exclude=unloaded))
             if state:
                 return JsonResponse(state.model_dump())
             return JsonResponse({"error": "User state not found"}, status=404)
@@ -50,7 +54,6 @@ class UserStateView(View):
             # Remove user_name from updates
             updates = {k: v for k, v in data.items() if k != "user_name"}
 
-            redis_client = RedisClient()
             success = redis_client.update_user_state(user_name, updates)
 
             if success:
@@ -61,3 +64,65 @@ class UserStateView(View):
         except Exception as e:
             logger.error(f"api_views_002: Error updating user state: {e}")
             return JsonResponse({"error": str(e)}, status=500)
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class DeviceEventsView(View):
+    """Device state event log: snapshot, changes after a cursor or consumer group reads"""
+
+    DEVICE_CLASSES = ("light", "climate")
+
+    def get(self, request, device_class):
+        """
+        Without parameters returns the snapshot and a cursor, ?since=<cursor>
+        returns the changes after it, ?group=&consumer= reads through a consumer group
+        """
+        if device_class not in self.DEVICE_CLASSES:
+            return JsonResponse({"error": "Unknown device class"}, status=404)
+
+        try:
+            count = int(request.GET.get("count", 100))
+            group = request.GET.get("group")
+            if group:
+                consumer = request.GET.get("consumer", group)
+                if request.GET.get("pending") == "1":
+                    events = device_event_log.read_pending(
+                        device_class, group, consumer, count
+                    )
+                else:
+                    events = device_event_log.read_group(
+                        device_class, group, consumer, count
+                    )
+                return JsonResponse({"events": events})
+
+            since = request.GET.get("since")
+            if since:
+                events = device_event_log.read_since(device_class, since, count)
+                cursor = events[-1]["id"] if events else since
+                return JsonResponse({"events": events, "cursor": cursor})
+
+            # Cursor first: an event landing in between is replayed, never lost
+            cursor = device_event_log.last_id(device_class)
+            snapshot = device_event_log.snapshot(device_class)
+            return JsonResponse({"snapshot": snapshot, "cursor": cursor})
+        except ValueError as e:
+            return JsonResponse({"error": str(e)}, status=400)
+        except Exception as e:
+            logger.error(f"api_views_003: Error reading {device_class} events: {e}")
+            return JsonResponse({"error": str(e)}, status=500)
+
+    def post(self, request, device_class):
+        """Acknowledge processed events of a consumer group"""
+        try:
+            data = json.loads(request.body)
+            group = data.get("group")
+            if not group:
+                return JsonResponse({"error": "group is required"}, status=400)
+
+            acked = device_event_log.ack(device_class, group, data.get("ids", []))
+            return JsonResponse({"acked": acked})
+        except json.JSONDecodeError:
+            return JsonResponse({"error": "Invalid JSON"}, status=400)
+        except Exception as e:
+            logger.error(f"api_views_004: Error acking {device_class} events: {e}")
+            return JsonResponse({"error": str(e)}, status=500)
@@ -0,0 +1,315 @@
+import asyncio
+import functools
+import json
+import logging
+from typing import Any
+
+import redis.asyncio as aioredis
+from archie_shared.user.models import UserState
+from django.conf import settings
+
+from homeassistant.redis_client import (
+    FIELD_ADAPTERS,
+    UPDATE_FIELDS_SCRIPT,
+    UserStateStorage,
+    current_datetime_fields,
+    decode_field,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncRedisClient(UserStateStorage):
+    """asyncio Redis client for user state, same API and storage layout as RedisClient"""
+
+    def __init__(self, client: aioredis.Redis | None = None):
+        self._injected_client = client
+        # Under WSGI every async view gets its own loop, connections are bound to it
+        self._clients: dict[asyncio.AbstractEventLoop, tuple] = {}
+
+    def _bind(self) -> tuple:
+        """Client and update script of the running event loop, created once per loop"""
+        loop = asyncio.get_running_loop()
+        bound = self._clients.get(loop)
+        if bound is None:
+            # Finished loops' connections are dead, dropping the clients closes their sockets
+            for closed in [old for old in self._clients if old.is_closed()]:
+                del self._clients[closed]
+            client = self._injected_client or self._client_factory()
+            bound = (client, client.register_script(UPDATE_FIELDS_SCRIPT))
+            self._clients[loop] = bound
+        return bound
+
+    @property
+    def redis_client(self) -> aioredis.Redis:
+        """Client bound to the running event loop"""
+        return self._bind()[0]
+
+    @property
+    def _update_fields(self):
+        return self._bind()[1]
+
+    async def aclose(self):
+        """Closes the running loop's connections, call before the loop ends"""
+        client, _ = self._clients.pop(asyncio.get_running_loop(), (None, None))
+        if client is not None and client is not self._injected_client:
+            await client.aclose()
+
+    def _client_factory(self) -> aioredis.Redis:
+        return aioredis.Redis(
+            host=settings.REDIS_HOST,
+            port=settings.REDIS_PORT,
+            db=settings.REDIS_DB,
+            decode_responses=True,
+            max_connections=settings.REDIS_MAX_CONNECTIONS,
+            socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+            socket_connect_timeout=settings.REDIS_SOCKET_CONNECT_TIMEOUT,
+            retry_on_timeout=settings.REDIS_RETRY_ON_TIMEOUT,
+            health_check_interval=settings.REDIS_HEALTH_CHECK_INTERVAL,
+        )
+
+    async def _mirror_legacy_states(self, user_names: list[str]):
+        """Refreshes the legacy JSON copies, see RedisClient._mirror_legacy_states"""
+        if settings.REDIS_LEGACY_STATE_CLEANUP or not user_names:
+            return
+        try:
+            async with self.pipeline(transaction=False) as pipe:
+                self._mirror_request(pipe, user_names)
+                responses = await pipe.execute()
+            async with self.pipeline(transaction=False) as pipe:
+                self._mirror_write(pipe, user_names, responses)
+                await pipe.execute()
+        except Exception as e:
+            logger.error(
+                f"async_redis_client_011: Error mirroring legacy states of {user_names}: {e}"
+            )
+
+    async def migrate_legacy_state(self, user_name: str) -> dict[str, Any] | None:
+        """Copies a legacy JSON user state into the hash, see RedisClient.migrate_legacy_state"""
+        client = self.redis_client
+        legacy_key = self._get_legacy_key_by_name(user_name)
+        async with client.pipeline(transaction=False) as pipe:
+            self._legacy_request(pipe, user_name)
+            data, ttl, migrated = await pipe.execute()
+        if not data or migrated:
+            return None
+
+        state = UserState(**json.loads(data))
+        async with client.pipeline() as pipe:
+            self._write_state(pipe, user_name, state, ttl if ttl > 0 else None)
+            if settings.REDIS_LEGACY_STATE_CLEANUP:
+                pipe.delete(legacy_key)
+            await pipe.execute()
+
+        logger.info(
+            f"async_redis_client_001: Migrated legacy user state of {user_name} to hash"
+        )
+        return state.model_dump()
+
+    async def migrate_legacy_states(self) -> int:
+        """Migrates all legacy JSON user states that have no hash yet"""
+        prefix = self._get_legacy_key_by_name("")
+        user_names = [
+            key[len(prefix) :]
+            async for key in self.redis_client.scan_iter(match=f"{prefix}*")
+        ]
+        if not user_names:
+            return 0
+        async with self.pipeline(transaction=False) as pipe:
+            for user_name in user_names:
+                pipe.exists(self._get_user_key_by_name(user_name))
+            exists = await pipe.execute()
+        migrated = 0
+        for user_name, has_hash in zip(user_names, exists):
+            if not has_hash and await self.migrate_legacy_state(user_name):
+                migrated += 1
+        return migrated
+
+    async def get_user_state_by_name(
+        self, user_name: str, lazy: bool = False
+    ) -> UserState | None:
+        """
+        Gets user state from Redis by username with current datetime, never writes
+
+        With lazy=True the UserState.LAZY_FIELDS sub-documents are left out,
+        await state.aget_lazy() fetches them.
+        """
+        try:
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                self._state_request(pipe, user_name, lazy)
+                state_dict = self._state_response(await pipe.execute())
+            if not state_dict:
+                state_dict = await self.migrate_legacy_state(user_name)
+                lazy = False
+
+            if not state_dict:
+                return None
+            state_dict.update(current_datetime_fields())
+            state = UserState(**state_dict)
+            if lazy:
+                state.bind_loader(functools.partial(self.get_user_field, user_name))
+            return state
+
+        except Exception as e:
+            logger.error(
+                f"async_redis_client_002: Error getting user state by name {user_name}: {e}"
+            )
+            return None
+
+    async def set_user_state(
+        self, user_name: str, state: UserState, ttl: int | None = None
+    ) -> bool:
+        """Saves user state to Redis"""
+        try:
+            async with self.pipeline() as pipe:
+                self._write_state(pipe, user_name, state, ttl)
+                await pipe.execute()
+            return True
+
+        except Exception as e:
+            logger.error(
+                f"async_redis_client_003: Error saving user state {user_name}: {e}"
+            )
+            return False
+
+    async def merge_user_states(
+        self, fields_by_user: dict[str, dict[str, Any]], ttl: int | None = None
+    ) -> bool:
+        """Writes the given fields into several users' states, see RedisClient.merge_user_states"""
+        try:
+            async with self.pipeline(transaction=False) as pipe:
+                for user_name, fields in fields_by_user.items():
+                    self._write_fields(pipe, user_name, fields, ttl)
+                await pipe.execute()
+            await self._mirror_legacy_states(list(fields_by_user))
+            return True
+
+        except Exception as e:
+            logger.error(
+                f"async_redis_client_010: Error merging {len(fields_by_user)} user states: {e}"
+            )
+            return False
+
+    def pipeline(self, transaction: bool = True) -> aioredis.client.Pipeline:
+        """Pipeline on the running loop's pool for batching commands into one round trip"""
+        return self.redis_client.pipeline(transaction=transaction)
+
+    async def update_user_state(
+        self, user_name: str, updates: dict[str, Any], ttl: int | None = None
+    ) -> bool:
+        """Atomically updates the given fields of an existing user state"""
+        try:
+            client = self.redis_client
+            keys, args = self._update_args(user_name, updates, ttl)
+
+            if await self._update_fields(keys=keys, args=args, client=client) or (
+                await self.migrate_legacy_state(user_name)
+                and await self._update_fields(keys=keys, args=args, client=client)
+            ):
+                await self._mirror_legacy_states([user_name])
+                return True
+
+            logger.error(
+                f"async_redis_client_004: User state not found for {user_name}"
+            )
+            return False
+
+        except Exception as e:
+            logger.error(
+                f"async_redis_client_005: Error updating user state {user_name}: {e}"
+            )
+            return False
+
+    async def update_user_states(
+        self, updates_by_user: dict[str, dict[str, Any]], ttl: int | None = None
+    ) -> dict[str, bool]:
+        """Atomically updates several users' states in one pipelined round trip"""
+        try:
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                for user_name, updates in updates_by_user.items():
+                    keys, args = self._update_args(user_name, updates, ttl)
+                    await self._update_fields(keys=keys, args=args, client=pipe)
+                results = await pipe.execute()
+            saved = {
+                user_name: bool(result)
+                for user_name, result in zip(updates_by_user, results)
+            }
+            await self._mirror_legacy_states([name for name, ok in saved.items() if ok])
+            return saved
+
+        except Exception as e:
+            logger.error(f"async_redis_client_006: Error updating user states: {e}")
+            return {user_name: False for user_name in updates_by_user}
+
+    async def delete_user_state(self, user_name: str) -> bool:
+        """Deletes user state from Redis"""
+        try:
+            result = await self.redis_client.delete(
+                *self._get_state_keys(user_name),
+                self._get_legacy_key_by_name(user_name),
+            )
+            return result > 0
+
+        except Exception as e:
+            logger.error(
+                f"async_redis_client_007: Error deleting user state {user_name}: {e}"
+            )
+            return False
+
+    async def get_user_fields(
+        self, user_name: str, fields: list[str]
+    ) -> dict[str, Any]:
+        """Gets several fields from user state: HMGET plus MGET of sub-documents, one round trip"""
+        fields = [field for field in fields if field in FIELD_ADAPTERS]
+        if not fields:
+            return {}
+        try:
+            async with self.redis_client.pipeline(transaction=False) as pipe:
+                docs = self._fields_request(pipe, user_name, fields)
+                values = self._fields_response(fields, docs, await pipe.execute())
+            if values is None:
+                state_dict = await self.migrate_legacy_state(user_name)
+                if state_dict is None:
+                    return {}
+                result = {field: state_dict.get(field) for field in fields}
+            else:
+                result = {
+                    field: decode_field(field, value) for field, value in values.items()
+                }
+            current = current_datetime_fields()
+            result.update(
+                {field: current[field] for field in fields if field in current}
+            )
+            return result
+
+        except Exception as e:
+            logger.error(
+                f"async_redis_client_008: Error getting fields {fields} of {user_name}: {e}"
+            )
+            return {}
+
+    async def get_user_field(self, user_name: str, field: str) -> Any | None:
+        """Gets specific field from user state"""
+        return (await self.get_user_fields(user_name, [field])).get(field)
+
+    async def set_user_field(
+        self, user_name: str, field: str, value: Any, ttl: int | None = None
+    ) -> bool:
+        """Sets specific field in user state"""
+        return await self.update_user_state(user_name, {field: value}, ttl)
+
+    async def update_current_datetime(self, user_name: str) -> bool:
+        """Stores current date and time for user, reads compute them anyway"""
+        return await self.update_user_state(user_name, current_datetime_fields())
+
+    async def ping(self) -> bool:
+        """Check Redis connection"""
+        try:
+            return await self.redis_client.ping()
+        except Exception as e:
+            logger.error(f"async_redis_client_009: Redis connection error: {e}")
+            return False
+
+
+# Global async client instance
+async_redis_client = AsyncRedisClient()
@@ -11,6 +11,9 @@ class ClimateDeviceState(BaseModel):
         description="Icon style: 'solid' for active, 'outline' for inactive"
     )
     tooltip: str = Field(description="Device status details for display")
+    temperature: float | None = Field(
+        default=None, description="Measured temperature in °C"
+    )
 
 
 class ClimateStateAggregate(BaseModel):
@@ -20,3 +23,6 @@ class ClimateStateAggregate(BaseModel):
     devices: list[ClimateDeviceState] = Field(
         description="List of individual device states"
     )
+    version: int = Field(
+        default=0, description="Monotonic version, bumped on every published change"
+    )
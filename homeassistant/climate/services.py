@@ -8,20 +8,26 @@ logger = logging.getLogger(__name__)
 class ClimateStateService:
     """Service for retrieving aggregated climate device states"""
 
-    def get_all_devices_state(self):
+    def __init__(self):
+        from homeassistant.device_events import AggregatePublisher
+
+        self.publisher = AggregatePublisher("climate", "smarthome_climate")
+
+    def get_devices(self):
         """
-        Get current state of all climate devices
+        Get current state of every climate device
         TODO: Replace with real device polling
         """
         logger.info("climate_services_001: Fetching climate devices state (mock data)")
 
-        devices = [
+        return [
             ClimateDeviceState(
                 name="Гостиная",
                 icon="thermometer",
                 color="green",
                 variant="solid",
                 tooltip="22.1°C",
+                temperature=22.1,
             ),
             ClimateDeviceState(
                 name="Спальня",
@@ -29,28 +35,44 @@ class ClimateStateService:
                 color="blue",
                 variant="outline",
                 tooltip="21.5°C",
+                temperature=21.5,
             ),
         ]
 
-        temps = [22.1, 21.5]
-        average = sum(temps) / len(temps)
+    def build_aggregate(self, devices):
+        """Climate aggregate for the given device states"""
+        temps = [d.temperature for d in devices if d.temperature is not None]
+        average = sum(temps) / len(temps) if temps else 0
 
         return ClimateStateAggregate(average_temp=round(average, 1), devices=devices)
 
-    def save_to_redis(self, user_name: str = "Niko"):
-        """Save climate state to user_state in Redis"""
-        from homeassistant.redis_client import redis_client
+    def get_all_devices_state(self):
+        """Get aggregated state of all climate devices"""
+        return self.build_aggregate(self.get_devices())
 
-        state = self.get_all_devices_state()
+    def save_to_redis(self, user_names: list[str]) -> int | None:
+        """
+        Log climate state changes to the event stream, save the derived snapshot to user_state
+
+        Returns the number of changed devices, None on failure
+        """
+        from homeassistant.device_events import device_event_log
 
         try:
-            redis_client.update_user_state(
-                user_name, {"smarthome_climate": state.model_dump()}, ttl=None
+            changed = device_event_log.append(
+                "climate",
+                {device.name: device.model_dump() for device in self.get_devices()},
             )
-            logger.info(
-                f"climate_services_002: Saved climate state to user_state:name:{user_name}"
+            snapshot = device_event_log.snapshot("climate")
+            state = self.build_aggregate(
+                [ClimateDeviceState(**device) for device in snapshot.values()]
             )
-            return True
+            # Polled once, written to every user's state only if the aggregate changed
+            if self.publisher.publish(state.model_dump(), user_names) is None:
+                logger.info(
+                    "climate_services_002: Climate state unchanged, Redis write skipped"
+                )
+            return len(changed)
         except Exception as e:
             logger.error(f"climate_services_error_001: Failed to save to Redis: {e}")
-            return False
+            return None
@@ -0,0 +1,337 @@
+import hashlib
+import json
+import logging
+import time
+from typing import Any
+
+import redis
+from django.conf import settings
+
+from homeassistant.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+# Appends only the devices whose state differs from the snapshot, in one atomic call;
+# devices missing from the published set are removed with a "null" state event
+# KEYS[1] - event stream, KEYS[2] - snapshot hash (device -> last state)
+# ARGV[1] - approximate stream length cap, ARGV[2:] - device/state pairs
+APPEND_EVENTS_SCRIPT = """
+local ids = {}
+local published = {}
+for i = 2, #ARGV, 2 do
+    local device, state = ARGV[i], ARGV[i + 1]
+    published[device] = true
+    if redis.call("HGET", KEYS[2], device) ~= state then
+        local id = redis.call(
+            "XADD", KEYS[1], "MAXLEN", "~", ARGV[1], "*", "device", device, "state", state
+        )
+        redis.call("HSET", KEYS[2], device, state)
+        table.insert(ids, id)
+    end
+end
+for _, device in ipairs(redis.call("HKEYS", KEYS[2])) do
+    if not published[device] then
+        local id = redis.call(
+            "XADD", KEYS[1], "MAXLEN", "~", ARGV[1], "*", "device", device, "state", "null"
+        )
+        redis.call("HDEL", KEYS[2], device)
+        table.insert(ids, id)
+    end
+end
+return ids
+"""
+
+
+class DeviceEventLog:
+    """
+    Append-only log of device state changes, one Redis Stream per device class
+
+    The snapshot hash is the fold of the stream and is written in the same script
+    as every event, so readers get either the current states or the changes after
+    a stream ID. Durable consumers read through consumer groups and ack processed
+    entries.
+    """
+
+    def __init__(self, client: redis.Redis | None = None):
+        self.redis_client = client or get_redis()
+        self._append_events = self.redis_client.register_script(APPEND_EVENTS_SCRIPT)
+
+    def _get_stream_key(self, device_class: str) -> str:
+        return f"device_events:{device_class}"
+
+    def _get_snapshot_key(self, device_class: str) -> str:
+        return f"device_state:{device_class}"
+
+    def _parse_entries(self, entries: list) -> list[dict[str, Any]]:
+        return [
+            {
+                "id": entry_id,
+                "device": fields["device"],
+                "state": json.loads(fields["state"]),
+            }
+            for entry_id, fields in entries
+        ]
+
+    def append(self, device_class: str, states: dict[str, dict]) -> list[str]:
+        """
+        Logs the devices whose state changed, returns the new stream IDs
+
+        states is every device of the class: the ones missing from it are dropped
+        from the snapshot and logged with a None state.
+        """
+        args = [settings.DEVICE_EVENTS_MAXLEN]
+        for device, state in states.items():
+            args.extend((device, json.dumps(state, sort_keys=True)))
+        ids = self._append_events(
+            keys=[
+                self._get_stream_key(device_class),
+                self._get_snapshot_key(device_class),
+            ],
+            args=args,
+        )
+        if ids:
+            logger.info(
+                f"device_events_001: Logged {len(ids)} {device_class} state changes"
+            )
+        return ids
+
+    def snapshot(self, device_class: str) -> dict[str, dict]:
+        """Current state of every device of the class, ordered by device key"""
+        states = self.redis_client.hgetall(self._get_snapshot_key(device_class))
+        return {device: json.loads(states[device]) for device in sorted(states)}
+
+    def rebuild_snapshot(self, device_class: str) -> dict[str, dict]:
+        """Recomputes the snapshot by replaying the retained stream"""
+        states = {}
+        for entry in self.read_since(device_class, "0", count=None):
+            states[entry["device"]] = entry["state"]
+            if entry["state"] is None:
+                del states[entry["device"]]
+        key = self._get_snapshot_key(device_class)
+        pipe = self.redis_client.pipeline()
+        pipe.delete(key)
+        if states:
+            pipe.hset(
+                key,
+                mapping={
+                    device: json.dumps(state, sort_keys=True)
+                    for device, state in states.items()
+                },
+            )
+        pipe.execute()
+        return self.snapshot(device_class)
+
+    def last_id(self, device_class: str) -> str:
+        """ID of the newest event, a cursor that skips all history"""
+        entries = self.redis_client.xrevrange(
+            self._get_stream_key(device_class), count=1
+        )
+        return entries[0][0] if entries else "0"
+
+    def read_since(
+        self, device_class: str, cursor: str, count: int | None = 100
+    ) -> list[dict[str, Any]]:
+        """Events strictly after the cursor stream ID"""
+        entries = self.redis_client.xrange(
+            self._get_stream_key(device_class), min=f"({cursor}", count=count
+        )
+        return self._parse_entries(entries)
+
+    def ensure_group(self, device_class: str, group: str, start: str = "$"):
+        """Creates a consumer group; by default it receives only new events"""
+        try:
+            self.redis_client.xgroup_create(
+                self._get_stream_key(device_class), group, id=start, mkstream=True
+            )
+        except redis.ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    def read_group(
+        self,
+        device_class: str,
+        group: str,
+        consumer: str,
+        count: int = 100,
+        block: int | None = None,
+    ) -> list[dict[str, Any]]:
+        """Events not yet delivered to the group; ack them once processed"""
+        self.ensure_group(device_class, group)
+        response = self.redis_client.xreadgroup(
+            group,
+            consumer,
+            {self._get_stream_key(device_class): ">"},
+            count=count,
+            block=block,
+        )
+        return self._parse_entries(response[0][1]) if response else []
+
+    def read_pending(
+        self, device_class: str, group: str, consumer: str, count: int = 100
+    ) -> list[dict[str, Any]]:
+        """Events delivered to the consumer but not acked, e.g. after a crash"""
+        self.ensure_group(device_class, group)
+        response = self.redis_client.xreadgroup(
+            group,
+            consumer,
+            {self._get_stream_key(device_class): "0"},
+            count=count,
+        )
+        # Entries trimmed by MAXLEN come back with empty fields
+        return self._parse_entries(
+            [entry for entry in response[0][1] if entry[1]] if response else []
+        )
+
+    def ack(self, device_class: str, group: str, ids: list[str]) -> int:
+        """Marks events as processed by the group"""
+        if not ids:
+            return 0
+        return self.redis_client.xack(self._get_stream_key(device_class), group, *ids)
+
+    def _get_version_key(self, device_class: str) -> str:
+        return f"device_version:{device_class}"
+
+    def next_version(self, device_class: str) -> int:
+        """Bumps the published aggregate version of the device class"""
+        return self.redis_client.incr(self._get_version_key(device_class))
+
+    def get_versions(self, *device_classes: str) -> dict[str, int]:
+        """Published aggregate versions, 0 for classes never published"""
+        values = self.redis_client.mget(
+            [self._get_version_key(device_class) for device_class in device_classes]
+        )
+        return {
+            device_class: int(value or 0)
+            for device_class, value in zip(device_classes, values)
+        }
+
+
+# Global event log instance
+device_event_log = DeviceEventLog()
+
+
+class AggregatePublisher:
+    """
+    Writes a service aggregate into user states only when its content changed
+
+    Every write carries a new monotonically increasing version, stored under
+    device_version:{class} and in the aggregate itself, for conditional fetches.
+    """
+
+    def __init__(self, device_class: str, field: str):
+        self.device_class = device_class
+        self.field = field
+        self.digest = None
+        self.user_names = frozenset()
+
+    def publish(self, aggregate: dict, user_names: list[str]) -> int | None:
+        """Returns the published version, None when the write was skipped"""
+        from homeassistant.redis_client import redis_client
+
+        digest = hashlib.blake2b(
+            json.dumps(aggregate, sort_keys=True, default=str).encode(),
+            digest_size=16,
+        ).hexdigest()
+        # A newly active user still needs the unchanged aggregate
+        if digest == self.digest and self.user_names.issuperset(user_names):
+            return None
+
+        version = device_event_log.next_version(self.device_class)
+        results = redis_client.update_user_states(
+            {
+                user_name: {self.field: {**aggregate, "version": version}}
+                for user_name in user_names
+            }
+        )
+        saved = sum(results.values())
+        # Nothing saved usually means Redis is down, so the next poll writes again
+        if saved:
+            self.digest = digest
+            self.user_names = frozenset(user_names)
+            notify_update(self.device_class, version)
+        logger.info(
+            f"device_events_002: Published {self.device_class} v{version} to {saved}/{len(user_names)} users"
+        )
+        return version
+
+
+# Someone is looking at the dashboard or just sent a device command
+ACTIVITY_KEY = "devices:activity"
+ACTIVITY_CHANNEL = "devices:activity"
+# Published state changes, {"class": ..., "version": ...} per message, plus
+# "user" when only that user's dashboard changed
+UPDATES_CHANNEL = "devices:updates"
+
+
+class ActivityTracker:
+    """
+    Heartbeat that switches pollers to the fast cadence for POLL_ACTIVE_TTL seconds
+
+    Debounced per instance: dashboard polls and command bursts cost one Redis
+    write per window.
+    """
+
+    def __init__(self, client: redis.Redis | None = None):
+        self.redis_client = client or get_redis()
+        self._last_mark = float("-inf")
+        self._last_wakeup = float("-inf")
+
+    def mark(self, command: bool = False):
+        """
+        Refreshes the heartbeat; a command also wakes the pollers, so the change
+        reaches the dashboard stream without waiting for the next poll
+        """
+        now = time.monotonic()
+        refresh = now - self._last_mark >= settings.POLL_ACTIVE_TTL / 4
+        wakeup = (
+            command and now - self._last_wakeup >= settings.POLL_COMMAND_WAKEUP_INTERVAL
+        )
+        if not refresh and not wakeup:
+            return
+        if refresh:
+            self._last_mark = now
+        if wakeup:
+            self._last_wakeup = now
+        try:
+            started = refresh and not self.redis_client.set(
+                ACTIVITY_KEY, 1, ex=int(settings.POLL_ACTIVE_TTL), get=True
+            )
+            if started or wakeup:
+                self.redis_client.publish(
+                    ACTIVITY_CHANNEL, "command" if wakeup else "active"
+                )
+        except Exception as e:
+            logger.error(f"device_events_error_001: Failed to mark activity: {e}")
+
+    def is_active(self) -> bool:
+        """Whether an activity heartbeat is live"""
+        try:
+            return bool(self.redis_client.exists(ACTIVITY_KEY))
+        except Exception as e:
+            logger.error(f"device_events_error_002: Failed to read activity: {e}")
+            return False
+
+
+# Global activity tracker instance
+activity_tracker = ActivityTracker()
+
+
+def mark_activity(command: bool = False):
+    """Marks dashboard or command activity on the process-wide tracker"""
+    activity_tracker.mark(command)
+
+
+def notify_update(kind: str, version: int | None = None, user_name: str | None = None):
+    """Tells dashboard streams that a part of the dashboard changed, for one user if given"""
+    message = {"class": kind, "version": version}
+    if user_name is not None:
+        message["user"] = user_name
+    try:
+        device_event_log.redis_client.publish(UPDATES_CHANNEL, json.dumps(message))
+    except Exception as e:
+        logger.error(f"device_events_error_003: Failed to notify {kind} update: {e}")
+
+
+def is_active() -> bool:
+    """Whether an activity heartbeat is live"""
+    return activity_tracker.is_active()
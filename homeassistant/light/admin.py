@@ -1,6 +1,13 @@
 from django.contrib import admin
 
-from .models import LightDevice, LightGroup, LightSchedule, LightState
+from .models import (
+    LightDevice,
+    LightGroup,
+    LightScene,
+    LightSceneState,
+    LightSchedule,
+    LightState,
+)
 
 
 @admin.register(LightDevice)
@@ -65,6 +72,36 @@ class LightGroupAdmin(admin.ModelAdmin):
     device_count.short_description = "Количество устройств"
 
 
+class LightSceneStateInline(admin.TabularInline):
+    model = LightSceneState
+    extra = 1
+
+
+@admin.register(LightScene)
+class LightSceneAdmin(admin.ModelAdmin):
+    list_display = ("name", "assistant_request", "device_count", "is_active")
+    list_filter = ("is_active",)
+    search_fields = ("name", "assistant_request")
+    list_editable = ("is_active",)
+    inlines = [LightSceneStateInline]
+    actions = ["apply_scenes"]
+
+    def device_count(self, obj):
+        return obj.states.count()
+
+    device_count.short_description = "Количество устройств"
+
+    def apply_scenes(self, request, queryset):
+        for scene in queryset:
+            results = scene.apply()
+            self.message_user(
+                request,
+                f"{scene.name}: {sum(results.values())} из {len(results)} ламп",
+            )
+
+    apply_scenes.short_description = "Применить выбранные сцены"
+
+
 @admin.register(LightSchedule)
 class LightScheduleAdmin(admin.ModelAdmin):
     list_display = ("name", "get_target", "time", "action", "is_active", "created_at")
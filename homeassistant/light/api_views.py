@@ -1,39 +1,119 @@
 import json
 import logging
+import os
+import socket
 
+from django.conf import settings
 from django.http import JsonResponse
 from django.utils.decorators import method_decorator
 from django.views import View
 from django.views.decorators.csrf import csrf_exempt
 
-from .exceptions import DeviceError
-from .light_controller import light_controller
-from .services import YeelightDevice
+from homeassistant.device_events import mark_activity
+from homeassistant.redis_client import redis_client
+
+from .device_registry import device_registry
+from .discovery import discovery_service
+from .light_controller import PROPERTY_SETS, light_controller
+from .models import LightGroup, LightScene
 
 logger = logging.getLogger(__name__)
 
+# Процесс, который держит music mode: сокеты ламп и фиксированный порт живут в одном воркере
+MUSIC_MODE_OWNER_KEY = "light:music_mode:owner"
+
+
+def device_not_found_response() -> JsonResponse:
+    """Ответ для ID, которого нет в реестре устройств"""
+    return JsonResponse(
+        {"success": False, "message": "Устройство не найдено"}, status=404
+    )
+
+
+def serialize_devices(devices) -> list:
+    """Краткое состояние ламп для списков"""
+    return [
+        {
+            "id": device.id,
+            "name": device.name,
+            "ip": device.ip,
+            "model": device.model,
+            "is_on": device.is_on,
+            "brightness": device.brightness,
+            "color_temp": device.color_temp,
+            "rgb_color": device.rgb_color,
+            "last_seen": device.last_seen,
+        }
+        for device in devices
+    ]
+
+
+def invalid_parameters_response(error: ValueError) -> JsonResponse:
+    """Ответ 400 для неверных параметров запроса"""
+    return JsonResponse(
+        {"success": False, "message": f"Неверные параметры: {str(error)}"},
+        status=400,
+    )
+
+
+def filter_request_devices(request) -> list:
+    """Лампы из реестра с учётом фильтров ?room= и ?group=; ValueError при неверной группе"""
+    room = request.GET.get("room")
+    group_id = request.GET.get("group")
+    if group_id:
+        if not group_id.isdigit():
+            raise ValueError(f"group must be a numeric ID, got {group_id!r}")
+        return device_registry.get_by_group(int(group_id))
+    if room:
+        return device_registry.get_by_room(room)
+    return device_registry.get_all_devices()
+
+
+def claim_music_mode() -> bool:
+    """Закрепить music mode за текущим процессом; False, если его держит другой воркер"""
+    owner = f"{socket.gethostname()}:{os.getpid()}"
+    ttl = max(1, int(settings.YEELIGHT_MUSIC_MODE_IDLE_TIMEOUT))
+    try:
+        client = redis_client.redis_client
+        if not client.set(MUSIC_MODE_OWNER_KEY, owner, nx=True, ex=ttl):
+            if client.get(MUSIC_MODE_OWNER_KEY) != owner:
+                return False
+            client.expire(MUSIC_MODE_OWNER_KEY, ttl)
+        return True
+    except Exception as e:
+        # Без Redis один процесс работает как раньше
+        logger.error(
+            f"light_api_error_001: \033[31mMusic mode owner check failed: {str(e)}\033[0m"
+        )
+        return True
+
+
+def request_property_set(request, default: str) -> str:
+    """Набор свойств из ?properties=dashboard|status|detail"""
+    name = request.GET.get("properties", default)
+    return name if name in PROPERTY_SETS else default
+
 
 @method_decorator(csrf_exempt, name="dispatch")
 class DeviceToggleAPIView(View):
     def post(self, request, device_id, *args, **kwargs):
-        ip_suffix = device_id.split("_")[-1]
-        ip = f"192.168.0.{ip_suffix}"
-        device = YeelightDevice(ip)
-
-        result = device.toggle()
+        device = device_registry.get(device_id)
+        if not device:
+            return device_not_found_response()
+        ip = device.ip
 
-        # Check if result is an error response
-        if isinstance(result, dict) and not result.get("success", True):
+        if not light_controller.toggle(device.id):
             return JsonResponse(
                 {
                     "success": False,
-                    "message": f'Ошибка соединения с лампой {ip}: {result.get("error", "Неизвестная ошибка")}',
+                    "message": f"Ошибка соединения с лампой {ip}",
                 },
                 status=200,
             )  # Changed from 500 to 200
+        # После команды опрос устройств просыпается и переходит на быстрый ритм
+        mark_activity(command=True)
 
-        # Result is a boolean (new state)
-        new_state = result
+        new_state = device.is_on
         message = f"Лампа {ip} включена" if new_state else f"Лампа {ip} выключена"
         return JsonResponse({"success": True, "is_on": new_state, "message": message})
 
@@ -50,21 +130,24 @@ class DeviceBrightnessAPIView(View):
                 status=400,
             )
 
-        ip_suffix = device_id.split("_")[-1]
-        ip = f"192.168.0.{ip_suffix}"
-        device = YeelightDevice(ip)
+        device = device_registry.get(device_id)
+        if not device:
+            return device_not_found_response()
+        ip = device.ip
 
-        try:
-            device.set_brightness(brightness)
+        if not light_controller.set_brightness(device.id, brightness):
             return JsonResponse(
-                {
-                    "success": True,
-                    "brightness": brightness,
-                    "message": f"Яркость лампы {ip} установлена на {brightness}%",
-                }
+                {"success": False, "message": f"Ошибка соединения с лампой {ip}"},
+                status=200,
             )
-        except DeviceError as e:
-            return JsonResponse({"success": False, "message": str(e)}, status=500)
+        mark_activity(command=True)
+        return JsonResponse(
+            {
+                "success": True,
+                "brightness": brightness,
+                "message": f"Яркость лампы {ip} установлена на {brightness}%",
+            }
+        )
 
 
 @method_decorator(csrf_exempt, name="dispatch")
@@ -82,21 +165,24 @@ class DeviceColorTempAPIView(View):
                 status=400,
             )
 
-        ip_suffix = device_id.split("_")[-1]
-        ip = f"192.168.0.{ip_suffix}"
-        device = YeelightDevice(ip)
+        device = device_registry.get(device_id)
+        if not device:
+            return device_not_found_response()
+        ip = device.ip
 
-        try:
-            device.set_color_temp(temp)
+        if not light_controller.set_color_temp(device.id, temp):
             return JsonResponse(
-                {
-                    "success": True,
-                    "temperature": temp,
-                    "message": f"Температура лампы {ip} установлена на {temp}K",
-                }
+                {"success": False, "message": f"Ошибка соединения с лампой {ip}"},
+                status=200,
             )
-        except DeviceError as e:
-            return JsonResponse({"success": False, "message": str(e)}, status=500)
+        mark_activity(command=True)
+        return JsonResponse(
+            {
+                "success": True,
+                "temperature": temp,
+                "message": f"Температура лампы {ip} установлена на {temp}K",
+            }
+        )
 
 
 @method_decorator(csrf_exempt, name="dispatch")
@@ -113,32 +199,122 @@ class DeviceRGBColorAPIView(View):
                 status=400,
             )
 
-        ip_suffix = device_id.split("_")[-1]
-        ip = f"192.168.0.{ip_suffix}"
-        device = YeelightDevice(ip)
+        device = device_registry.get(device_id)
+        if not device:
+            return device_not_found_response()
+        ip = device.ip
+
+        if not light_controller.set_rgb(device.id, red, green, blue):
+            return JsonResponse(
+                {"success": False, "message": f"Ошибка соединения с лампой {ip}"},
+                status=200,
+            )
+        mark_activity(command=True)
+        return JsonResponse(
+            {
+                "success": True,
+                "rgb": {"red": red, "green": green, "blue": blue},
+                "message": f"RGB цвет лампы {ip} установлен",
+            }
+        )
+
 
-        try:
-            device.set_rgb(red, green, blue)
+@method_decorator(csrf_exempt, name="dispatch")
+class DeviceMusicModeAPIView(View):
+    def post(self, request, device_id, *args, **kwargs):
+        data = json.loads(request.body)
+        enabled = data.get("enabled", True)
+        if not isinstance(enabled, bool):
+            return invalid_parameters_response(
+                ValueError(f"enabled must be true or false, got {enabled!r}")
+            )
+
+        device = device_registry.get(device_id)
+        if not device:
+            return device_not_found_response()
+
+        if enabled and not claim_music_mode():
+            logger.error(
+                f"light_api_error_002: \033[31mMusic mode for \033[36m{device.ip}\033[31m refused, another worker holds it\033[0m"
+            )
             return JsonResponse(
                 {
-                    "success": True,
-                    "rgb": {"red": red, "green": green, "blue": blue},
-                    "message": f"RGB цвет лампы {ip} установлен",
-                }
+                    "success": False,
+                    "message": "Music mode занят другим процессом: запускайте веб-приложение одним воркером",
+                },
+                status=409,
+            )
+
+        if not light_controller.set_music_mode(device.id, enabled):
+            return JsonResponse(
+                {
+                    "success": False,
+                    "message": f"Не удалось переключить music mode лампы {device.ip}",
+                },
+                status=200,
+            )
+        return JsonResponse(
+            {
+                "success": True,
+                "music_mode": device.connection.music_mode,
+                "message": f"Music mode лампы {device.ip} {'включен' if enabled else 'выключен'}",
+            }
+        )
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class GroupPowerAPIView(View):
+    def post(self, request, group_id, *args, **kwargs):
+        data = json.loads(request.body)
+        is_on = bool(data.get("is_on", True))
+
+        group = LightGroup.objects.filter(pk=group_id).first()
+        if not group:
+            return JsonResponse(
+                {"success": False, "message": "Группа не найдена"}, status=404
+            )
+
+        results = group.set_power_all(is_on)
+        mark_activity(command=True)
+        return JsonResponse(
+            {
+                "success": all(results.values()),
+                "is_on": is_on,
+                "devices": {str(pk): ok for pk, ok in results.items()},
+                "message": f"Группа {group.name}: {sum(results.values())} из {len(results)} ламп {'включены' if is_on else 'выключены'}",
+            }
+        )
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class SceneApplyAPIView(View):
+    def post(self, request, scene_id, *args, **kwargs):
+        scene = LightScene.objects.filter(pk=scene_id, is_active=True).first()
+        if not scene:
+            return JsonResponse(
+                {"success": False, "message": "Сцена не найдена"}, status=404
             )
-        except DeviceError as e:
-            return JsonResponse({"success": False, "message": str(e)}, status=500)
+
+        results = scene.apply()
+        mark_activity(command=True)
+        return JsonResponse(
+            {
+                "success": all(results.values()),
+                "devices": results,
+                "message": f"Сцена {scene.name}: {sum(results.values())} из {len(results)} ламп",
+            }
+        )
 
 
 class DeviceStatusAPIView(View):
     def get(self, request, device_id, *args, **kwargs):
-        device = light_controller.get_device(device_id)
+        light_controller.start_listening()
+        device = device_registry.get(device_id)
         if not device:
-            return JsonResponse(
-                {"success": False, "message": "Устройство не найдено"}, status=404
-            )
+            return device_not_found_response()
 
-        device.update_properties()
+        # Subscribed devices are kept up to date by NOTIFY, only unknown fields are read
+        changed = device.fetch_properties(request_property_set(request, "status"))
         return JsonResponse(
             {
                 "success": True,
@@ -153,95 +329,64 @@ class DeviceStatusAPIView(View):
                     "rgb_color": device.rgb_color,
                 },
                 "properties": device.properties,
+                "changed": sorted(changed or {}),
             }
         )
 
 
-class AllDevicesStatusAPIView(View):
-    # Known lamp IPs (same as in LightDashboardView)
-    LAMP_IPS = ["192.168.0.35", "192.168.0.226", "192.168.0.20"]
+def scan_response(request) -> JsonResponse:
+    """Кэшированные результаты обнаружения; ?wait=N ждёт свежих до N секунд"""
+    discovery_service.start()
+    version = discovery_service.version
+    if "wait" in request.GET:
+        since = request.GET.get("since")
+        version = discovery_service.wait_for_update(
+            int(since) if since else None, float(request.GET["wait"])
+        )
+    discovered = discovery_service.get_devices()
+    return JsonResponse(
+        {
+            "success": True,
+            "version": version,
+            "discovered_count": len(discovered),
+            "devices": [
+                {
+                    "id": device.id,
+                    "name": device.name,
+                    "ip": device.ip,
+                    "model": device.model,
+                    "is_on": device.is_on,
+                }
+                for device in discovered
+            ],
+        }
+    )
 
+
+class AllDevicesStatusAPIView(View):
     def get(self, request, *args, **kwargs):
-        devices = light_controller.get_all_devices()
-
-        # If no devices in controller, initialize from known IPs
-        if not devices:
-            for ip in self.LAMP_IPS:
-                try:
-                    from yeelight import Bulb
-
-                    bulb = Bulb(ip)
-                    properties = bulb.get_properties()
-                    from .light_controller import YeelightDevice
-
-                    device = YeelightDevice(ip, properties=properties)
-                    device.name = f"Yeelight {ip.split('.')[-1]}"
-                    device.id = f"Yeelight_{ip.split('.')[-1]}"
-                    light_controller.devices[device.id] = device
-                except Exception as e:
-                    logger.error(
-                        f"api_views_001: \033[31mConnection failed to \033[36m{ip}\033[31m: {str(e)}\033[0m"
-                    )
-                    from .light_controller import YeelightDevice
-
-                    device = YeelightDevice(
-                        ip,
-                        properties={"power": "off", "bright": 0, "ct": 4000, "rgb": 0},
-                    )
-                    device.name = f"Yeelight {ip.split('.')[-1]}"
-                    device.id = f"Yeelight_{ip.split('.')[-1]}"
-                    device._connected = False
-                    light_controller.devices[device.id] = device
-            devices = light_controller.get_all_devices()
-        else:
-            light_controller.refresh_devices()
-
-        devices_data = [
-            {
-                "id": device.id,
-                "name": device.name,
-                "ip": device.ip,
-                "model": device.model,
-                "is_on": device.is_on,
-                "brightness": device.brightness,
-                "color_temp": device.color_temp,
-                "rgb_color": device.rgb_color,
-                "last_seen": device.last_seen,
-            }
-            for device in devices
-        ]
+        try:
+            devices = filter_request_devices(request)
+        except ValueError as e:
+            return invalid_parameters_response(e)
+        light_controller.start_listening()
+        devices = light_controller.load_devices(
+            devices,
+            request_property_set(request, "dashboard"),
+        )
 
         return JsonResponse(
-            {"success": True, "devices": devices_data, "total_count": len(devices)}
+            {
+                "success": True,
+                "devices": serialize_devices(devices),
+                "total_count": len(devices),
+            }
         )
 
 
 class ScanDevicesView(View):
     def get(self, request, *args, **kwargs):
         try:
-            discovered = light_controller.discover_devices(timeout=5)
-            return JsonResponse(
-                {
-                    "success": True,
-                    "discovered_count": len(discovered),
-                    "devices": [
-                        {
-                            "id": device.id,
-                            "name": device.name,
-                            "ip": device.ip,
-                            "model": device.model,
-                            "is_on": device.is_on,
-                        }
-                        for device in discovered
-                    ],
-                }
-            )
-        except Exception as e:
-            logger.error(f"Error in ScanDevicesView.get: {e}")
-            return JsonResponse(
-                {
-                    "success": False,
-                    "message": f"Ошибка сканирования устройств: {str(e)}",
-                },
-                status=500,
-            )
+            return scan_response(request)
+        except ValueError as e:
+            return invalid_parameters_response(e)
@@ -0,0 +1,197 @@
+import asyncio
+import json
+import logging
+
+from asgiref.sync import sync_to_async
+from django.http import JsonResponse
+from django.utils.decorators import method_decorator
+from django.views import View
+from django.views.decorators.csrf import csrf_exempt
+from homeassistant.device_events import mark_activity
+
+from .api_views import (
+    device_not_found_response,
+    filter_request_devices,
+    invalid_parameters_response,
+    request_property_set,
+    serialize_devices,
+)
+from .async_light_controller import async_light_controller
+from .device_registry import device_registry
+
+logger = logging.getLogger(__name__)
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class AsyncDeviceToggleAPIView(View):
+    async def post(self, request, device_id, *args, **kwargs):
+        device = await device_registry.aget(device_id)
+        if not device:
+            return device_not_found_response()
+        ip = device.ip
+
+        if not await async_light_controller.toggle(device.id):
+            return JsonResponse(
+                {
+                    "success": False,
+                    "message": f"Ошибка соединения с лампой {ip}",
+                },
+                status=200,
+            )
+        # Запись в Redis синхронная, поэтому вне event loop
+        await asyncio.to_thread(mark_activity, command=True)
+
+        new_state = device.is_on
+        message = f"Лампа {ip} включена" if new_state else f"Лампа {ip} выключена"
+        return JsonResponse({"success": True, "is_on": new_state, "message": message})
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class AsyncDeviceBrightnessAPIView(View):
+    async def post(self, request, device_id, *args, **kwargs):
+        data = json.loads(request.body)
+        brightness = int(data.get("brightness", 50))
+
+        if not 1 <= brightness <= 100:
+            return JsonResponse(
+                {"success": False, "message": "Яркость должна быть от 1 до 100"},
+                status=400,
+            )
+
+        device = await device_registry.aget(device_id)
+        if not device:
+            return device_not_found_response()
+        ip = device.ip
+
+        if not await async_light_controller.set_brightness(device.id, brightness):
+            return JsonResponse(
+                {"success": False, "message": f"Ошибка соединения с лампой {ip}"},
+                status=200,
+            )
+        await asyncio.to_thread(mark_activity, command=True)
+        return JsonResponse(
+            {
+                "success": True,
+                "brightness": brightness,
+                "message": f"Яркость лампы {ip} установлена на {brightness}%",
+            }
+        )
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class AsyncDeviceColorTempAPIView(View):
+    async def post(self, request, device_id, *args, **kwargs):
+        data = json.loads(request.body)
+        temp = int(data.get("temperature", 4000))
+
+        if not 1700 <= temp <= 6500:
+            return JsonResponse(
+                {
+                    "success": False,
+                    "message": "Температура должна быть от 1700K до 6500K",
+                },
+                status=400,
+            )
+
+        device = await device_registry.aget(device_id)
+        if not device:
+            return device_not_found_response()
+        ip = device.ip
+
+        if not await async_light_controller.set_color_temp(device.id, temp):
+            return JsonResponse(
+                {"success": False, "message": f"Ошибка соединения с лампой {ip}"},
+                status=200,
+            )
+        await asyncio.to_thread(mark_activity, command=True)
+        return JsonResponse(
+            {
+                "success": True,
+                "temperature": temp,
+                "message": f"Температура лампы {ip} установлена на {temp}K",
+            }
+        )
+
+
+@method_decorator(csrf_exempt, name="dispatch")
+class AsyncDeviceRGBColorAPIView(View):
+    async def post(self, request, device_id, *args, **kwargs):
+        data = json.loads(request.body)
+        red = int(data.get("red", 255))
+        green = int(data.get("green", 255))
+        blue = int(data.get("blue", 255))
+
+        if not all(0 <= c <= 255 for c in [red, green, blue]):
+            return JsonResponse(
+                {"success": False, "message": "RGB значения должны быть от 0 до 255"},
+                status=400,
+            )
+
+        device = await device_registry.aget(device_id)
+        if not device:
+            return device_not_found_response()
+        ip = device.ip
+
+        if not await async_light_controller.set_rgb(device.id, red, green, blue):
+            return JsonResponse(
+                {"success": False, "message": f"Ошибка соединения с лампой {ip}"},
+                status=200,
+            )
+        await asyncio.to_thread(mark_activity, command=True)
+        return JsonResponse(
+            {
+                "success": True,
+                "rgb": {"red": red, "green": green, "blue": blue},
+                "message": f"RGB цвет лампы {ip} установлен",
+            }
+        )
+
+
+class AsyncDeviceStatusAPIView(View):
+    async def get(self, request, device_id, *args, **kwargs):
+        device = await device_registry.aget(device_id)
+        if not device:
+            return device_not_found_response()
+
+        # Devices with an open connection are kept up to date by NOTIFY
+        changed = await async_light_controller.fetch_properties(
+            device, request_property_set(request, "status")
+        )
+        return JsonResponse(
+            {
+                "success": True,
+                "device_id": device_id,
+                "name": device.name,
+                "ip": device.ip,
+                "model": device.model,
+                "state": {
+                    "is_on": device.is_on,
+                    "brightness": device.brightness,
+                    "color_temp": device.color_temp,
+                    "rgb_color": device.rgb_color,
+                },
+                "properties": device.properties,
+                "changed": sorted(changed or {}),
+            }
+        )
+
+
+class AsyncAllDevicesStatusAPIView(View):
+    async def get(self, request, *args, **kwargs):
+        try:
+            # Реестр может перечитать лампы из ORM, в event loop это запрещено
+            devices = await sync_to_async(filter_request_devices)(request)
+        except ValueError as e:
+            return invalid_parameters_response(e)
+        devices = await async_light_controller.load_devices(
+            devices,
+            request_property_set(request, "dashboard"),
+        )
+
+        return JsonResponse(
+            {
+                "success": True,
+                "devices": serialize_devices(devices),
+                "total_count": len(devices),
+            }
+        )
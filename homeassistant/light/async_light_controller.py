@@ -0,0 +1,177 @@
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional
+
+from django.conf import settings
+from yeelight import BulbException
+
+from .exceptions import DeviceError
+from .light_controller import LightController, YeelightDevice, light_controller
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncLightController:
+    """Asyncio управление лампами для ASGI: один воркер держит сотни команд в полёте"""
+
+    def __init__(self, controller: LightController = light_controller):
+        # Устройства, их состояние и соединения общие с синхронным контроллером
+        self.controller = controller
+
+    async def execute(
+        self, device: YeelightDevice, method: str, *args, **kwargs
+    ) -> Any:
+        """Выполнить команду через соединение лампы из общего пула, не блокируя loop"""
+        # Второй сокет к лампе съел бы лимит соединений Yeelight, поэтому
+        # блокирующий вызов уходит в поток, а очередь команд держит блокировка соединения
+        return await asyncio.to_thread(
+            device.connection.execute, method, *args, **kwargs
+        )
+
+    def is_fresh(self, device: YeelightDevice) -> bool:
+        """Состояние приходит по NOTIFY, читать его с лампы не нужно"""
+        return device.subscribed
+
+    async def fetch_properties(
+        self, device: YeelightDevice, *needs: str
+    ) -> Optional[Dict[str, Any]]:
+        """Прочитать нужные наборы свойств; вернуть изменения или None при ошибке"""
+        return await asyncio.to_thread(device.fetch_properties, *needs)
+
+    async def update_properties(self, device: YeelightDevice, *needs: str) -> bool:
+        """Обновить свойства устройства (по умолчанию полный набор)"""
+        return await self.fetch_properties(device, *needs) is not None
+
+    async def fan_out(
+        self,
+        devices: List[YeelightDevice],
+        action,
+        deadline: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        """Выполнить корутину на всех устройствах одновременно, к дедлайну вернуть частичные результаты"""
+        deadline = deadline or settings.YEELIGHT_DEVICE_DEADLINE
+
+        async def run(device: YeelightDevice):
+            try:
+                return await asyncio.wait_for(action(device), timeout=deadline)
+            except asyncio.TimeoutError:
+                logger.error(
+                    f"light_async_error_003: \033[31mDeadline \033[33m{deadline}s\033[31m exceeded for \033[36m{device.ip}\033[0m"
+                )
+                return None
+
+        results = await asyncio.gather(*(run(device) for device in devices))
+        return {device.id: result for device, result in zip(devices, results)}
+
+    async def load_devices(
+        self, devices: List[YeelightDevice], *needs: str
+    ) -> List[YeelightDevice]:
+        """Прочитать состояние ламп без подписки, подставив значения по умолчанию недоступным"""
+        results = await self.refresh_devices(devices, *needs)
+        for device in devices:
+            if not results.get(device.id, True) and not device.properties.get("power"):
+                device.properties.update(
+                    {"power": "off", "bright": 0, "ct": 4000, "rgb": 0}
+                )
+        return devices
+
+    async def refresh_devices(
+        self, devices: Optional[List[YeelightDevice]] = None, *needs: str
+    ) -> Dict[str, Any]:
+        """Параллельно опросить устройства, состояние которых не приходит по NOTIFY"""
+        if devices is None:
+            devices = self.controller.get_all_devices()
+        stale = [device for device in devices if not self.is_fresh(device)]
+        return await self.fan_out(
+            stale, lambda device: self.update_properties(device, *needs)
+        )
+
+    async def toggle(self, device_id: str) -> bool:
+        """Переключить состояние устройства"""
+        device = self.controller.get_device(device_id)
+        if not device:
+            return False
+
+        try:
+            if "power" not in device.properties and not await self.update_properties(
+                device, "dashboard"
+            ):
+                return False
+            await self.execute(device, "toggle")
+            device.apply_state({"power": "off" if device.is_on else "on"})
+            logger.info(
+                f"light_async_002: Device \033[35m{device.name}\033[0m \033[33mtoggled\033[0m"
+            )
+            return True
+
+        except (BulbException, DeviceError) as e:
+            logger.error(
+                f"light_async_error_004: \033[31mToggle failed for \033[35m{device.name}\033[31m: {str(e)}\033[0m"
+            )
+            return False
+
+    async def set_brightness(self, device_id: str, brightness: int) -> bool:
+        """Установить яркость устройства"""
+        device = self.controller.get_device(device_id)
+        if not device or not 1 <= brightness <= 100:
+            return False
+
+        try:
+            await self.execute(device, "set_brightness", brightness)
+            device.apply_state({"bright": str(brightness)})
+            logger.info(
+                f"light_async_003: Brightness set to \033[33m{brightness}%\033[0m for \033[35m{device.name}\033[0m"
+            )
+            return True
+
+        except (BulbException, DeviceError) as e:
+            logger.error(
+                f"light_async_error_005: \033[31mBrightness set failed for \033[35m{device.name}\033[31m: {str(e)}\033[0m"
+            )
+            return False
+
+    async def set_color_temp(self, device_id: str, temp: int) -> bool:
+        """Установить цветовую температуру"""
+        device = self.controller.get_device(device_id)
+        if not device or not 1700 <= temp <= 6500:
+            return False
+
+        try:
+            await self.execute(device, "set_color_temp", temp)
+            device.apply_state({"ct": str(temp), "color_mode": "2"})
+            logger.info(
+                f"light_async_004: Color temp set to \033[33m{temp}K\033[0m for \033[35m{device.name}\033[0m"
+            )
+            return True
+
+        except (BulbException, DeviceError) as e:
+            logger.error(
+                f"light_async_error_006: \033[31mColor temp set failed for \033[35m{device.name}\033[31m: {str(e)}\033[0m"
+            )
+            return False
+
+    async def set_rgb(self, device_id: str, red: int, green: int, blue: int) -> bool:
+        """Установить RGB цвет"""
+        device = self.controller.get_device(device_id)
+        if not device or not all(0 <= c <= 255 for c in [red, green, blue]):
+            return False
+
+        try:
+            await self.execute(device, "set_rgb", red, green, blue)
+            device.apply_state(
+                {"rgb": str((red << 16) + (green << 8) + blue), "color_mode": "1"}
+            )
+            logger.info(
+                f"light_async_005: RGB color set to \033[33m({red},{green},{blue})\033[0m for \033[35m{device.name}\033[0m"
+            )
+            return True
+
+        except (BulbException, DeviceError) as e:
+            logger.error(
+                f"light_async_error_007: \033[31mRGB set failed for \033[35m{device.name}\033[31m: {str(e)}\033[0m"
+            )
+            return False
+
+
+# Глобальный экземпляр asyncio контроллера
+async_light_controller = AsyncLightController()
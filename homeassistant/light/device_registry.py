@@ -0,0 +1,187 @@
+import logging
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+
+from homeassistant.redis_client import redis_client
+
+from .light_controller import LightController, YeelightDevice, light_controller
+
+logger = logging.getLogger(__name__)
+
+
+def notify_devices_changed():
+    """Сообщить другим процессам (планировщик, опрос), что лампы или группы изменились"""
+    try:
+        redis_client.redis_client.publish(settings.LIGHT_DEVICES_CHANNEL, "reload")
+    except Exception as e:
+        logger.error(
+            f"light_registry_error_001: \033[31mDevices change notification failed: {str(e)}\033[0m"
+        )
+
+
+class DeviceRegistry:
+    """Индекс ламп из LightDevice в памяти: O(1) поиск по ID, IP, комнате и группе"""
+
+    def __init__(self, controller: LightController):
+        self.controller = controller
+        self._lock = threading.Lock()
+        # Первые параллельные запросы ждут одну загрузку, а не запускают свои
+        self._warm_lock = threading.Lock()
+        self._loaded = False
+        self._generation = 0
+        self._by_id: Dict[str, YeelightDevice] = {}
+        self._by_room: Dict[str, List[YeelightDevice]] = {}
+        self._by_group: Dict[int, List[YeelightDevice]] = {}
+        # Лампы, найденные сканированием и отсутствующие в базе, по IP
+        self._discovered: Dict[str, YeelightDevice] = {}
+        self._stop_event = threading.Event()
+
+    def warm(self):
+        """Загрузить активные лампы из базы и перестроить индексы"""
+        with self._warm_lock:
+            self._load()
+
+    def _load(self):
+        """Прочитать LightDevice и заменить индексы; вызывается под _warm_lock"""
+        from .models import LightDevice
+
+        generation = self._generation
+        rows = LightDevice.objects.filter(
+            is_active=True, device_type="yeelight"
+        ).prefetch_related("groups")
+        by_id = {}
+        by_room = defaultdict(list)
+        by_group = defaultdict(list)
+        for row in rows:
+            device = self.controller.add_device(
+                row.ip_address, row.port, device_id=str(row.pk), name=row.name
+            )
+            by_id[device.id] = device
+            if row.room:
+                by_room[row.room].append(device)
+            for group in row.groups.all():
+                by_group[group.pk].append(device)
+
+        with self._lock:
+            for device_id in self._by_id.keys() - by_id.keys():
+                self.controller.remove_device(device_id)
+            self._by_id = by_id
+            self._by_room = dict(by_room)
+            self._by_group = dict(by_group)
+            # Найденная сканированием лампа, добавленная в базу, становится обычной
+            self._discovered = {
+                ip: device
+                for ip, device in self._discovered.items()
+                if device.id not in by_id
+            }
+            # Сигнал во время загрузки означает, что прочитанные строки уже устарели
+            self._loaded = generation == self._generation
+        logger.info(
+            f"light_registry_001: Registry warmed with \033[33m{len(by_id)}\033[0m devices"
+        )
+
+    def invalidate(self):
+        """Сбросить индексы, они перестроятся при следующем обращении"""
+        self._generation += 1
+        self._loaded = False
+
+    def add_discovered(self, ip: str, port: int) -> YeelightDevice:
+        """Зарегистрировать найденную сканированием лампу без обращения к базе"""
+        device = self.controller.add_device(ip, port)
+        with self._lock:
+            self._discovered[ip] = device
+        return device
+
+    def remove_discovered(self, ip: str):
+        """Забыть найденную сканированием лампу; лампы из базы остаются"""
+        with self._lock:
+            device = self._discovered.pop(ip, None)
+        if device and device.id not in self._by_id:
+            self.controller.remove_device(device.id)
+
+    def find_known(self, ip: str) -> Optional[YeelightDevice]:
+        """Лампа из базы по уже загруженным индексам, без запроса к базе"""
+        device = self.controller.get_device_by_ip(ip)
+        if device and device.id in self._by_id:
+            return device
+        return None
+
+    def listen_for_changes(self):
+        """Подписка на Redis канал: правки ламп в другом процессе сбрасывают индексы"""
+        while not self._stop_event.is_set():
+            try:
+                pubsub = redis_client.redis_client.pubsub(
+                    ignore_subscribe_messages=True
+                )
+                pubsub.subscribe(settings.LIGHT_DEVICES_CHANNEL)
+                while not self._stop_event.is_set():
+                    if pubsub.get_message(timeout=1.0):
+                        self.invalidate()
+            except Exception as e:
+                logger.error(
+                    f"light_registry_error_002: \033[31mDevices change subscription lost: {str(e)}\033[0m"
+                )
+                time.sleep(5)
+
+    def start_listening(self):
+        """Запустить поток подписки на изменения ламп и групп"""
+        threading.Thread(
+            target=self.listen_for_changes, name="device-registry-changes", daemon=True
+        ).start()
+
+    def stop_listening(self):
+        """Остановить поток подписки"""
+        self._stop_event.set()
+
+    def get(self, device_id: str) -> Optional[YeelightDevice]:
+        """Получить лампу по ID: pk записи LightDevice или ID найденной сканированием"""
+        self._ensure_loaded()
+        device = self._by_id.get(str(device_id))
+        if device is None:
+            device = next(
+                (d for d in self._discovered.values() if d.id == str(device_id)),
+                None,
+            )
+        return device
+
+    def get_by_ip(self, ip: str) -> Optional[YeelightDevice]:
+        """Получить лампу по IP"""
+        self._ensure_loaded()
+        return self.find_known(ip) or self._discovered.get(ip)
+
+    def get_by_room(self, room: str) -> List[YeelightDevice]:
+        """Лампы комнаты"""
+        self._ensure_loaded()
+        return list(self._by_room.get(room, []))
+
+    def get_by_group(self, group_id: int) -> List[YeelightDevice]:
+        """Лампы группы"""
+        self._ensure_loaded()
+        return list(self._by_group.get(group_id, []))
+
+    def get_all_devices(self) -> List[YeelightDevice]:
+        """Все зарегистрированные лампы, включая найденные сканированием"""
+        self._ensure_loaded()
+        return [*self._by_id.values(), *self._discovered.values()]
+
+    async def aget(self, device_id: str) -> Optional[YeelightDevice]:
+        """Получить лампу из async кода: прогрев индексов с ORM идёт вне event loop"""
+        return await sync_to_async(self.get)(device_id)
+
+    def _ensure_loaded(self):
+        """Прогреть индексы, если они ещё не загружены или сброшены"""
+        if self._loaded:
+            return
+        with self._warm_lock:
+            # Пока ждали блокировку, индексы мог загрузить другой поток
+            if not self._loaded:
+                self._load()
+
+
+# Глобальный реестр устройств
+device_registry = DeviceRegistry(light_controller)
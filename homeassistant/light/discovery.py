@@ -0,0 +1,236 @@
+import logging
+import select
+import socket
+import struct
+import threading
+import time
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlparse
+
+from django.conf import settings
+
+from .device_registry import DeviceRegistry, device_registry
+from .light_controller import LightController, YeelightDevice, light_controller
+
+logger = logging.getLogger(__name__)
+
+SSDP_GROUP = "239.255.255.250"
+SSDP_PORT = 1982
+SEARCH_MESSAGE = "\r\n".join(
+    [
+        "M-SEARCH * HTTP/1.1",
+        f"HOST: {SSDP_GROUP}:{SSDP_PORT}",
+        'MAN: "ssdp:discover"',
+        "ST: wifi_bulb",
+    ]
+).encode()
+
+# Поля SSDP ответа: свойства get_prop и список поддерживаемых команд
+STATE_FIELDS = (
+    "model",
+    "fw_ver",
+    "support",
+    "power",
+    "bright",
+    "color_mode",
+    "ct",
+    "rgb",
+    "name",
+)
+
+
+def parse_advertisement(data: bytes) -> Optional[Dict[str, str]]:
+    """Разобрать SSDP ответ или NOTIFY лампы, вернуть None для чужих пакетов"""
+    lines = data.decode(errors="ignore").split("\r\n")
+    if lines[0].startswith("M-SEARCH"):
+        return None
+    headers = {}
+    for line in lines[1:]:
+        key, separator, value = line.partition(":")
+        if separator:
+            headers[key.strip()] = value.strip()
+    location = urlparse(headers.get("Location", ""))
+    if location.scheme != "yeelight" or not location.hostname:
+        return None
+    headers["ip"] = location.hostname
+    headers["port"] = location.port or 55443
+    return headers
+
+
+class DiscoveryService:
+    """Фоновое обнаружение ламп: SSDP поиск по расписанию и пассивный приём NOTIFY"""
+
+    def __init__(self, controller: LightController, registry: DeviceRegistry):
+        self.controller = controller
+        self.registry = registry
+        self.found: Dict[str, Dict[str, Any]] = {}
+        self.version = 0
+        self._condition = threading.Condition()
+        self._stop_event = threading.Event()
+        self._probe_requested = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Запустить поток обнаружения, если он ещё не запущен"""
+        if not settings.YEELIGHT_DISCOVERY_ENABLED:
+            return
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="yeelight-discovery", daemon=True
+        )
+        self._thread.start()
+        logger.info(
+            f"light_discovery_001: Discovery started, probe every \033[33m{settings.YEELIGHT_DISCOVERY_INTERVAL}s\033[0m"
+        )
+
+    def stop(self):
+        """Остановить поток обнаружения"""
+        self._stop_event.set()
+
+    def probe(self):
+        """Запросить внеочередной SSDP поиск"""
+        self._probe_requested.set()
+
+    def get_devices(self) -> List[YeelightDevice]:
+        """Лампы, ответившие в пределах TTL"""
+        self.expire()
+        with self._condition:
+            return [entry["device"] for entry in self.found.values()]
+
+    def wait_for_update(self, since: Optional[int], timeout: float) -> int:
+        """Long-poll: дождаться изменения результатов после версии since"""
+        # Каждое ожидание занимает поток воркера, поэтому оно короткое
+        timeout = min(max(timeout, 0), settings.YEELIGHT_DISCOVERY_MAX_WAIT)
+        with self._condition:
+            if since is None:
+                since = self.version
+            if self.version == since:
+                self.probe()
+                self._condition.wait_for(lambda: self.version != since, timeout)
+            return self.version
+
+    def handle_packet(self, data: bytes):
+        """Слить одно объявление лампы в реестр; поток обнаружения не ходит в базу"""
+        headers = parse_advertisement(data)
+        if headers is None:
+            return
+        state = {key: headers[key] for key in STATE_FIELDS if headers.get(key)}
+        device = self.registry.find_known(headers["ip"])
+        if device:
+            # Имя из базы важнее имени, записанного в лампе
+            state.pop("name", None)
+        else:
+            # Если лампа есть в базе, загрузка реестра переименует её и даст ID из базы
+            device = self.registry.add_discovered(headers["ip"], headers["port"])
+        device.apply_notification(state)
+
+        with self._condition:
+            entry = self.found.get(device.ip)
+            changed = entry is None or entry["state"] != state
+            self.found[device.ip] = {
+                "device": device,
+                "state": state,
+                "expires_at": time.monotonic() + settings.YEELIGHT_DISCOVERY_TTL,
+            }
+            if changed:
+                self.version += 1
+                self._condition.notify_all()
+        if entry is None:
+            logger.info(
+                f"light_discovery_002: Found device \033[35m{device.name}\033[0m (\033[36m{device.ip}\033[0m)"
+            )
+
+    def expire(self):
+        """Забыть лампы, не отвечавшие дольше TTL"""
+        now = time.monotonic()
+        with self._condition:
+            expired = [
+                entry["device"]
+                for entry in self.found.values()
+                if entry["expires_at"] <= now
+            ]
+            for device in expired:
+                del self.found[device.ip]
+            if expired:
+                self.version += 1
+                self._condition.notify_all()
+        for device in expired:
+            self.registry.remove_discovered(device.ip)
+            logger.info(
+                f"light_discovery_003: Device \033[36m{device.ip}\033[0m expired"
+            )
+
+    def _run(self):
+        """Цикл: поиск по расписанию, приём ответов и объявлений, истечение TTL"""
+        search_socket = self._open_search_socket()
+        notify_socket = self._open_notify_socket()
+        sockets = [sock for sock in (search_socket, notify_socket) if sock]
+        next_probe = 0.0
+        try:
+            while not self._stop_event.is_set():
+                now = time.monotonic()
+                if search_socket and (
+                    now >= next_probe or self._probe_requested.is_set()
+                ):
+                    self._probe_requested.clear()
+                    self._send_probe(search_socket)
+                    next_probe = now + settings.YEELIGHT_DISCOVERY_INTERVAL
+                readable, _, _ = select.select(sockets, [], [], 0.5)
+                for sock in readable:
+                    try:
+                        data, _ = sock.recvfrom(65507)
+                    except OSError:
+                        continue
+                    self.handle_packet(data)
+                self.expire()
+        except Exception as e:
+            logger.error(
+                f"light_discovery_error_001: \033[31mDiscovery loop failed: {str(e)}\033[0m"
+            )
+        finally:
+            for sock in sockets:
+                sock.close()
+
+    def _open_search_socket(self) -> Optional[socket.socket]:
+        """Сокет для M-SEARCH, ответы ламп приходят на него unicast"""
+        try:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+            sock.setsockopt(socket.IPPROTO_IP, socket.IP_MULTICAST_TTL, 32)
+            return sock
+        except OSError as e:
+            logger.error(
+                f"light_discovery_error_002: \033[31mSearch socket failed: {str(e)}\033[0m"
+            )
+            return None
+
+    def _open_notify_socket(self) -> Optional[socket.socket]:
+        """Сокет в multicast группе для объявлений, которые лампы шлют сами"""
+        try:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_UDP)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            sock.bind(("", SSDP_PORT))
+            membership = struct.pack(
+                "4sl", socket.inet_aton(SSDP_GROUP), socket.INADDR_ANY
+            )
+            sock.setsockopt(socket.IPPROTO_IP, socket.IP_ADD_MEMBERSHIP, membership)
+            return sock
+        except OSError as e:
+            logger.error(
+                f"light_discovery_error_003: \033[31mPassive listener on \033[33m{SSDP_PORT}\033[31m unavailable: {str(e)}\033[0m"
+            )
+            return None
+
+    def _send_probe(self, sock: socket.socket):
+        """Отправить M-SEARCH в multicast группу"""
+        try:
+            sock.sendto(SEARCH_MESSAGE, (SSDP_GROUP, SSDP_PORT))
+        except OSError as e:
+            logger.error(
+                f"light_discovery_error_004: \033[31mSSDP probe failed: {str(e)}\033[0m"
+            )
+
+
+# Глобальный сервис обнаружения, запускается при первом обращении к сканированию
+discovery_service = DiscoveryService(light_controller, device_registry)
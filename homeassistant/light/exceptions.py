@@ -18,3 +18,7 @@ class DeviceConnectionError(DeviceError):
 
 class DeviceOperationError(DeviceError):
     """Exception raised for errors during device operations."""
+
+
+class DeviceRateLimitError(DeviceError):
+    """Exception raised when the device command rate limit is exceeded."""
@@ -1,26 +1,373 @@
+import json
 import logging
+import select
 import socket
 import threading
 import time
-from typing import Any, Dict, List, Optional
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
 
 from django.conf import settings
 from yeelight import Bulb, BulbException, discover_bulbs
+from yeelight.main import DEFAULT_PROPS
+
+from .exceptions import (
+    DeviceConnectionError,
+    DeviceError,
+    DeviceOperationError,
+    DeviceRateLimitError,
+)
 
 logger = logging.getLogger(__name__)
 
+# Как часто слушатель уведомлений отпускает общее соединение для команд
+NOTIFY_POLL_INTERVAL = 1.0
+
+# Наборы свойств, которые читают разные экраны. Имя лампы берётся из базы,
+# поэтому "name" с лампы не читаем
+PROPERTY_SETS = {
+    "dashboard": ["power", "bright"],
+    "status": ["power", "bright", "ct", "rgb", "color_mode"],
+    "detail": [name for name in DEFAULT_PROPS if name != "name"],
+}
+
+
+def configure_keepalive(sock: socket.socket):
+    """Включить TCP keepalive, чтобы обнаруживать мёртвые соединения"""
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+    if hasattr(socket, "TCP_KEEPIDLE"):
+        sock.setsockopt(
+            socket.IPPROTO_TCP,
+            socket.TCP_KEEPIDLE,
+            settings.YEELIGHT_KEEPALIVE_IDLE,
+        )
+        sock.setsockopt(
+            socket.IPPROTO_TCP,
+            socket.TCP_KEEPINTVL,
+            settings.YEELIGHT_KEEPALIVE_IDLE,
+        )
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPCNT, 3)
+
+
+class BulbConnection:
+    """Долгоживущее TCP соединение с лампой: keepalive, переподключение с backoff и лимит команд"""
+
+    def __init__(
+        self,
+        ip: str,
+        port: int = 55443,
+        music_listener_lock: Optional[threading.Lock] = None,
+    ):
+        self.ip = ip
+        self.port = port
+        self.bulb = Bulb(ip, port=port)
+        self.lock = threading.Lock()
+        self.music_listener_lock = music_listener_lock or threading.Lock()
+        self._command_times = deque()
+        self._failures = 0
+        self._retry_at = 0.0
+        self._socket = None
+        self._last_command_at = time.monotonic()
+        self._music_idle_timer = None
+        self._notify_buffer = b""
+        # Обработчик NOTIFY props, которые yeelight прочитал, ожидая ответ на команду
+        self.on_notification: Optional[Callable[[Dict[str, Any]], None]] = None
+
+    @property
+    def music_mode(self) -> bool:
+        """Активен ли music mode (лампа подключена к нашему слушателю)"""
+        return self.bulb.music_mode
+
+    def open(self) -> bool:
+        """Открыть соединение, если оно ещё не открыто"""
+        with self.lock:
+            self._ensure_socket()
+        return True
+
+    def execute(self, method: str, *args, **kwargs) -> Any:
+        """Выполнить команду Bulb через постоянное соединение"""
+        with self.lock:
+            self._ensure_socket()
+            if not self.bulb.music_mode:
+                self._wait_for_rate_limit()
+                self._command_times.append(time.monotonic())
+            self._last_command_at = time.monotonic()
+            before = dict(self.bulb._last_properties)
+            try:
+                result = getattr(self.bulb, method)(*args, **kwargs)
+            except (BulbException, OSError) as e:
+                if not self._is_connection_error(e):
+                    raise
+                self._register_failure(e)
+                raise DeviceConnectionError(str(e), ip=self.ip) from e
+            self._failures = 0
+            captured = {
+                name: value
+                for name, value in self.bulb._last_properties.items()
+                if before.get(name) != value
+            }
+        if captured and self.on_notification:
+            self.on_notification(captured)
+        return result
+
+    def read_notifications(self, timeout: float) -> List[bytes]:
+        """Дочитать строки NOTIFY, пришедшие по общему соединению между командами"""
+        with self.lock:
+            self._ensure_socket()
+            # В music mode лампа ничего не присылает
+            sock = None if self.bulb.music_mode else self._socket
+        if sock is None:
+            time.sleep(timeout)
+            return []
+        try:
+            readable, _, _ = select.select([sock], [], [], timeout)
+        except (OSError, ValueError):
+            # Сокет закрыли параллельно, разберёмся под блокировкой
+            readable = [sock]
+        if not readable:
+            return []
+        with self.lock:
+            # Сокет могли пересоздать, а данные - прочитать вместе с ответом на команду
+            if self._socket is not sock or not select.select([sock], [], [], 0)[0]:
+                return []
+            try:
+                data = sock.recv(16 * 1024)
+                if not data:
+                    raise ConnectionResetError("Bulb closed the connection")
+            except OSError as e:
+                self._register_failure(e)
+                raise DeviceConnectionError(str(e), ip=self.ip) from e
+            *lines, self._notify_buffer = (self._notify_buffer + data).split(b"\r\n")
+        return lines
+
+    def start_music_mode(self) -> bool:
+        """Включить music mode: лампа подключается к локальному TCP слушателю, лимит команд снимается"""
+        if not settings.YEELIGHT_MUSIC_MODE_PORT:
+            raise DeviceOperationError(
+                "YEELIGHT_MUSIC_MODE_PORT must be a fixed published port", ip=self.ip
+            )
+        with self.lock:
+            if self.bulb.music_mode:
+                return True
+            self._ensure_socket()
+            self._wait_for_rate_limit()
+            self._command_times.extend([time.monotonic(), time.monotonic()])
+            try:
+                with self.music_listener_lock:
+                    self.bulb.start_music(
+                        port=settings.YEELIGHT_MUSIC_MODE_PORT,
+                        ip=settings.YEELIGHT_MUSIC_MODE_HOST,
+                    )
+            except (BulbException, OSError) as e:
+                self._register_failure(e)
+                raise DeviceConnectionError(str(e), ip=self.ip) from e
+            self._socket = self.bulb._socket
+            configure_keepalive(self._socket)
+            self._last_command_at = time.monotonic()
+            self._schedule_music_idle_check(settings.YEELIGHT_MUSIC_MODE_IDLE_TIMEOUT)
+        logger.info(
+            f"light_ctrl_014: Music mode \033[32mstarted\033[0m for \033[36m{self.ip}\033[0m"
+        )
+        return True
+
+    def stop_music_mode(self) -> bool:
+        """Выключить music mode и вернуться к обычному соединению"""
+        with self.lock:
+            self._stop_music_mode()
+        return True
+
+    def close(self):
+        """Закрыть соединение"""
+        with self.lock:
+            self._reset()
+
+    def _schedule_music_idle_check(self, delay: float):
+        """Запланировать проверку простоя music mode, даже если команд больше не будет"""
+        self._cancel_music_idle_check()
+        self._music_idle_timer = threading.Timer(delay, self._close_idle_music_mode)
+        self._music_idle_timer.daemon = True
+        self._music_idle_timer.start()
+
+    def _cancel_music_idle_check(self):
+        """Отменить запланированную проверку простоя"""
+        if self._music_idle_timer is not None:
+            self._music_idle_timer.cancel()
+            self._music_idle_timer = None
+
+    def _close_idle_music_mode(self):
+        """Выключить music mode после простоя: в нём лампа не присылает NOTIFY"""
+        with self.lock:
+            self._music_idle_timer = None
+            if not self.bulb.music_mode:
+                return
+            idle = time.monotonic() - self._last_command_at
+            if idle < settings.YEELIGHT_MUSIC_MODE_IDLE_TIMEOUT:
+                self._schedule_music_idle_check(
+                    settings.YEELIGHT_MUSIC_MODE_IDLE_TIMEOUT - idle
+                )
+                return
+            try:
+                self._stop_music_mode()
+            except DeviceConnectionError:
+                # Соединение уже сброшено в _register_failure
+                pass
+
+    def _stop_music_mode(self):
+        """Закрыть обратное соединение и отправить set_music 0 по обычному"""
+        self._cancel_music_idle_check()
+        if not self.bulb.music_mode:
+            return
+        try:
+            self.bulb.stop_music()
+            self._socket = self.bulb._socket
+            configure_keepalive(self._socket)
+        except (BulbException, OSError) as e:
+            self._register_failure(e)
+            raise DeviceConnectionError(str(e), ip=self.ip) from e
+        logger.info(
+            f"light_ctrl_015: Music mode \033[31mstopped\033[0m for \033[36m{self.ip}\033[0m"
+        )
+
+    def _ensure_socket(self):
+        """Проверить сокет и переподключиться с учётом backoff"""
+        now = time.monotonic()
+        if now < self._retry_at:
+            raise DeviceConnectionError(
+                f"Reconnect backoff for {self._retry_at - now:.1f}s", ip=self.ip
+            )
+        idle = now - self._last_command_at
+        if self.bulb.music_mode and idle > settings.YEELIGHT_MUSIC_MODE_IDLE_TIMEOUT:
+            self._stop_music_mode()
+        if self._socket is not None:
+            if not self._is_stale(self._socket):
+                return
+            self._reset()
+        try:
+            self._socket = self.bulb._socket
+            configure_keepalive(self._socket)
+        except OSError as e:
+            self._register_failure(e)
+            raise DeviceConnectionError(str(e), ip=self.ip) from e
+        logger.info(
+            f"light_ctrl_013: Opened pooled connection to \033[36m{self.ip}:{self.port}\033[0m"
+        )
+
+    def _is_stale(self, sock: socket.socket) -> bool:
+        """Лампа закрыла соединение: сокет читается, но данных нет"""
+        try:
+            readable, _, _ = select.select([sock], [], [], 0)
+            return bool(readable) and sock.recv(1, socket.MSG_PEEK) == b""
+        except (OSError, ValueError):
+            return True
+
+    def _wait_for_rate_limit(self):
+        """Соблюдать лимит Yeelight на количество команд в минуту"""
+        now = time.monotonic()
+        while self._command_times and now - self._command_times[0] >= 60:
+            self._command_times.popleft()
+        if len(self._command_times) < settings.YEELIGHT_COMMANDS_PER_MINUTE:
+            return
+        wait = 60 - (now - self._command_times[0])
+        if wait > settings.YEELIGHT_RATE_LIMIT_MAX_WAIT:
+            raise DeviceRateLimitError(
+                f"Command rate limit reached, retry in {wait:.1f}s", ip=self.ip
+            )
+        time.sleep(wait)
+        self._command_times.popleft()
+
+    def _is_connection_error(self, error: Exception) -> bool:
+        """Отличить обрыв соединения от ошибки, которую вернула сама лампа"""
+        if isinstance(error, OSError) or isinstance(error.__cause__, OSError):
+            return True
+        return error.args == ("Bulb closed the connection.",)
+
+    def _register_failure(self, error: Exception):
+        """Закрыть сокет и запланировать переподключение с экспоненциальной задержкой"""
+        self._reset()
+        self._failures += 1
+        delay = min(
+            settings.YEELIGHT_RECONNECT_BACKOFF_BASE * 2 ** (self._failures - 1),
+            settings.YEELIGHT_RECONNECT_BACKOFF_MAX,
+        )
+        self._retry_at = time.monotonic() + delay
+        logger.error(
+            f"light_ctrl_error_014: \033[31mConnection to \033[36m{self.ip}\033[31m failed \033[33m{self._failures}\033[31m time(s), retry in \033[33m{delay:.1f}s\033[31m: {str(error)}\033[0m"
+        )
+
+    def _reset(self):
+        """Сбросить сокет: yeelight создаст новый при следующей команде"""
+        self._cancel_music_idle_check()
+        self._notify_buffer = b""
+        if self._socket is not None:
+            self._socket.close()
+        self._socket = None
+        self.bulb = Bulb(self.ip, port=self.port)
+
+
+class BulbConnectionPool:
+    """Пул постоянных соединений: одно соединение на лампу"""
+
+    def __init__(self):
+        self.connections: Dict[str, BulbConnection] = {}
+        self.music_listener_lock = threading.Lock()
+        self._lock = threading.Lock()
+
+    def get_connection(self, ip: str, port: int = 55443) -> BulbConnection:
+        """Получить соединение с лампой, создав его при необходимости"""
+        with self._lock:
+            connection = self.connections.get(ip)
+            if connection is None:
+                connection = BulbConnection(
+                    ip, port, music_listener_lock=self.music_listener_lock
+                )
+                self.connections[ip] = connection
+            return connection
+
+    def close_all(self):
+        """Закрыть все соединения"""
+        with self._lock:
+            connections = list(self.connections.values())
+            self.connections.clear()
+        for connection in connections:
+            connection.close()
+
 
 class YeelightDevice:
     """Класс для представления найденного Yeelight устройства"""
 
-    def __init__(self, ip: str, port: int = 55443, properties: Dict = None):
+    def __init__(
+        self,
+        ip: str,
+        port: int = 55443,
+        properties: Dict = None,
+        connection: Optional[BulbConnection] = None,
+    ):
         self.ip = ip
         self.port = port
         self.properties = properties or {}
-        self.bulb = None
-        self.last_seen = time.time()
+        self.connection = connection or BulbConnection(ip, port)
+        self.subscribed = False
+        self._last_seen = time.time()
         self._connected = False
 
+    @property
+    def last_seen(self) -> float:
+        """Время последнего ответа; открытая подписка означает, что лампа на связи сейчас"""
+        if self.subscribed:
+            return time.time()
+        return self._last_seen
+
+    @last_seen.setter
+    def last_seen(self, value: float):
+        """Запомнить время последнего ответа лампы"""
+        self._last_seen = value
+
+    @property
+    def bulb(self) -> Bulb:
+        """Объект yeelight.Bulb текущего соединения"""
+        return self.connection.bulb
+
     @property
     def id(self):
         """Уникальный ID устройства"""
@@ -72,40 +419,148 @@ class YeelightDevice:
             return "#ffffff"  # Белый по умолчанию при ошибке
 
     def connect(self) -> bool:
-        """Подключиться к устройству"""
-        if self._connected and self.bulb:
-            return True
-
+        """Подключиться к устройству через пул соединений"""
         try:
-            self.bulb = Bulb(self.ip, port=self.port)
-            self.bulb.get_properties()
+            self.connection.open()
+            if not self._connected:
+                logger.info(
+                    f"light_ctrl_001: Connected to \033[35m{self.name}\033[0m (\033[36m{self.ip}\033[0m)"
+                )
             self._connected = True
-            logger.info(
-                f"light_ctrl_001: Connected to \033[35m{self.name}\033[0m (\033[36m{self.ip}\033[0m)"
-            )
             return True
-        except Exception as e:
+        except DeviceConnectionError as e:
             logger.error(
                 f"light_ctrl_error_001: \033[31mConnection failed to \033[36m{self.ip}\033[31m: {str(e)}\033[0m"
             )
             self._connected = False
             return False
 
-    def update_properties(self):
-        """Обновить свойства устройства"""
+    def apply_state(self, updates: Dict[str, str]):
+        """Оптимистично обновить кэш состояния после успешной команды"""
+        self.properties.update(updates)
+
+    def apply_notification(self, updates: Dict[str, Any]):
+        """Применить изменения из NOTIFY props, присланные лампой"""
+        self.properties.update({key: str(value) for key, value in updates.items()})
+        self.last_seen = time.time()
+
+    def plan_properties(self, *needs: str) -> List[str]:
+        """Список свойств для чтения: объединение наборов без тех, что держит свежими подписка"""
+        requested = list(
+            dict.fromkeys(name for need in needs for name in PROPERTY_SETS[need])
+        )
+        if self.subscribed:
+            requested = [name for name in requested if name not in self.properties]
+        return requested
+
+    def diff_properties(self, fetched: Dict[str, Any]) -> Dict[str, Any]:
+        """Применить прочитанные свойства и вернуть только изменившиеся"""
+        changed = {
+            name: value
+            for name, value in fetched.items()
+            if self.properties.get(name) != value
+        }
+        self.properties.update(changed)
+        return changed
+
+    def fetch_properties(self, *needs: str) -> Optional[Dict[str, Any]]:
+        """Прочитать нужные наборы свойств одним get_prop; вернуть изменения или None при ошибке"""
+        requested = self.plan_properties(*(needs or ("detail",)))
+        if not requested:
+            return {}
         if not self.connect():
-            return False
+            return None
 
         try:
-            self.properties.update(self.bulb.get_properties())
-            self.last_seen = time.time()
-            return True
-        except Exception as e:
+            fetched = self.connection.execute("get_properties", requested)
+        except (BulbException, DeviceError) as e:
             logger.error(
                 f"light_ctrl_error_002: \033[31mProperties update failed for \033[36m{self.ip}\033[31m: {str(e)}\033[0m"
             )
             self._connected = False
-            return False
+            return None
+        self.last_seen = time.time()
+        return self.diff_properties({name: fetched.get(name) for name in requested})
+
+    def update_properties(self, *needs: str) -> bool:
+        """Обновить свойства устройства (по умолчанию полный набор)"""
+        return self.fetch_properties(*needs) is not None
+
+
+class BulbNotificationListener:
+    """Фоновое чтение NOTIFY props из общего соединения лампы, обновляет таблицу состояний"""
+
+    def __init__(self, device: YeelightDevice):
+        self.device = device
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._failures = 0
+
+    def start(self):
+        """Запустить поток прослушивания"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(
+            target=self._run, name=f"yeelight-notify-{self.device.ip}", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        """Остановить поток; соединение остаётся в пуле"""
+        self._stop_event.set()
+        self.device.connection.on_notification = None
+        self.device.subscribed = False
+
+    def _run(self):
+        """Держать подписку открытой, переподключаясь с экспоненциальной задержкой"""
+        while not self._stop_event.is_set():
+            try:
+                self._listen()
+            except DeviceError as e:
+                if self._stop_event.is_set():
+                    break
+                self._failures += 1
+                delay = min(
+                    settings.YEELIGHT_RECONNECT_BACKOFF_BASE
+                    * 2 ** (self._failures - 1),
+                    settings.YEELIGHT_RECONNECT_BACKOFF_MAX,
+                )
+                logger.error(
+                    f"light_ctrl_error_018: \033[31mNotification listener for \033[36m{self.device.ip}\033[31m failed, retry in \033[33m{delay:.1f}s\033[31m: {str(e)}\033[0m"
+                )
+                self._stop_event.wait(delay)
+            finally:
+                self.device.subscribed = False
+
+    def _listen(self):
+        """Читать NOTIFY сообщения из пула, пока соединение живо"""
+        connection = self.device.connection
+        connection.open()
+        self.device.update_properties()
+        connection.on_notification = self.device.apply_notification
+        self.device.subscribed = True
+        self._failures = 0
+        logger.info(
+            f"light_ctrl_017: Subscribed to notifications from \033[36m{self.device.ip}\033[0m"
+        )
+        while not self._stop_event.is_set():
+            for line in connection.read_notifications(NOTIFY_POLL_INTERVAL):
+                self._handle_line(line)
+
+    def _handle_line(self, line: bytes):
+        """Разобрать одну строку протокола и применить props"""
+        if not line.strip():
+            return
+        try:
+            message = json.loads(line)
+        except ValueError:
+            logger.error(
+                f"light_ctrl_error_019: \033[31mInvalid notification from \033[36m{self.device.ip}\033[31m: {line!r}\033[0m"
+            )
+            return
+        if message.get("method") == "props":
+            self.device.apply_notification(message["params"])
 
 
 class LightController:
@@ -113,6 +568,14 @@ class LightController:
 
     def __init__(self):
         self.devices: Dict[str, YeelightDevice] = {}
+        self.devices_by_ip: Dict[str, YeelightDevice] = {}
+        self.pool = BulbConnectionPool()
+        self.listeners: Dict[str, BulbNotificationListener] = {}
+        self.listening = False
+        self.executor = ThreadPoolExecutor(
+            max_workers=settings.YEELIGHT_FANOUT_WORKERS,
+            thread_name_prefix="yeelight",
+        )
         self.scanning = False
         self.scan_thread = None
         self.auto_scan_enabled = False  # Автосканирование отключено
@@ -128,27 +591,19 @@ class LightController:
         try:
             # Используем встроенную функцию yeelight для обнаружения
             discovered = discover_bulbs(timeout=timeout)
-            found_devices = []
-
-            for bulb_info in discovered:
-                ip = bulb_info["ip"]
-                port = bulb_info.get("port", 55443)
-
-                # Создаем объект устройства
-                device = YeelightDevice(ip, port)
-
-                # Подключаемся и получаем свойства
-                if device.connect():
-                    device.update_properties()
-                    found_devices.append(device)
-
-                    # Добавляем или обновляем в списке устройств
-                    device_id = device.id
-                    self.devices[device_id] = device
-
-                    logger.info(
-                        f"light_ctrl_003: Found device \033[35m{device.name}\033[0m (\033[36m{device.ip}\033[0m)"
-                    )
+            devices = [
+                self.add_device(bulb_info["ip"], bulb_info.get("port", 55443))
+                for bulb_info in discovered
+            ]
+
+            # Подключаемся и получаем свойства всех ламп параллельно
+            results = self.fan_out(devices, YeelightDevice.update_properties)
+            found_devices = [device for device in devices if results[device.id]]
+
+            for device in found_devices:
+                logger.info(
+                    f"light_ctrl_003: Found device \033[35m{device.name}\033[0m (\033[36m{device.ip}\033[0m)"
+                )
 
             logger.info(
                 f"light_ctrl_004: Discovery complete: \033[33m{len(found_devices)}\033[0m devices found"
@@ -167,19 +622,154 @@ class LightController:
 
     def get_device_by_ip(self, ip: str) -> Optional[YeelightDevice]:
         """Получить устройство по IP"""
-        for device in self.devices.values():
-            if device.ip == ip:
-                return device
-        return None
+        return self.devices_by_ip.get(ip)
+
+    def add_device(
+        self,
+        ip: str,
+        port: int = 55443,
+        device_id: Optional[str] = None,
+        name: Optional[str] = None,
+    ) -> YeelightDevice:
+        """Зарегистрировать устройство по IP, переиспользуя существующее"""
+        known = self.devices.get(device_id) if device_id else None
+        if known and known.ip != ip:
+            # IP лампы поменяли в админке
+            self.remove_device(device_id)
+
+        device = self.devices_by_ip.get(ip)
+        if device is None:
+            device = YeelightDevice(
+                ip, port, connection=self.pool.get_connection(ip, port)
+            )
+            self.devices_by_ip[ip] = device
+        elif device_id and device.id != device_id:
+            # Найденная сканированием лампа получает постоянный ID из базы
+            self.devices.pop(device.id, None)
+        if device_id:
+            device.id = device_id
+        if name:
+            device.name = name
+        self.devices[device.id] = device
+        if self.listening:
+            self._start_listener(device)
+        return device
+
+    def remove_device(self, device_id: str):
+        """Убрать устройство и остановить его подписку"""
+        device = self.devices.pop(device_id, None)
+        if device is None:
+            return
+        if self.devices_by_ip.get(device.ip) is device:
+            del self.devices_by_ip[device.ip]
+        listener = self.listeners.pop(device.ip, None)
+        if listener:
+            listener.stop()
+
+    def load_devices(
+        self, devices: List[YeelightDevice], *needs: str
+    ) -> List[YeelightDevice]:
+        """Прочитать состояние ламп, подставив значения по умолчанию недоступным"""
+        results = self.fan_out(
+            [device for device in devices if not device.subscribed],
+            lambda device: device.update_properties(*needs),
+        )
+        for device in devices:
+            if not results.get(device.id) and not device.properties.get("power"):
+                device.properties.update(
+                    {"power": "off", "bright": 0, "ct": 4000, "rgb": 0}
+                )
+        return devices
 
     def get_all_devices(self) -> List[YeelightDevice]:
         """Получить все найденные устройства"""
         return list(self.devices.values())
 
-    def refresh_devices(self):
-        """Обновить информацию о всех устройствах"""
-        for device in self.devices.values():
-            device.update_properties()
+    def refresh_devices(self, *needs: str) -> Dict[str, Any]:
+        """Параллельно опросить устройства, у которых нет push-подписки; вернуть изменения"""
+        devices = [device for device in self.get_all_devices() if not device.subscribed]
+        return self.fan_out(devices, lambda device: device.fetch_properties(*needs))
+
+    def start_listening(self):
+        """Подписаться на NOTIFY всех ламп, чтобы отвечать о состоянии из памяти"""
+        if self.listening or not settings.YEELIGHT_NOTIFY_ENABLED:
+            return
+        self.listening = True
+        for device in self.get_all_devices():
+            self._start_listener(device)
+        logger.info(
+            f"light_ctrl_018: Notification listeners started for \033[33m{len(self.listeners)}\033[0m devices"
+        )
+
+    def stop_listening(self):
+        """Остановить все подписки на уведомления"""
+        self.listening = False
+        for listener in self.listeners.values():
+            listener.stop()
+        self.listeners.clear()
+
+    def _start_listener(self, device: YeelightDevice):
+        """Запустить слушатель для устройства, если он ещё не запущен"""
+        listener = self.listeners.get(device.ip)
+        if listener is None:
+            listener = BulbNotificationListener(device)
+            self.listeners[device.ip] = listener
+        listener.start()
+
+    def fan_out(
+        self,
+        devices: List[YeelightDevice],
+        action: Callable[[YeelightDevice], Any],
+        deadline: Optional[float] = None,
+    ) -> Dict[str, Any]:
+        """Выполнить действие на всех устройствах одновременно, к дедлайну вернуть частичные результаты"""
+        deadline = deadline or settings.YEELIGHT_DEVICE_DEADLINE
+        futures = {self.executor.submit(action, device): device for device in devices}
+        done, pending = wait(futures, timeout=deadline)
+
+        results = {}
+        for future in done:
+            device = futures[future]
+            try:
+                results[device.id] = future.result()
+            except Exception as e:
+                logger.error(
+                    f"light_ctrl_error_016: \033[31mParallel action failed for \033[36m{device.ip}\033[31m: {str(e)}\033[0m"
+                )
+                results[device.id] = None
+        for future in pending:
+            device = futures[future]
+            future.cancel()
+            logger.error(
+                f"light_ctrl_error_017: \033[31mDeadline \033[33m{deadline}s\033[31m exceeded for \033[36m{device.ip}\033[0m"
+            )
+            results[device.id] = None
+        return results
+
+    def execute_group_command(
+        self,
+        light_devices: Iterable[Any],
+        command: str,
+        *args,
+    ) -> Dict[int, bool]:
+        """Выполнить команду контроллера на физических лампах группы параллельно"""
+        devices = {
+            light_device.pk: self.add_device(
+                light_device.ip_address,
+                light_device.port,
+                device_id=str(light_device.pk),
+                name=light_device.name,
+            )
+            for light_device in light_devices
+        }
+        results = self.fan_out(
+            list(devices.values()),
+            lambda device: getattr(self, command)(device.id, *args),
+        )
+        logger.info(
+            f"light_ctrl_016: Group command \033[35m{command}\033[0m succeeded on \033[33m{sum(1 for ok in results.values() if ok)}/{len(devices)}\033[0m devices"
+        )
+        return {pk: bool(results[device.id]) for pk, device in devices.items()}
 
     def start_auto_scan(self):
         """Запустить автоматическое сканирование в фоне"""
@@ -220,17 +810,18 @@ class LightController:
             return False
 
         try:
-            device.bulb.turn_on()
+            device.connection.execute("turn_on")
+            device.apply_state({"power": "on"})
             if brightness is not None and 1 <= brightness <= 100:
-                device.bulb.set_brightness(brightness)
+                device.connection.execute("set_brightness", brightness)
+                device.apply_state({"bright": str(brightness)})
 
-            device.update_properties()
             logger.info(
                 f"light_ctrl_007: Device \033[35m{device.name}\033[0m turned \033[32mON\033[0m"
             )
             return True
 
-        except BulbException as e:
+        except (BulbException, DeviceError) as e:
             logger.error(
                 f"light_ctrl_error_005: \033[31mTurn ON failed for \033[35m{device.name}\033[31m: {str(e)}\033[0m"
             )
@@ -243,14 +834,14 @@ class LightController:
             return False
 
         try:
-            device.bulb.turn_off()
-            device.update_properties()
+            device.connection.execute("turn_off")
+            device.apply_state({"power": "off"})
             logger.info(
                 f"light_ctrl_008: Device \033[35m{device.name}\033[0m turned \033[31mOFF\033[0m"
             )
             return True
 
-        except BulbException as e:
+        except (BulbException, DeviceError) as e:
             logger.error(
                 f"light_ctrl_error_006: \033[31mTurn OFF failed for \033[35m{device.name}\033[31m: {str(e)}\033[0m"
             )
@@ -263,14 +854,18 @@ class LightController:
             return False
 
         try:
-            device.bulb.toggle()
-            device.update_properties()
+            if "power" not in device.properties and not device.update_properties(
+                "dashboard"
+            ):
+                return False
+            device.connection.execute("toggle")
+            device.apply_state({"power": "off" if device.is_on else "on"})
             logger.info(
                 f"light_ctrl_009: Device \033[35m{device.name}\033[0m \033[33mtoggled\033[0m"
             )
             return True
 
-        except BulbException as e:
+        except (BulbException, DeviceError) as e:
             logger.error(
                 f"light_ctrl_error_007: \033[31mToggle failed for \033[35m{device.name}\033[31m: {str(e)}\033[0m"
             )
@@ -289,14 +884,14 @@ class LightController:
             return False
 
         try:
-            device.bulb.set_brightness(brightness)
-            device.update_properties()
+            device.connection.execute("set_brightness", brightness)
+            device.apply_state({"bright": str(brightness)})
             logger.info(
                 f"light_ctrl_010: Brightness set to \033[33m{brightness}%\033[0m for \033[35m{device.name}\033[0m"
             )
             return True
 
-        except BulbException as e:
+        except (BulbException, DeviceError) as e:
             logger.error(
                 f"light_ctrl_error_009: \033[31mBrightness set failed for \033[35m{device.name}\033[31m: {str(e)}\033[0m"
             )
@@ -315,14 +910,14 @@ class LightController:
             return False
 
         try:
-            device.bulb.set_color_temp(temp)
-            device.update_properties()
+            device.connection.execute("set_color_temp", temp)
+            device.apply_state({"ct": str(temp), "color_mode": "2"})
             logger.info(
                 f"light_ctrl_011: Color temp set to \033[33m{temp}K\033[0m for \033[35m{device.name}\033[0m"
             )
             return True
 
-        except BulbException as e:
+        except (BulbException, DeviceError) as e:
             logger.error(
                 f"light_ctrl_error_011: \033[31mColor temp set failed for \033[35m{device.name}\033[31m: {str(e)}\033[0m"
             )
@@ -341,19 +936,64 @@ class LightController:
             return False
 
         try:
-            device.bulb.set_rgb(red, green, blue)
-            device.update_properties()
+            device.connection.execute("set_rgb", red, green, blue)
+            device.apply_state(
+                {"rgb": str((red << 16) + (green << 8) + blue), "color_mode": "1"}
+            )
             logger.info(
                 f"light_ctrl_012: RGB color set to \033[33m({red},{green},{blue})\033[0m for \033[35m{device.name}\033[0m"
             )
             return True
 
-        except BulbException as e:
+        except (BulbException, DeviceError) as e:
             logger.error(
                 f"light_ctrl_error_013: \033[31mRGB set failed for \033[35m{device.name}\033[31m: {str(e)}\033[0m"
             )
             return False
 
+    def apply_plan(
+        self,
+        device_id: str,
+        commands: List[Tuple[str, tuple]],
+        state: Dict[str, str],
+    ) -> bool:
+        """Выполнить подготовленный план команд и обновить кэш состояния"""
+        device = self.get_device(device_id)
+        if not device or not device.connect():
+            return False
+
+        try:
+            for method, args in commands:
+                device.connection.execute(method, *args)
+            device.apply_state(state)
+            logger.info(
+                f"light_ctrl_019: Plan of \033[33m{len(commands)}\033[0m commands applied to \033[35m{device.name}\033[0m"
+            )
+            return True
+
+        except (BulbException, DeviceError) as e:
+            logger.error(
+                f"light_ctrl_error_020: \033[31mPlan failed for \033[35m{device.name}\033[31m: {str(e)}\033[0m"
+            )
+            return False
+
+    def set_music_mode(self, device_id: str, enabled: bool) -> bool:
+        """Включить или выключить music mode для потоковых команд"""
+        device = self.get_device(device_id)
+        if not device:
+            return False
+
+        try:
+            if enabled:
+                return device.connection.start_music_mode()
+            return device.connection.stop_music_mode()
+
+        except (BulbException, DeviceError) as e:
+            logger.error(
+                f"light_ctrl_error_015: \033[31mMusic mode switch failed for \033[35m{device.name}\033[31m: {str(e)}\033[0m"
+            )
+            return False
+
 
 # Глобальный экземпляр контроллера
 light_controller = LightController()
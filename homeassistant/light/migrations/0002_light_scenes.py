@@ -0,0 +1,116 @@
+# Generated by Django 5.2.18 on 2026-10-18 06:32
+
+import django.core.validators
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("light", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="LightScene",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "name",
+                    models.CharField(max_length=100, verbose_name="Название сцены"),
+                ),
+                (
+                    "assistant_request",
+                    models.CharField(
+                        blank=True,
+                        help_text="Текст assistant_request кнопки, который включает сцену без LLM",
+                        max_length=255,
+                        verbose_name="Запрос ассистента",
+                    ),
+                ),
+                (
+                    "is_active",
+                    models.BooleanField(default=True, verbose_name="Активна"),
+                ),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                "verbose_name": "Сцена освещения",
+                "verbose_name_plural": "Сцены освещения",
+            },
+        ),
+        migrations.CreateModel(
+            name="LightSceneState",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("is_on", models.BooleanField(default=True, verbose_name="Включен")),
+                (
+                    "brightness",
+                    models.PositiveIntegerField(
+                        blank=True,
+                        null=True,
+                        validators=[
+                            django.core.validators.MinValueValidator(1),
+                            django.core.validators.MaxValueValidator(100),
+                        ],
+                        verbose_name="Яркость (%)",
+                    ),
+                ),
+                (
+                    "color_temp",
+                    models.PositiveIntegerField(
+                        blank=True,
+                        null=True,
+                        validators=[
+                            django.core.validators.MinValueValidator(1700),
+                            django.core.validators.MaxValueValidator(6500),
+                        ],
+                        verbose_name="Цветовая температура (K)",
+                    ),
+                ),
+                (
+                    "rgb_color",
+                    models.CharField(blank=True, max_length=7, verbose_name="RGB цвет"),
+                ),
+                (
+                    "device",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="light.lightdevice",
+                        verbose_name="Устройство",
+                    ),
+                ),
+                (
+                    "scene",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="states",
+                        to="light.lightscene",
+                        verbose_name="Сцена",
+                    ),
+                ),
+            ],
+            options={
+                "verbose_name": "Состояние лампы в сцене",
+                "verbose_name_plural": "Состояния ламп в сцене",
+                "unique_together": {("scene", "device")},
+            },
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.18 on 2026-10-18 07:08
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("light", "0002_light_scenes"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="lightscenestate",
+            name="rgb_color",
+            field=models.CharField(
+                blank=True,
+                max_length=7,
+                validators=[
+                    django.core.validators.RegexValidator(
+                        "^#?[0-9A-Fa-f]{6}$", "Цвет в формате #RRGGBB"
+                    )
+                ],
+                verbose_name="RGB цвет",
+            ),
+        ),
+    ]
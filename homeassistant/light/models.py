@@ -1,5 +1,17 @@
-from django.core.validators import MaxValueValidator, MinValueValidator
-from django.db import models
+from django.core.validators import (
+    MaxValueValidator,
+    MinValueValidator,
+    RegexValidator,
+)
+from django.db import models, transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .device_registry import device_registry, notify_devices_changed
+from .light_controller import light_controller
+from .scenes import RGB_COLOR_PATTERN
+from .scheduler import notify_schedules_changed
 
 
 class LightDevice(models.Model):
@@ -74,19 +86,37 @@ class LightGroup(models.Model):
     def __str__(self):
         return self.name
 
-    def turn_on_all(self):
+    def turn_on_all(self) -> dict[int, bool]:
         """Включить все устройства в группе"""
-        for device in self.devices.filter(is_active=True):
-            state, created = LightState.objects.get_or_create(device=device)
-            state.is_on = True
-            state.save()
+        return self.set_power_all(True)
 
-    def turn_off_all(self):
+    def turn_off_all(self) -> dict[int, bool]:
         """Выключить все устройства в группе"""
-        for device in self.devices.filter(is_active=True):
-            state, created = LightState.objects.get_or_create(device=device)
-            state.is_on = False
-            state.save()
+        return self.set_power_all(False)
+
+    def set_power_all(self, is_on: bool) -> dict[int, bool]:
+        """Переключить питание всех ламп группы параллельно и сохранить состояние"""
+        devices = list(self.devices.filter(is_active=True))
+        results = light_controller.execute_group_command(
+            devices, "turn_on" if is_on else "turn_off"
+        )
+        succeeded = [device for device in devices if results[device.pk]]
+        existing = set(
+            LightState.objects.filter(device__in=succeeded).values_list(
+                "device_id", flat=True
+            )
+        )
+        LightState.objects.filter(device_id__in=existing).update(
+            is_on=is_on, last_updated=timezone.now()
+        )
+        LightState.objects.bulk_create(
+            [
+                LightState(device=device, is_on=is_on)
+                for device in succeeded
+                if device.pk not in existing
+            ]
+        )
+        return results
 
 
 class LightSchedule(models.Model):
@@ -140,3 +170,86 @@ class LightSchedule(models.Model):
 
     def __str__(self):
         return f"{self.name} - {self.time}"
+
+
+class LightScene(models.Model):
+    name = models.CharField(max_length=100, verbose_name="Название сцены")
+    assistant_request = models.CharField(
+        max_length=255,
+        blank=True,
+        verbose_name="Запрос ассистента",
+        help_text="Текст assistant_request кнопки, который включает сцену без LLM",
+    )
+    is_active = models.BooleanField(default=True, verbose_name="Активна")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Сцена освещения"
+        verbose_name_plural = "Сцены освещения"
+
+    def __str__(self):
+        return self.name
+
+    def apply(self) -> dict[str, bool]:
+        """Применить сцену ко всем лампам одновременно"""
+        from .scenes import apply_scene
+
+        return apply_scene(self)
+
+
+class LightSceneState(models.Model):
+    scene = models.ForeignKey(
+        LightScene,
+        on_delete=models.CASCADE,
+        related_name="states",
+        verbose_name="Сцена",
+    )
+    device = models.ForeignKey(
+        LightDevice, on_delete=models.CASCADE, verbose_name="Устройство"
+    )
+    is_on = models.BooleanField(default=True, verbose_name="Включен")
+    brightness = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        validators=[MinValueValidator(1), MaxValueValidator(100)],
+        verbose_name="Яркость (%)",
+    )
+    color_temp = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        validators=[MinValueValidator(1700), MaxValueValidator(6500)],
+        verbose_name="Цветовая температура (K)",
+    )
+    rgb_color = models.CharField(
+        max_length=7,
+        blank=True,
+        validators=[RegexValidator(RGB_COLOR_PATTERN, "Цвет в формате #RRGGBB")],
+        verbose_name="RGB цвет",
+    )
+
+    class Meta:
+        verbose_name = "Состояние лампы в сцене"
+        verbose_name_plural = "Состояния ламп в сцене"
+        unique_together = ("scene", "device")
+
+    def __str__(self):
+        return f"{self.scene.name}: {self.device.name}"
+
+
+@receiver(post_save, sender=LightDevice)
+@receiver(post_delete, sender=LightDevice)
+@receiver(post_save, sender=LightGroup)
+@receiver(post_delete, sender=LightGroup)
+@receiver(m2m_changed, sender=LightGroup.devices.through)
+def invalidate_device_registry(sender, **kwargs):
+    """Перестроить реестр устройств после изменений в админке, здесь и в других процессах"""
+    device_registry.invalidate()
+    transaction.on_commit(notify_devices_changed)
+
+
+@receiver(post_save, sender=LightSchedule)
+@receiver(post_delete, sender=LightSchedule)
+def reload_light_scheduler(sender, **kwargs):
+    """Перезагрузить таймеры планировщика после изменения расписания"""
+    # Планировщик перечитывает базу, поэтому сообщаем ему только после коммита
+    transaction.on_commit(notify_schedules_changed)
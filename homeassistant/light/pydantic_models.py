@@ -48,3 +48,6 @@ class LightStateAggregate(BaseModel):
     quick_actions: List[AssistantButton] = Field(
         description="2 quick action buttons (e.g., 'Включить все', 'Выключить все')"
     )
+    version: int = Field(
+        default=0, description="Monotonic version, bumped on every published change"
+    )
@@ -0,0 +1,181 @@
+import logging
+import re
+from typing import Dict, List, Optional, Tuple
+
+from yeelight import SceneClass
+
+from .device_registry import device_registry
+from .light_controller import YeelightDevice, light_controller
+
+logger = logging.getLogger(__name__)
+
+Command = Tuple[str, tuple]
+
+# Цвет сцены: #RRGGBB, решётка необязательна
+RGB_COLOR_PATTERN = r"^#?[0-9A-Fa-f]{6}$"
+
+
+def target_state(
+    is_on: bool,
+    brightness: Optional[int] = None,
+    color_temp: Optional[int] = None,
+    rgb_color: str = "",
+) -> Dict[str, str]:
+    """Целевое состояние лампы в формате свойств Yeelight"""
+    if not is_on:
+        return {"power": "off"}
+    state = {"power": "on"}
+    if brightness:
+        state["bright"] = str(brightness)
+    if rgb_color and not re.match(RGB_COLOR_PATTERN, rgb_color):
+        # Значение из базы могло обойти валидацию формы, лампа получит остальные поля
+        logger.error(
+            f"light_scenes_error_001: \033[31mInvalid RGB color \033[33m{rgb_color!r}\033[31m ignored\033[0m"
+        )
+        rgb_color = ""
+    if rgb_color:
+        state["rgb"] = str(int(rgb_color.lstrip("#"), 16))
+        state["color_mode"] = "1"
+    elif color_temp:
+        state["ct"] = str(color_temp)
+        state["color_mode"] = "2"
+    return state
+
+
+def supports_scene(device: YeelightDevice) -> bool:
+    """Поддерживает ли лампа set_scene; без данных SSDP считаем, что да"""
+    return "set_scene" in device.properties.get("support", "set_scene")
+
+
+def current_state(device: YeelightDevice) -> Dict[str, str]:
+    """Текущее состояние лампы из кэша свойств в формате target_state"""
+    properties = device.properties
+    rgb_color = ""
+    if properties.get("color_mode") == "1" and properties.get("rgb"):
+        rgb_color = f"#{int(properties['rgb']):06X}"
+    return target_state(
+        properties.get("power") == "on",
+        int(properties.get("bright") or 0) or None,
+        int(properties.get("ct") or 0) or None,
+        rgb_color,
+    )
+
+
+def compile_commands(
+    device: YeelightDevice, state: Dict[str, str], force: bool = False
+) -> List[Command]:
+    """Минимальный список команд, переводящий лампу в целевое состояние"""
+    # Подписка держит кэш точным, поэтому совпадающие поля можно не отправлять
+    current = device.properties if device.subscribed and not force else {}
+    pending = {key: value for key, value in state.items() if current.get(key) != value}
+    if "color_mode" in pending:
+        # Смена режима требует повторить команду цвета
+        pending.update({key: state[key] for key in ("rgb", "ct") if key in state})
+    if not pending:
+        return []
+    if state["power"] == "off":
+        return [("turn_off", ())]
+
+    bright = int(state.get("bright") or device.properties.get("bright") or 100)
+    if "rgb" in pending and supports_scene(device):
+        rgb = int(state["rgb"])
+        return [
+            (
+                "set_scene",
+                (SceneClass.COLOR, rgb >> 16, (rgb >> 8) & 0xFF, rgb & 0xFF, bright),
+            )
+        ]
+    if "ct" in pending and supports_scene(device):
+        return [("set_scene", (SceneClass.CT, int(state["ct"]), bright))]
+
+    commands = []
+    if "power" in pending:
+        commands.append(("turn_on", ()))
+    if "rgb" in pending:
+        rgb = int(state["rgb"])
+        commands.append(("set_rgb", (rgb >> 16, (rgb >> 8) & 0xFF, rgb & 0xFF)))
+    elif "ct" in pending:
+        commands.append(("set_color_temp", (int(state["ct"]),)))
+    if "bright" in pending:
+        commands.append(("set_brightness", (int(state["bright"]),)))
+    return commands
+
+
+def compile_scene(scene) -> Dict[str, Tuple[List[Command], Dict[str, str]]]:
+    """План сцены: команды и ожидаемое состояние для каждой лампы"""
+    plan = {}
+    for target in scene.states.filter(device__is_active=True):
+        device = device_registry.get(target.device_id)
+        if device is None:
+            continue
+        state = target_state(
+            target.is_on, target.brightness, target.color_temp, target.rgb_color
+        )
+        plan[device.id] = (compile_commands(device, state), state)
+    return plan
+
+
+def apply_scene(scene) -> Dict[str, bool]:
+    """Применить сцену ко всем лампам параллельно: все лампы или ни одной"""
+    plan = compile_scene(scene)
+    # Лампы, уже находящиеся в нужном состоянии, не трогаем
+    devices = [
+        device_registry.get(device_id)
+        for device_id, (commands, _) in plan.items()
+        if commands
+    ]
+    # Снимок состояния до сцены, чтобы откатить лампы при частичном сбое
+    snapshot = light_controller.fan_out(
+        devices, lambda device: device.update_properties("status")
+    )
+    if not all(snapshot.values()):
+        logger.error(
+            f"light_scenes_error_002: \033[31mScene \033[35m{scene.name}\033[31m not applied: \033[33m{len(devices) - sum(map(bool, snapshot.values()))}\033[31m devices unreachable\033[0m"
+        )
+        return {device_id: False for device_id in plan}
+    previous = {device.id: current_state(device) for device in devices}
+
+    results = light_controller.fan_out(
+        devices,
+        lambda device: light_controller.apply_plan(device.id, *plan[device.id]),
+    )
+    results = {device_id: bool(results.get(device_id, True)) for device_id in plan}
+    if not all(results.values()):
+        rollback(scene, devices, previous)
+        return {device_id: False for device_id in plan}
+    logger.info(
+        f"light_scenes_001: Scene \033[35m{scene.name}\033[0m applied to \033[33m{sum(results.values())}/{len(plan)}\033[0m devices"
+    )
+    return results
+
+
+def rollback(scene, devices: List[YeelightDevice], previous: Dict[str, Dict[str, str]]):
+    """Вернуть лампы сцены в снятое до неё состояние"""
+    # Упавшая лампа могла выполнить часть команд, поэтому кэшу не доверяем
+    restored = light_controller.fan_out(
+        devices,
+        lambda device: light_controller.apply_plan(
+            device.id,
+            compile_commands(device, previous[device.id], force=True),
+            previous[device.id],
+        ),
+    )
+    logger.error(
+        f"light_scenes_error_003: \033[31mScene \033[35m{scene.name}\033[31m failed, rolled back \033[33m{sum(map(bool, restored.values()))}/{len(devices)}\033[31m devices\033[0m"
+    )
+
+
+def find_scene(assistant_request: str):
+    """Сцена, привязанная к тексту assistant_request кнопки"""
+    from .models import LightScene
+
+    if not assistant_request:
+        return None
+    # SQLite сравнивает без учёта регистра только ASCII, поэтому сравниваем в Python
+    request = assistant_request.strip().casefold()
+    for scene in LightScene.objects.filter(is_active=True).exclude(
+        assistant_request=""
+    ):
+        if scene.assistant_request.strip().casefold() == request:
+            return scene
+    return None
@@ -0,0 +1,257 @@
+import heapq
+import logging
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from django.conf import settings
+from django.utils import timezone
+
+from homeassistant.device_events import mark_activity
+
+from .device_registry import DeviceRegistry, device_registry
+from .light_controller import LightController, YeelightDevice, light_controller
+
+logger = logging.getLogger(__name__)
+
+# Потолок сна: поток сверяется с часами, даже если ближайшее срабатывание далеко
+MAX_SLEEP = 60
+
+
+def next_fire_time(schedule, after: datetime) -> Optional[datetime]:
+    """Ближайшее время срабатывания расписания строго после after"""
+    days = {int(day) for day in schedule.days_of_week or []}
+    local_after = timezone.localtime(after)
+    for offset in range(8):
+        day = local_after.date() + timedelta(days=offset)
+        if days and day.weekday() not in days:
+            continue
+        candidate = timezone.make_aware(datetime.combine(day, schedule.time))
+        if candidate > after:
+            return candidate
+    return None
+
+
+def notify_schedules_changed():
+    """Сообщить процессу планировщика, что расписания изменились"""
+    light_scheduler.request_reload()
+    try:
+        from homeassistant.redis_client import redis_client
+
+        redis_client.redis_client.publish(settings.LIGHT_SCHEDULER_CHANNEL, "reload")
+    except Exception as e:
+        logger.error(
+            f"light_scheduler_error_001: \033[31mReload notification failed: {str(e)}\033[0m"
+        )
+
+
+class LightScheduler:
+    """Исполнитель LightSchedule: таймеры в куче, поток спит до ближайшего срабатывания"""
+
+    def __init__(self, controller: LightController, registry: DeviceRegistry):
+        self.controller = controller
+        self.registry = registry
+        self.schedules = {}
+        self.metrics = {
+            "fired": 0,
+            "missed": 0,
+            "failed_devices": 0,
+            "latency_last": 0.0,
+            "latency_max": 0.0,
+            "latency_total": 0.0,
+        }
+        self._heap: List[Tuple[datetime, int]] = []
+        # Последнее снятое с кучи срабатывание: перезагрузка не повторит его
+        self._last_fired: Dict[int, datetime] = {}
+        self._loaded = False
+        self._condition = threading.Condition()
+        self._reload_requested = False
+        self._stop_event = threading.Event()
+
+    def reload(self, now: Optional[datetime] = None):
+        """Перечитать активные расписания и перестроить кучу таймеров"""
+        from .models import LightSchedule
+
+        now = now or timezone.now()
+        # Сигналы сохранения ламп и групп срабатывают в веб-процессе, здесь их нет
+        self.registry.invalidate()
+        grace_start = now - timedelta(seconds=settings.LIGHT_SCHEDULER_MISFIRE_GRACE)
+        schedules = {
+            schedule.pk: schedule
+            for schedule in LightSchedule.objects.filter(is_active=True)
+        }
+        heap = []
+        with self._condition:
+            for schedule in schedules.values():
+                last_fired = self._last_fired.get(schedule.pk)
+                if last_fired:
+                    after = max(last_fired, grace_start)
+                elif not self._loaded:
+                    # Срабатывание, пропущенное в пределах допуска при старте, ещё выполнится
+                    after = grace_start
+                else:
+                    after = now
+                fire_at = next_fire_time(schedule, after)
+                if fire_at:
+                    heap.append((fire_at, schedule.pk))
+            heapq.heapify(heap)
+            self.schedules = schedules
+            self._heap = heap
+            self._last_fired = {
+                pk: fired for pk, fired in self._last_fired.items() if pk in schedules
+            }
+            self._loaded = True
+        logger.info(
+            f"light_scheduler_001: Loaded \033[33m{len(heap)}\033[0m schedules, next at \033[33m{heap[0][0] if heap else '-'}\033[0m"
+        )
+
+    def request_reload(self):
+        """Перечитать расписания при следующем пробуждении потока"""
+        with self._condition:
+            self._reload_requested = True
+            self._condition.notify_all()
+
+    def stop(self):
+        """Остановить цикл планировщика"""
+        self._stop_event.set()
+        with self._condition:
+            self._condition.notify_all()
+
+    def seconds_until_next(self, now: Optional[datetime] = None) -> float:
+        """Сколько спать до ближайшего срабатывания"""
+        now = now or timezone.now()
+        with self._condition:
+            if not self._heap:
+                return MAX_SLEEP
+            delay = (self._heap[0][0] - now).total_seconds()
+        return min(max(delay, 0), MAX_SLEEP)
+
+    def pop_due(self, now: Optional[datetime] = None) -> List[Tuple[datetime, object]]:
+        """Снять с кучи наступившие срабатывания и запланировать следующие"""
+        now = now or timezone.now()
+        grace = timedelta(seconds=settings.LIGHT_SCHEDULER_MISFIRE_GRACE)
+        due = []
+        with self._condition:
+            while self._heap and self._heap[0][0] <= now:
+                fire_at, schedule_id = heapq.heappop(self._heap)
+                schedule = self.schedules[schedule_id]
+                self._last_fired[schedule_id] = fire_at
+                next_at = next_fire_time(schedule, fire_at)
+                if next_at:
+                    heapq.heappush(self._heap, (next_at, schedule_id))
+                if now - fire_at > grace:
+                    self.metrics["missed"] += 1
+                    logger.error(
+                        f"light_scheduler_error_002: \033[31mMissed \033[35m{schedule.name}\033[31m at \033[33m{fire_at}\033[31m, late by \033[33m{(now - fire_at).total_seconds():.1f}s\033[0m"
+                    )
+                    continue
+                due.append((fire_at, schedule))
+        return due
+
+    def get_targets(self, schedule) -> List[YeelightDevice]:
+        """Лампы расписания: отдельное устройство или вся группа"""
+        if schedule.device_id:
+            device = self.registry.get(schedule.device_id)
+            return [device] if device else []
+        if schedule.group_id:
+            return self.registry.get_by_group(schedule.group_id)
+        return []
+
+    def execute(self, schedule, device: YeelightDevice) -> bool:
+        """Выполнить действие расписания на одной лампе"""
+        if schedule.action == "turn_on":
+            return self.controller.turn_on(device.id, schedule.brightness)
+        return self.controller.turn_off(device.id)
+
+    def dispatch(self, due: List[Tuple[datetime, object]]):
+        """Выполнить все наступившие расписания на всех лампах параллельно"""
+        # Если лампа попала в несколько расписаний одного момента, побеждает последнее
+        jobs: Dict[str, Tuple[datetime, object, YeelightDevice]] = {}
+        for fire_at, schedule in due:
+            for device in self.get_targets(schedule):
+                jobs[device.id] = (fire_at, schedule, device)
+
+        results = self.controller.fan_out(
+            [device for _, _, device in jobs.values()],
+            lambda device: self.execute(jobs[device.id][1], device),
+        )
+        finished_at = timezone.now()
+        if any(results.values()):
+            # Дашборд увидит изменения, не дожидаясь следующего опроса
+            mark_activity(command=True)
+
+        for fire_at, schedule in due:
+            devices = [job[2] for job in jobs.values() if job[1] is schedule]
+            succeeded = sum(1 for device in devices if results.get(device.id))
+            latency = (finished_at - fire_at).total_seconds()
+            self.metrics["fired"] += 1
+            self.metrics["failed_devices"] += len(devices) - succeeded
+            self.metrics["latency_last"] = latency
+            self.metrics["latency_max"] = max(self.metrics["latency_max"], latency)
+            self.metrics["latency_total"] += latency
+            logger.info(
+                f"light_scheduler_002: Fired \033[35m{schedule.name}\033[0m on \033[33m{succeeded}/{len(devices)}\033[0m devices, latency \033[33m{latency:.3f}s\033[0m"
+            )
+
+    def get_metrics(self) -> dict:
+        """Счётчики срабатываний, пропусков и задержки исполнения"""
+        metrics = dict(self.metrics)
+        metrics["latency_avg"] = (
+            metrics["latency_total"] / metrics["fired"] if metrics["fired"] else 0.0
+        )
+        return metrics
+
+    def run_forever(self):
+        """Главный цикл: спать до ближайшего таймера или до сигнала перезагрузки"""
+        self._stop_event.clear()
+        self.reload()
+        while not self._stop_event.is_set():
+            with self._condition:
+                self._condition.wait_for(
+                    lambda: self._reload_requested or self._stop_event.is_set(),
+                    self.seconds_until_next(),
+                )
+                reload_requested = self._reload_requested
+                self._reload_requested = False
+            try:
+                if reload_requested:
+                    self.reload()
+                due = self.pop_due()
+                if due:
+                    self.dispatch(due)
+            except Exception as e:
+                logger.error(
+                    f"light_scheduler_error_003: \033[31mScheduler loop failed: {str(e)}\033[0m"
+                )
+
+    def listen_for_changes(self):
+        """Подписка на Redis канал: сохранения расписаний в других процессах перезагружают кучу"""
+        from homeassistant.redis_client import redis_client
+
+        while not self._stop_event.is_set():
+            try:
+                pubsub = redis_client.redis_client.pubsub(
+                    ignore_subscribe_messages=True
+                )
+                pubsub.subscribe(settings.LIGHT_SCHEDULER_CHANNEL)
+                while not self._stop_event.is_set():
+                    if pubsub.get_message(timeout=1.0):
+                        self.request_reload()
+            except Exception as e:
+                logger.error(
+                    f"light_scheduler_error_004: \033[31mReload subscription lost: {str(e)}\033[0m"
+                )
+                time.sleep(5)
+
+    def start_listening(self):
+        """Запустить потоки подписки на изменения расписаний, ламп и групп"""
+        # Правки ламп только сбрасывают реестр, кучу таймеров они не трогают
+        self.registry.start_listening()
+        threading.Thread(
+            target=self.listen_for_changes, name="light-schedule-reload", daemon=True
+        ).start()
+
+
+# Глобальный планировщик, цикл запускает команда run_scheduler
+light_scheduler = LightScheduler(light_controller, device_registry)
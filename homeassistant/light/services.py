@@ -96,18 +96,21 @@ class YeelightDevice(DeviceInterface):
 class LightStateService:
     """Service for retrieving aggregated light device states"""
 
-    def get_all_devices_state(self):
+    def __init__(self):
+        from homeassistant.device_events import AggregatePublisher
+
+        self.publisher = AggregatePublisher("light", "smarthome_light")
+
+    def get_devices(self):
         """
-        Get current state of all light devices
+        Get current state of every light device
         TODO: Replace with real device polling
         """
-        from archie_shared.ui.models import AssistantButton
-
-        from .pydantic_models import LightDeviceState, LightStateAggregate
+        from .pydantic_models import LightDeviceState
 
         logger.info("light_services_007: Fetching light devices state (mock data)")
 
-        devices = [
+        return [
             LightDeviceState(
                 device_id="light_001",
                 name="Торшер гостиная",
@@ -146,6 +149,12 @@ class LightStateService:
             ),
         ]
 
+    def build_aggregate(self, devices):
+        """Light widget aggregate for the given device states"""
+        from archie_shared.ui.models import AssistantButton
+
+        from .pydantic_models import LightStateAggregate
+
         on_count = sum(1 for d in devices if d.is_on)
 
         quick_actions = [
@@ -173,20 +182,38 @@ class LightStateService:
             quick_actions=quick_actions,
         )
 
-    def save_to_redis(self, user_name: str = "Niko"):
-        """Save light state to user_state in Redis"""
-        from homeassistant.redis_client import redis_client
+    def get_all_devices_state(self):
+        """Get aggregated state of all light devices"""
+        return self.build_aggregate(self.get_devices())
+
+    def save_to_redis(self, user_names: list[str]) -> int | None:
+        """
+        Log light state changes to the event stream, save the derived snapshot to user_state
+
+        Returns the number of changed devices, None on failure
+        """
+        from homeassistant.device_events import device_event_log
 
-        state = self.get_all_devices_state()
+        from .pydantic_models import LightDeviceState
 
         try:
-            redis_client.update_user_state(
-                user_name, {"smarthome_light": state.model_dump()}, ttl=None
+            changed = device_event_log.append(
+                "light",
+                {
+                    device.device_id: device.model_dump()
+                    for device in self.get_devices()
+                },
             )
-            logger.info(
-                f"light_services_008: Saved light state to user_state:name:{user_name}"
+            snapshot = device_event_log.snapshot("light")
+            state = self.build_aggregate(
+                [LightDeviceState(**device) for device in snapshot.values()]
             )
-            return True
+            # Polled once, written to every user's state only if the aggregate changed
+            if self.publisher.publish(state.model_dump(), user_names) is None:
+                logger.info(
+                    "light_services_008: Light state unchanged, Redis write skipped"
+                )
+            return len(changed)
         except Exception as e:
             logger.error(f"light_services_error_001: Failed to save to Redis: {e}")
-            return False
+            return None
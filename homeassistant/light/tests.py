@@ -1,10 +1,50 @@
+import asyncio
 import json
+import socket
+import threading
+import time
+from datetime import datetime
+from datetime import time as dt_time
+from datetime import timedelta
+from unittest import skipIf
+from unittest.mock import PropertyMock, patch
 
 from django.contrib.auth.models import User
-from django.test import Client, TestCase
+from django.core.exceptions import ValidationError
+from django.test import Client, TestCase, override_settings
 from django.urls import reverse
-
-from .models import LightDevice, LightGroup, LightSchedule, LightState
+from django.utils import timezone
+from yeelight import SceneClass
+
+from homeassistant.redis_client import RedisClient
+
+from .api_views import MUSIC_MODE_OWNER_KEY, claim_music_mode
+from .async_light_controller import AsyncLightController
+from .device_registry import DeviceRegistry
+from .discovery import DiscoveryService
+from .exceptions import DeviceConnectionError, DeviceRateLimitError
+from .light_controller import (
+    BulbConnection,
+    BulbConnectionPool,
+    BulbNotificationListener,
+    LightController,
+    YeelightDevice,
+)
+from .models import (
+    LightDevice,
+    LightGroup,
+    LightScene,
+    LightSceneState,
+    LightSchedule,
+    LightState,
+)
+from .scenes import compile_commands, find_scene, target_state
+from .scheduler import LightScheduler, next_fire_time
+
+try:
+    import fakeredis
+except ImportError:
+    fakeredis = None
 
 
 class LightDeviceModelTest(TestCase):
@@ -65,6 +105,19 @@ class LightGroupModelTest(TestCase):
     def test_group_str(self):
         self.assertEqual(str(self.group), "Группа гостиной")
 
+    @patch("homeassistant.light.models.light_controller.execute_group_command")
+    def test_turn_on_all_records_only_reachable_devices(self, execute_group_command):
+        execute_group_command.return_value = {
+            self.device1.pk: True,
+            self.device2.pk: False,
+        }
+
+        results = self.group.turn_on_all()
+
+        self.assertEqual(results[self.device1.pk], True)
+        self.assertTrue(LightState.objects.get(device=self.device1).is_on)
+        self.assertFalse(LightState.objects.filter(device=self.device2).exists())
+
 
 class LightViewsTest(TestCase):
     def setUp(self):
@@ -165,6 +218,49 @@ class LightAPITest(TestCase):
         # Аналогично другим тестам
         self.assertIn(response.status_code, [200, 400])
 
+    def test_music_mode_requires_boolean(self):
+        response = self.client.post(
+            reverse("light:api_device_music_mode", args=[self.device.id]),
+            data=json.dumps({"enabled": "false"}),
+            content_type="application/json",
+        )
+
+        self.assertEqual(response.status_code, 400)
+
+    @skipIf(fakeredis is None, "fakeredis is not installed")
+    def test_music_mode_is_claimed_by_one_process(self):
+        storage = RedisClient(fakeredis.FakeRedis(decode_responses=True))
+
+        with patch("homeassistant.light.api_views.redis_client", storage):
+            self.assertTrue(claim_music_mode())
+            self.assertTrue(claim_music_mode())
+            storage.redis_client.set(MUSIC_MODE_OWNER_KEY, "other-host:1")
+            self.assertFalse(claim_music_mode())
+
+    @patch("homeassistant.light.api_views.claim_music_mode", return_value=False)
+    @patch("homeassistant.light.api_views.light_controller")
+    def test_music_mode_held_by_other_worker_is_refused(self, controller, claim):
+        response = self.client.post(
+            reverse("light:api_device_music_mode", args=[self.device.id]),
+            data=json.dumps({"enabled": True}),
+            content_type="application/json",
+        )
+
+        self.assertEqual(response.status_code, 409)
+        controller.set_music_mode.assert_not_called()
+
+    @patch("homeassistant.light.api_views.mark_activity")
+    @patch("homeassistant.light.api_views.light_controller")
+    def test_successful_command_wakes_pollers(self, controller, mark_activity):
+        controller.set_rgb.side_effect = [True, False]
+        url = reverse("light:api_set_rgb_color", args=[self.device.id])
+        body = json.dumps({"red": 255, "green": 0, "blue": 0})
+
+        for _ in range(2):
+            self.client.post(url, data=body, content_type="application/json")
+
+        mark_activity.assert_called_once_with(command=True)
+
     def test_invalid_brightness_api(self):
         # Тест с неверным значением яркости
         response = self.client.post(
@@ -202,3 +298,716 @@ class LightControllerTest(TestCase):
 
         self.assertIsInstance(light_controller, LightController)
         self.assertIsNotNone(light_controller.connected_bulbs)
+
+
+class BulbConnectionPoolTest(TestCase):
+    def setUp(self):
+        self.server = socket.create_server(("127.0.0.1", 0))
+        self.client_socket = socket.create_connection(self.server.getsockname())
+        self.addCleanup(self.server.close)
+        self.addCleanup(self.client_socket.close)
+
+    def test_pool_reuses_connection_per_ip(self):
+        pool = BulbConnectionPool()
+        first = pool.get_connection("192.168.1.100")
+        second = pool.get_connection("192.168.1.100")
+        self.assertIs(first, second)
+        self.assertIsNot(first, pool.get_connection("192.168.1.101"))
+
+    @patch("homeassistant.light.light_controller.Bulb")
+    def test_commands_share_one_socket(self, bulb_class):
+        bulb_class.return_value._socket = self.client_socket
+        bulb_class.return_value.music_mode = False
+        connection = BulbConnection("192.168.1.100")
+
+        connection.execute("turn_on")
+        connection.execute("set_brightness", 50)
+
+        self.assertEqual(bulb_class.call_count, 1)
+        bulb_class.return_value.set_brightness.assert_called_once_with(50)
+
+    @override_settings(YEELIGHT_COMMANDS_PER_MINUTE=2, YEELIGHT_RATE_LIMIT_MAX_WAIT=0)
+    @patch("homeassistant.light.light_controller.Bulb")
+    def test_rate_limit_enforced(self, bulb_class):
+        bulb_class.return_value._socket = self.client_socket
+        bulb_class.return_value.music_mode = False
+        connection = BulbConnection("192.168.1.100")
+
+        connection.execute("turn_on")
+        connection.execute("turn_off")
+        with self.assertRaises(DeviceRateLimitError):
+            connection.execute("turn_on")
+
+    @patch("homeassistant.light.light_controller.Bulb")
+    def test_reconnect_backoff_after_failure(self, bulb_class):
+        type(bulb_class.return_value)._socket = PropertyMock(
+            side_effect=ConnectionRefusedError()
+        )
+        bulb_class.return_value.music_mode = False
+        connection = BulbConnection("192.168.1.100")
+
+        with self.assertRaises(DeviceConnectionError):
+            connection.execute("turn_on")
+        attempts = bulb_class.call_count
+        with self.assertRaises(DeviceConnectionError):
+            connection.execute("turn_on")
+
+        self.assertEqual(bulb_class.call_count, attempts)
+        bulb_class.return_value.turn_on.assert_not_called()
+
+    @override_settings(YEELIGHT_COMMANDS_PER_MINUTE=2, YEELIGHT_RATE_LIMIT_MAX_WAIT=0)
+    @patch("homeassistant.light.light_controller.Bulb")
+    def test_music_mode_skips_rate_limit(self, bulb_class):
+        bulb_class.return_value._socket = self.client_socket
+        bulb_class.return_value.music_mode = True
+        connection = BulbConnection("192.168.1.100")
+
+        for brightness in range(1, 21):
+            connection.execute("set_brightness", brightness)
+
+        self.assertEqual(bulb_class.return_value.set_brightness.call_count, 20)
+
+    @patch("homeassistant.light.light_controller.Bulb")
+    def test_props_read_with_command_response_are_forwarded(self, bulb_class):
+        bulb = bulb_class.return_value
+        bulb._socket = self.client_socket
+        bulb.music_mode = False
+        bulb._last_properties = {"power": "off", "bright": "10"}
+        bulb.turn_on.side_effect = lambda: bulb._last_properties.update(power="on")
+        connection = BulbConnection("192.168.1.100")
+        notifications = []
+        connection.on_notification = notifications.append
+
+        connection.execute("turn_on")
+
+        self.assertEqual(notifications, [{"power": "on"}])
+
+    @override_settings(YEELIGHT_MUSIC_MODE_IDLE_TIMEOUT=0.05)
+    @patch("homeassistant.light.light_controller.Bulb")
+    def test_idle_music_mode_closed_without_new_commands(self, bulb_class):
+        bulb = bulb_class.return_value
+        bulb._socket = self.client_socket
+        bulb.music_mode = False
+        bulb.start_music.side_effect = lambda **kwargs: setattr(
+            bulb, "music_mode", True
+        )
+        bulb.stop_music.side_effect = lambda: setattr(bulb, "music_mode", False)
+        connection = BulbConnection("192.168.1.100")
+
+        connection.start_music_mode()
+        deadline = time.monotonic() + 2
+        while connection.music_mode and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        self.assertFalse(connection.music_mode)
+        bulb.stop_music.assert_called_once()
+
+
+class LightControllerOptimisticStateTest(TestCase):
+    @patch("homeassistant.light.light_controller.Bulb")
+    def test_commands_update_cache_without_reading_properties(self, bulb_class):
+        server = socket.create_server(("127.0.0.1", 0))
+        client_socket = socket.create_connection(server.getsockname())
+        self.addCleanup(server.close)
+        self.addCleanup(client_socket.close)
+        bulb_class.return_value._socket = client_socket
+        bulb_class.return_value.music_mode = False
+        controller = LightController()
+        device = controller.add_device("192.168.1.100", device_id="Yeelight_100")
+        device.properties.update({"power": "off", "bright": "10"})
+
+        self.assertTrue(controller.toggle("Yeelight_100"))
+        self.assertTrue(controller.set_brightness("Yeelight_100", 80))
+        self.assertTrue(controller.set_rgb("Yeelight_100", 255, 0, 0))
+
+        self.assertTrue(device.is_on)
+        self.assertEqual(device.brightness, 80)
+        self.assertEqual(device.rgb_color, "#ff0000")
+        bulb_class.return_value.get_properties.assert_not_called()
+
+
+class LightControllerFanOutTest(TestCase):
+    @override_settings(YEELIGHT_DEVICE_DEADLINE=0.2)
+    def test_fan_out_returns_partial_results_at_deadline(self):
+        controller = LightController()
+        fast = YeelightDevice("192.168.1.100")
+        slow = YeelightDevice("192.168.1.101")
+        release = threading.Event()
+        self.addCleanup(release.set)
+
+        def action(device):
+            if device is slow:
+                release.wait(5)
+            return device.ip
+
+        started = time.monotonic()
+        results = controller.fan_out([fast, slow], action)
+
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertEqual(results[fast.id], "192.168.1.100")
+        self.assertIsNone(results[slow.id])
+
+
+class BulbNotificationListenerTest(TestCase):
+    @patch("homeassistant.light.light_controller.YeelightDevice.update_properties")
+    def test_notifications_update_state_table(self, update_properties):
+        server = socket.create_server(("127.0.0.1", 0))
+        self.addCleanup(server.close)
+        host, port = server.getsockname()
+        device = YeelightDevice(host, port, properties={"power": "off"})
+        listener = BulbNotificationListener(device)
+        self.addCleanup(listener.stop)
+
+        listener.start()
+        bulb_socket, _ = server.accept()
+        self.addCleanup(bulb_socket.close)
+        bulb_socket.sendall(
+            b'{"method":"props","params":{"power":"on","bright":42}}\r\n'
+        )
+        deadline = time.monotonic() + 2
+        while device.properties["power"] != "on" and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+        self.assertTrue(device.is_on)
+        self.assertEqual(device.brightness, 42)
+        self.assertTrue(device.subscribed)
+        self.assertAlmostEqual(device.last_seen, time.time(), delta=1)
+
+    @patch("homeassistant.light.light_controller.YeelightDevice.update_properties")
+    def test_listener_reads_pooled_connection(self, update_properties):
+        server = socket.create_server(("127.0.0.1", 0))
+        self.addCleanup(server.close)
+        host, port = server.getsockname()
+        device = YeelightDevice(host, port, properties={"power": "off"})
+        listener = BulbNotificationListener(device)
+        self.addCleanup(listener.stop)
+
+        device.connect()
+        bulb_socket, _ = server.accept()
+        self.addCleanup(bulb_socket.close)
+        listener.start()
+        bulb_socket.sendall(b'{"method":"props","params":{"power":"on"}}\r\n')
+        deadline = time.monotonic() + 2
+        while not device.is_on and time.monotonic() < deadline:
+            time.sleep(0.01)
+        server.settimeout(0.3)
+
+        self.assertTrue(device.is_on)
+        with self.assertRaises(socket.timeout):
+            server.accept()
+
+
+class AsyncLightControllerTest(TestCase):
+    async def serve_bulb(self, reader, writer):
+        """Fake bulb: answers every command and pushes one NOTIFY"""
+        self.connections += 1
+        writer.write(b'{"method":"props","params":{"ct":2700}}\r\n')
+        while line := await reader.readline():
+            command = json.loads(line)
+            self.commands.append(command["method"])
+            result = ["on"] * len(command["params"])
+            if command["method"] != "get_prop":
+                result = ["ok"]
+            writer.write(
+                json.dumps({"id": command["id"], "result": result}).encode() + b"\r\n"
+            )
+            await writer.drain()
+
+    async def run_commands(self, count):
+        self.connections = 0
+        self.commands = []
+        server = await asyncio.start_server(self.serve_bulb, "127.0.0.1", 0)
+        host, port = server.sockets[0].getsockname()
+        registry = LightController()
+        device = registry.add_device(host, port, device_id="Yeelight_1")
+        controller = AsyncLightController(registry)
+
+        results = await asyncio.gather(
+            *(controller.set_brightness(device.id, 10 + i) for i in range(count))
+        )
+        # Синхронный путь идёт через то же соединение из пула
+        results.append(await asyncio.to_thread(registry.set_brightness, device.id, 90))
+        device.connection.close()
+        await asyncio.sleep(0.05)
+        server.close()
+        await server.wait_closed()
+        return device, results
+
+    def test_concurrent_commands_share_one_connection(self):
+        device, results = asyncio.run(self.run_commands(20))
+
+        self.assertTrue(all(results))
+        self.assertEqual(self.connections, 1)
+        self.assertEqual(self.commands.count("set_bright"), 21)
+        self.assertEqual(device.brightness, 90)
+
+    def test_unreachable_bulb_backs_off(self):
+        async def run():
+            with socket.create_server(("127.0.0.1", 0)) as closed:
+                host, port = closed.getsockname()
+            registry = LightController()
+            device = registry.add_device(host, port, device_id="Yeelight_1")
+            controller = AsyncLightController(registry)
+            first = await controller.toggle(device.id)
+            with patch(
+                "yeelight.Bulb._socket", new_callable=PropertyMock
+            ) as bulb_socket:
+                second = await controller.toggle(device.id)
+            return first, second, bulb_socket
+
+        first, second, bulb_socket = asyncio.run(run())
+
+        self.assertFalse(first)
+        self.assertFalse(second)
+        bulb_socket.assert_not_called()
+
+
+class DeviceRegistryTest(TestCase):
+    def setUp(self):
+        self.device = LightDevice.objects.create(
+            name="Лампа 1", ip_address="192.168.1.100", room="Гостиная"
+        )
+        self.group = LightGroup.objects.create(name="Группа гостиной")
+        self.group.devices.add(self.device)
+        self.controller = LightController()
+        self.registry = DeviceRegistry(self.controller)
+
+    def test_indexes_by_id_ip_room_and_group(self):
+        device = self.registry.get(self.device.pk)
+
+        self.assertEqual(device.ip, "192.168.1.100")
+        self.assertEqual(device.name, "Лампа 1")
+        self.assertIs(self.registry.get_by_ip("192.168.1.100"), device)
+        self.assertEqual(self.registry.get_by_room("Гостиная"), [device])
+        self.assertEqual(self.registry.get_by_group(self.group.pk), [device])
+
+    def test_discovered_device_takes_database_id(self):
+        discovered = self.controller.add_device("192.168.1.100")
+
+        self.assertIs(self.registry.get(self.device.pk), discovered)
+        self.assertEqual(list(self.controller.devices), [str(self.device.pk)])
+
+    @patch("homeassistant.light.models.device_registry")
+    def test_save_signal_invalidates_registry(self, device_registry):
+        self.device.ip_address = "192.168.1.101"
+        self.device.save()
+
+        device_registry.invalidate.assert_called()
+
+    @patch("homeassistant.light.models.notify_devices_changed")
+    def test_group_change_is_published_to_other_processes(self, notify_devices_changed):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.group.devices.remove(self.device)
+
+        notify_devices_changed.assert_called()
+
+    def test_concurrent_first_requests_share_one_load(self):
+        def slow_load():
+            time.sleep(0.1)
+            self.registry._loaded = True
+
+        with patch.object(self.registry, "_load", side_effect=slow_load) as patched:
+            threads = [
+                threading.Thread(target=self.registry.get_all_devices) for _ in range(4)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(patched.call_count, 1)
+
+    def test_invalid_group_filter_returns_400(self):
+        response = self.client.get(
+            reverse("light:api_all_devices_status"), {"group": "abc"}
+        )
+
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(json.loads(response.content)["success"])
+
+    def test_reload_follows_ip_change_and_removal(self):
+        self.registry.get_all_devices()
+        LightDevice.objects.filter(pk=self.device.pk).update(ip_address="192.168.1.101")
+        self.registry.invalidate()
+
+        self.assertEqual(self.registry.get(self.device.pk).ip, "192.168.1.101")
+        self.assertIsNone(self.controller.get_device_by_ip("192.168.1.100"))
+
+        LightDevice.objects.filter(pk=self.device.pk).update(is_active=False)
+        self.registry.invalidate()
+
+        self.assertEqual(self.registry.get_all_devices(), [])
+        self.assertEqual(self.controller.devices, {})
+
+
+class DiscoveryServiceTest(TestCase):
+    ADVERTISEMENT = (
+        b"NOTIFY * HTTP/1.1\r\n"
+        b"Host: 239.255.255.250:1982\r\n"
+        b"Cache-Control: max-age=3600\r\n"
+        b"Location: yeelight://192.168.1.100:55443\r\n"
+        b"NTS: ssdp:alive\r\n"
+        b"id: 0x000000000015243f\r\n"
+        b"model: color\r\n"
+        b"power: on\r\n"
+        b"bright: 42\r\n"
+        b"name: bedroom\r\n"
+    )
+
+    def setUp(self):
+        self.controller = LightController()
+        self.service = DiscoveryService(
+            self.controller, DeviceRegistry(self.controller)
+        )
+
+    def test_advertisement_merged_into_controller(self):
+        self.service.handle_packet(self.ADVERTISEMENT)
+
+        device = self.controller.get_device_by_ip("192.168.1.100")
+        self.assertTrue(device.is_on)
+        self.assertEqual(device.brightness, 42)
+        self.assertEqual(device.model, "color")
+        self.assertEqual(self.service.get_devices(), [device])
+        self.assertEqual(self.service.version, 1)
+
+    def test_repeated_advertisement_keeps_version(self):
+        self.service.handle_packet(self.ADVERTISEMENT)
+        self.service.handle_packet(self.ADVERTISEMENT)
+
+        self.assertEqual(self.service.version, 1)
+
+    def test_database_name_wins(self):
+        device = LightDevice.objects.create(name="Спальня", ip_address="192.168.1.100")
+        self.service.registry.warm()
+
+        self.service.handle_packet(self.ADVERTISEMENT)
+
+        self.assertEqual(self.controller.get_device(str(device.pk)).name, "Спальня")
+
+    def test_listener_thread_does_not_query_database(self):
+        device = LightDevice.objects.create(name="Спальня", ip_address="192.168.1.100")
+
+        with self.assertNumQueries(0):
+            self.service.handle_packet(self.ADVERTISEMENT)
+        registered = self.service.registry.get_by_ip("192.168.1.100")
+
+        self.assertEqual(registered.id, str(device.pk))
+        self.assertEqual(registered.name, "Спальня")
+
+    def test_discovered_device_visible_in_registry(self):
+        self.service.handle_packet(self.ADVERTISEMENT)
+        device = self.controller.get_device_by_ip("192.168.1.100")
+
+        self.assertIs(self.service.registry.get(device.id), device)
+        self.assertEqual(self.service.registry.get_all_devices(), [device])
+
+    @override_settings(YEELIGHT_DISCOVERY_TTL=0)
+    def test_expired_discovered_device_removed(self):
+        self.service.handle_packet(self.ADVERTISEMENT)
+
+        self.assertEqual(self.service.get_devices(), [])
+        self.assertIsNone(self.controller.get_device_by_ip("192.168.1.100"))
+        self.assertEqual(self.service.registry.get_all_devices(), [])
+
+    def test_wait_for_update_returns_on_new_result(self):
+        self.service.registry.warm()
+        threading.Timer(0.1, self.service.handle_packet, [self.ADVERTISEMENT]).start()
+
+        version = self.service.wait_for_update(None, timeout=2)
+
+        self.assertEqual(version, 1)
+
+    def test_search_requests_ignored(self):
+        self.service.handle_packet(
+            b"M-SEARCH * HTTP/1.1\r\nHOST: 239.255.255.250:1982\r\nST: wifi_bulb\r\n"
+        )
+
+        self.assertEqual(self.service.found, {})
+
+    @override_settings(YEELIGHT_DISCOVERY_ENABLED=False)
+    def test_scan_endpoint_returns_cache_immediately(self):
+        started = time.monotonic()
+        response = self.client.get(reverse("light:api_scan_devices"))
+
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertTrue(json.loads(response.content)["success"])
+
+
+class YeelightDevicePropertyPlannerTest(TestCase):
+    def setUp(self):
+        self.device = YeelightDevice(
+            "192.168.1.100", properties={"power": "on", "bright": "40"}
+        )
+
+    def test_plan_merges_property_sets(self):
+        plan = self.device.plan_properties("dashboard", "status")
+
+        self.assertEqual(plan, ["power", "bright", "ct", "rgb", "color_mode"])
+        self.assertNotIn("name", self.device.plan_properties("detail"))
+
+    def test_subscribed_device_reads_only_unknown_properties(self):
+        self.device.subscribed = True
+
+        self.assertEqual(self.device.plan_properties("dashboard"), [])
+        self.assertEqual(
+            self.device.plan_properties("status"), ["ct", "rgb", "color_mode"]
+        )
+
+    @patch("homeassistant.light.light_controller.BulbConnection.execute")
+    @patch("homeassistant.light.light_controller.BulbConnection.open")
+    def test_fetch_returns_only_changed_fields(self, open_connection, execute):
+        execute.return_value = {
+            "power": "on",
+            "bright": "80",
+            "current_brightness": "80",
+        }
+
+        changed = self.device.fetch_properties("dashboard")
+
+        execute.assert_called_once_with("get_properties", ["power", "bright"])
+        self.assertEqual(changed, {"bright": "80"})
+        self.assertEqual(self.device.brightness, 80)
+        self.assertNotIn("current_brightness", self.device.properties)
+
+
+class LightSceneCompilerTest(TestCase):
+    def setUp(self):
+        self.device = YeelightDevice(
+            "192.168.1.100",
+            properties={"power": "off", "bright": "40", "support": "set_scene"},
+        )
+
+    def test_color_scene_compiles_to_single_set_scene(self):
+        commands = compile_commands(
+            self.device, target_state(True, 60, None, "#FF8000")
+        )
+
+        self.assertEqual(commands, [("set_scene", (SceneClass.COLOR, 255, 128, 0, 60))])
+
+    def test_invalid_rgb_color_is_ignored(self):
+        self.assertEqual(
+            target_state(True, 60, 2700, "orange"),
+            {"power": "on", "bright": "60", "ct": "2700", "color_mode": "2"},
+        )
+
+    def test_scene_state_rejects_invalid_rgb_color(self):
+        scene = LightScene.objects.create(name="Вечер")
+        device = LightDevice.objects.create(name="Лампа", ip_address="192.168.1.100")
+        state = LightSceneState(scene=scene, device=device, rgb_color="orange")
+
+        with self.assertRaises(ValidationError):
+            state.full_clean()
+
+    def test_without_set_scene_support_falls_back_to_separate_commands(self):
+        self.device.properties["support"] = "get_prop set_power set_ct_abx set_bright"
+
+        commands = compile_commands(self.device, target_state(True, 60, 2700))
+
+        self.assertEqual(
+            commands,
+            [("turn_on", ()), ("set_color_temp", (2700,)), ("set_brightness", (60,))],
+        )
+
+    def test_subscribed_device_skips_fields_already_in_target_state(self):
+        self.device.subscribed = True
+        self.device.properties.update({"power": "on", "ct": "2700", "color_mode": "2"})
+
+        self.assertEqual(
+            compile_commands(self.device, target_state(True, 40, 2700)), []
+        )
+        self.assertEqual(
+            compile_commands(self.device, target_state(True, 80, 2700)),
+            [("set_brightness", (80,))],
+        )
+        self.assertEqual(
+            compile_commands(self.device, target_state(False)), [("turn_off", ())]
+        )
+
+
+class LightSceneApplyTest(TestCase):
+    def setUp(self):
+        self.first = LightDevice.objects.create(
+            name="Лампа 1", ip_address="192.168.1.100"
+        )
+        self.second = LightDevice.objects.create(
+            name="Лампа 2", ip_address="192.168.1.101"
+        )
+        self.scene = LightScene.objects.create(
+            name="Джаз-бар", assistant_request="Создать атмосферу джазового бара"
+        )
+        LightSceneState.objects.create(
+            scene=self.scene, device=self.first, brightness=30, color_temp=2700
+        )
+        LightSceneState.objects.create(
+            scene=self.scene, device=self.second, is_on=False
+        )
+
+    def test_find_scene_matches_assistant_request_case_insensitively(self):
+        self.assertEqual(find_scene("создать атмосферу джазового бара "), self.scene)
+        self.assertIsNone(find_scene("Покажи результаты футбольных матчей"))
+
+    @patch.object(YeelightDevice, "update_properties", return_value=True)
+    @patch.object(LightController, "apply_plan", return_value=True)
+    def test_apply_runs_plan_for_every_lamp(self, apply_plan, update_properties):
+        results = self.scene.apply()
+
+        self.assertEqual(results, {str(self.first.pk): True, str(self.second.pk): True})
+        self.assertEqual(apply_plan.call_count, 2)
+        apply_plan.assert_any_call(
+            str(self.second.pk), [("turn_off", ())], {"power": "off"}
+        )
+
+    @patch.object(YeelightDevice, "update_properties", autospec=True)
+    @patch.object(LightController, "apply_plan")
+    def test_failed_lamp_rolls_back_whole_scene(self, apply_plan, update_properties):
+        previous = {"power": "on", "bright": "90", "ct": "4000", "color_mode": "2"}
+
+        def read_state(device, *needs):
+            device.properties.update(previous)
+            return True
+
+        update_properties.side_effect = read_state
+        apply_plan.side_effect = lambda device_id, commands, state: device_id == str(
+            self.first.pk
+        )
+
+        results = self.scene.apply()
+
+        self.assertEqual(
+            results, {str(self.first.pk): False, str(self.second.pk): False}
+        )
+        self.assertEqual(apply_plan.call_count, 4)
+        apply_plan.assert_any_call(
+            str(self.first.pk), [("set_scene", (SceneClass.CT, 4000, 90))], previous
+        )
+
+    @patch.object(YeelightDevice, "update_properties", return_value=False)
+    @patch.object(LightController, "apply_plan")
+    def test_unreachable_lamp_leaves_scene_unapplied(
+        self, apply_plan, update_properties
+    ):
+        results = self.scene.apply()
+
+        self.assertFalse(any(results.values()))
+        apply_plan.assert_not_called()
+
+    @patch.object(YeelightDevice, "update_properties", return_value=True)
+    @patch.object(LightController, "apply_plan", return_value=True)
+    def test_api_applies_scene(self, apply_plan, update_properties):
+        response = Client().post(reverse("light:api_scene_apply", args=[self.scene.pk]))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.json()["success"])
+        self.assertEqual(
+            Client().post(reverse("light:api_scene_apply", args=[999])).status_code,
+            404,
+        )
+
+
+class LightSchedulerTest(TestCase):
+    def setUp(self):
+        self.device = LightDevice.objects.create(
+            name="Лампа 1", ip_address="192.168.1.100"
+        )
+        self.group = LightGroup.objects.create(name="Группа")
+        self.group.devices.add(self.device)
+        self.schedule = LightSchedule.objects.create(
+            name="Утро",
+            group=self.group,
+            time=dt_time(7, 0),
+            days_of_week=[0, 2],
+            action="turn_on",
+            brightness=70,
+        )
+        self.controller = LightController()
+        self.scheduler = LightScheduler(
+            self.controller, DeviceRegistry(self.controller)
+        )
+        # 2024-01-01 — понедельник
+        self.monday = timezone.make_aware(datetime(2024, 1, 1, 7, 0))
+
+    def test_next_fire_time_skips_other_days(self):
+        self.assertEqual(
+            next_fire_time(self.schedule, self.monday - timedelta(minutes=1)),
+            self.monday,
+        )
+        self.assertEqual(
+            next_fire_time(self.schedule, self.monday),
+            self.monday + timedelta(days=2),
+        )
+
+    def test_due_schedule_fires_and_is_rescheduled(self):
+        self.scheduler.reload(now=self.monday - timedelta(hours=1))
+        self.assertEqual(self.scheduler.pop_due(self.monday - timedelta(seconds=1)), [])
+
+        due = self.scheduler.pop_due(self.monday + timedelta(seconds=1))
+
+        self.assertEqual(
+            due, [(self.monday, self.scheduler.schedules[self.schedule.pk])]
+        )
+        self.assertEqual(
+            self.scheduler.seconds_until_next(self.monday + timedelta(days=2)), 0
+        )
+
+    def test_late_fire_is_counted_as_missed(self):
+        self.scheduler.reload(now=self.monday - timedelta(hours=1))
+
+        due = self.scheduler.pop_due(self.monday + timedelta(minutes=10))
+
+        self.assertEqual(due, [])
+        self.assertEqual(self.scheduler.get_metrics()["missed"], 1)
+
+    def test_reload_does_not_fire_schedule_again(self):
+        self.scheduler.reload(now=self.monday - timedelta(seconds=30))
+        self.assertEqual(len(self.scheduler.pop_due(self.monday)), 1)
+
+        self.scheduler.reload(now=self.monday + timedelta(seconds=5))
+
+        self.assertEqual(self.scheduler.pop_due(self.monday + timedelta(seconds=5)), [])
+        self.assertEqual(
+            self.scheduler.seconds_until_next(self.monday + timedelta(days=2)), 0
+        )
+
+    def test_misfire_grace_applies_only_on_first_load(self):
+        self.scheduler.reload(now=self.monday - timedelta(hours=1))
+        LightSchedule.objects.create(
+            name="Чуть раньше",
+            group=self.group,
+            time=dt_time(6, 59, 50),
+            days_of_week=[0],
+            action="turn_off",
+        )
+
+        self.scheduler.reload(now=self.monday - timedelta(seconds=5))
+
+        self.assertEqual(self.scheduler.pop_due(self.monday - timedelta(seconds=5)), [])
+
+    @patch.object(LightController, "turn_on", return_value=True)
+    def test_dispatch_turns_on_group_devices(self, turn_on):
+        self.scheduler.reload(now=self.monday - timedelta(hours=1))
+
+        self.scheduler.dispatch(self.scheduler.pop_due(self.monday))
+
+        turn_on.assert_called_once_with(str(self.device.pk), 70)
+        metrics = self.scheduler.get_metrics()
+        self.assertEqual(metrics["fired"], 1)
+        self.assertEqual(metrics["failed_devices"], 0)
+        self.assertGreater(metrics["latency_last"], 0)
+
+    @patch("homeassistant.light.models.notify_schedules_changed")
+    def test_save_signal_requests_reload(self, notify_schedules_changed):
+        self.schedule.is_active = False
+        with self.captureOnCommitCallbacks(execute=True):
+            self.schedule.save()
+
+        notify_schedules_changed.assert_called_once()
+
+    def test_reload_picks_up_device_ip_change(self):
+        self.scheduler.registry.get_all_devices()
+        LightDevice.objects.filter(pk=self.device.pk).update(ip_address="192.168.1.101")
+
+        self.scheduler.reload(now=self.monday - timedelta(hours=1))
+
+        self.assertEqual(
+            self.scheduler.registry.get(self.device.pk).ip, "192.168.1.101"
+        )
@@ -1,6 +1,6 @@
 from django.urls import path
 
-from . import api_views, views
+from . import api_views, async_api_views, views
 
 app_name = "light"
 
@@ -33,16 +33,61 @@ urlpatterns = [
         api_views.DeviceRGBColorAPIView.as_view(),
         name="api_set_rgb_color",
     ),
+    path(
+        "api/device/<str:device_id>/music/",
+        api_views.DeviceMusicModeAPIView.as_view(),
+        name="api_device_music_mode",
+    ),
     path(
         "api/device/<str:device_id>/status/",
         api_views.DeviceStatusAPIView.as_view(),
         name="api_device_status",
     ),
+    path(
+        "api/group/<int:group_id>/power/",
+        api_views.GroupPowerAPIView.as_view(),
+        name="api_group_power",
+    ),
+    path(
+        "api/scene/<int:scene_id>/apply/",
+        api_views.SceneApplyAPIView.as_view(),
+        name="api_scene_apply",
+    ),
     path(
         "api/devices/status/",
         api_views.AllDevicesStatusAPIView.as_view(),
         name="api_all_devices_status",
     ),
+    path(
+        "api/async/device/<str:device_id>/toggle/",
+        async_api_views.AsyncDeviceToggleAPIView.as_view(),
+        name="api_async_device_toggle",
+    ),
+    path(
+        "api/async/device/<str:device_id>/brightness/",
+        async_api_views.AsyncDeviceBrightnessAPIView.as_view(),
+        name="api_async_device_brightness",
+    ),
+    path(
+        "api/async/device/<str:device_id>/temperature/",
+        async_api_views.AsyncDeviceColorTempAPIView.as_view(),
+        name="api_async_set_color_temp",
+    ),
+    path(
+        "api/async/device/<str:device_id>/rgb/",
+        async_api_views.AsyncDeviceRGBColorAPIView.as_view(),
+        name="api_async_set_rgb_color",
+    ),
+    path(
+        "api/async/device/<str:device_id>/status/",
+        async_api_views.AsyncDeviceStatusAPIView.as_view(),
+        name="api_async_device_status",
+    ),
+    path(
+        "api/async/devices/status/",
+        async_api_views.AsyncAllDevicesStatusAPIView.as_view(),
+        name="api_async_all_devices_status",
+    ),
     path(
         "api/devices/scan/",
         api_views.ScanDevicesView.as_view(),
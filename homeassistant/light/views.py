@@ -9,6 +9,11 @@ from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from django.views.generic import DetailView, ListView, TemplateView
 
+from homeassistant.device_events import mark_activity
+
+from .api_views import scan_response
+from .device_registry import device_registry
+from .discovery import discovery_service
 from .light_controller import light_controller
 from .models import LightDevice
 
@@ -21,42 +26,10 @@ class LightDashboardView(TemplateView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
 
-        lamp_ips = ["192.168.0.35", "192.168.0.226", "192.168.0.20"]
-        devices = []
-
-        for ip in lamp_ips:
-            try:
-                from yeelight import Bulb
-
-                bulb = Bulb(ip)
-                properties = bulb.get_properties()
-
-                from .light_controller import YeelightDevice
-
-                device = YeelightDevice(ip, properties=properties)
-                device.name = f"Yeelight {ip.split('.')[-1]}"
-                device.id = f"Yeelight_{ip.split('.')[-1]}"
-                devices.append(device)
-
-            except Exception as e:
-                logger.error(
-                    f"light_views_001: \033[31mConnection failed to \033[36m{ip}\033[31m: {str(e)}\033[0m"
-                )
-                try:
-                    from .light_controller import YeelightDevice
-
-                    device = YeelightDevice(
-                        ip,
-                        properties={"power": "off", "bright": 0, "ct": 4000, "rgb": 0},
-                    )
-                    device.name = f"Yeelight {ip.split('.')[-1]} (unavailable)"
-                    device.id = f"Yeelight_{ip.split('.')[-1]}"
-                    device._connected = False
-                    devices.append(device)
-                except Exception as inner_e:
-                    logger.error(
-                        f"light_views_002: \033[31mFallback device creation failed for \033[36m{ip}\033[31m: {str(inner_e)}\033[0m"
-                    )
+        light_controller.start_listening()
+        devices = light_controller.load_devices(
+            device_registry.get_all_devices(), "status"
+        )
 
         try:
             context.update(
@@ -82,7 +55,7 @@ class DeviceListView(TemplateView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         try:
-            light_controller.discover_devices(timeout=3)
+            discovery_service.start()
             devices = light_controller.get_all_devices()
             context.update(
                 {"devices": devices, "page_title": "Найденные устройства Yeelight"}
@@ -103,11 +76,11 @@ class DeviceDetailView(TemplateView):
         context = super().get_context_data(**kwargs)
         device_id = kwargs.get("device_id")
         try:
-            device = light_controller.get_device(device_id)
+            device = device_registry.get(device_id)
             if not device:
                 context["error"] = "Устройство не найдено"
                 return context
-            device.update_properties()
+            device.update_properties("detail")
             context.update(
                 {"device": device, "page_title": f"Устройство: {device.name}"}
             )
@@ -123,26 +96,11 @@ class ScanDevicesView(View):
     def get(self, request, *args, **kwargs):
         logger.info("=== STEP 2: Device Scan Request ===")
         try:
-            discovered = light_controller.discover_devices(timeout=5)
+            response = scan_response(request)
             logger.info(
-                f"light_views_006: Scan completed, found \033[33m{len(discovered)}\033[0m devices"
-            )
-            return JsonResponse(
-                {
-                    "success": True,
-                    "discovered_count": len(discovered),
-                    "devices": [
-                        {
-                            "id": device.id,
-                            "name": device.name,
-                            "ip": device.ip,
-                            "model": device.model,
-                            "is_on": device.is_on,
-                        }
-                        for device in discovered
-                    ],
-                }
+                f"light_views_006: Scan served from cache, version \033[33m{discovery_service.version}\033[0m"
             )
+            return response
         except Exception as e:
             logger.error(f"light_views_007: \033[31mScan failed: {str(e)}\033[0m")
             return JsonResponse(
@@ -159,16 +117,10 @@ class ScanDevicesView(View):
 
 class LightControlMixin:
     def get_device_by_id(self, device_id):
-        return light_controller.get_device(device_id)
-
-    def extract_ip_from_device_id(self, device_id):
-        ip_suffix = device_id.split("_")[-1]
-        return f"192.168.0.{ip_suffix}"
-
-    def create_bulb_instance(self, ip):
-        from yeelight import Bulb
-
-        return Bulb(ip)
+        device = device_registry.get(device_id)
+        if not device:
+            raise LookupError(f"Устройство {device_id} не найдено")
+        return device
 
 
 class DeviceToggleAPIViewWithMixin(LightControlMixin, View):
@@ -178,20 +130,16 @@ class DeviceToggleAPIViewWithMixin(LightControlMixin, View):
 
     def post(self, request, device_id, *args, **kwargs):
         try:
-            ip = self.extract_ip_from_device_id(device_id)
-            bulb = self.create_bulb_instance(ip)
-
-            properties = bulb.get_properties()
-            current_state = properties.get("power") == "on"
-
-            if current_state:
-                bulb.turn_off()
-                new_state = False
-                message = f"Лампа {ip} выключена"
+            device = self.get_device_by_id(device_id)
+            if not light_controller.toggle(device.id):
+                raise ConnectionError(f"Лампа {device.ip} недоступна")
+            mark_activity(command=True)
+
+            new_state = device.is_on
+            if new_state:
+                message = f"Лампа {device.ip} включена"
             else:
-                bulb.turn_on()
-                new_state = True
-                message = f"Лампа {ip} включена"
+                message = f"Лампа {device.ip} выключена"
 
             return JsonResponse(
                 {"success": True, "is_on": new_state, "message": message}
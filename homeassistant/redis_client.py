@@ -1,46 +1,587 @@
+import base64
+import copy
 import json
 import logging
+import threading
+import time
+import zlib
+from collections import OrderedDict
 from datetime import datetime
-from typing import Any
+from typing import Any, Callable
 
 import redis
 from archie_shared.user.models import UserState
 from django.conf import settings
+from pydantic import TypeAdapter
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 logger = logging.getLogger(__name__)
 
+# One validator per UserState attribute, so a single field is checked without the whole state
+FIELD_ADAPTERS = {
+    name: TypeAdapter(field.annotation)
+    for name, field in UserState.model_fields.items()
+}
+
+
+# Codec version markers: the first character of every stored field value.
+# Values without a marker are plain JSON written before the codec existed.
+CODEC_JSON = "\x01"
+CODEC_ZLIB = "\x02"
+
+
+def _loads(data: str | bytes) -> Any:
+    return orjson.loads(data) if orjson else json.loads(data)
+
+
+def encode_value(data: bytes) -> str:
+    """Wraps JSON bytes with a codec marker, compressing values above the size threshold"""
+    min_size = settings.REDIS_COMPRESS_MIN_SIZE
+    if min_size and len(data) >= min_size:
+        # Hash values stay text (decode_responses=True), so compressed bytes go as base64
+        return CODEC_ZLIB + base64.b64encode(zlib.compress(data)).decode()
+    return CODEC_JSON + data.decode()
 
-class RedisClient:
-    """Redis client for user state caching"""
 
-    def __init__(self):
-        self.redis_client = redis.Redis(
-            host=settings.REDIS_HOST,
-            port=settings.REDIS_PORT,
-            db=settings.REDIS_DB,
-            decode_responses=True,
+def decode_value(value: str) -> Any:
+    """Decodes a stored field value of any codec version"""
+    if value.startswith(CODEC_ZLIB):
+        return _loads(zlib.decompress(base64.b64decode(value[1:])))
+    if value.startswith(CODEC_JSON):
+        value = value[1:]
+    return _loads(value)
+
+
+def encode_fields(values: dict[str, Any]) -> dict[str, str]:
+    """Validates UserState attributes and encodes each one as a hash value"""
+    return {
+        name: encode_value(
+            FIELD_ADAPTERS[name].dump_json(FIELD_ADAPTERS[name].validate_python(value))
         )
+        for name, value in values.items()
+        if name in FIELD_ADAPTERS
+    }
+
+
+def encode_state(state: UserState) -> dict[str, str]:
+    """Encodes an already validated UserState without validating each field again"""
+    dumps = orjson.dumps if orjson else lambda value: json.dumps(value).encode()
+    return {name: encode_value(dumps(getattr(state, name))) for name in FIELD_ADAPTERS}
+
+
+def decode_fields(values: dict[str, str | None]) -> dict[str, Any]:
+    """Decodes hash values back to UserState attributes, skips missing ones"""
+    return {
+        name: decode_value(value)
+        for name, value in values.items()
+        if value is not None and name in FIELD_ADAPTERS
+    }
+
+
+def decode_field(name: str, value: str) -> Any:
+    """Decodes and validates a single UserState attribute"""
+    return FIELD_ADAPTERS[name].validate_python(decode_value(value))
+
+
+# Atomic partial update: writes fields only into an existing state, in one round trip
+# KEYS[1] - user state hash, KEYS[2:] - sub-document keys of lazy fields
+# ARGV[1] - ttl in seconds (0 keeps the hash ttl), ARGV[2] - number of hash field/value
+# pairs that follow, then one field/value pair per sub-document key ("" deletes the key)
+UPDATE_FIELDS_SCRIPT = """
+if redis.call("EXISTS", KEYS[1]) == 0 then
+    return 0
+end
+local pairs_end = 2 + 2 * tonumber(ARGV[2])
+if pairs_end > 2 then
+    redis.call("HSET", KEYS[1], unpack(ARGV, 3, pairs_end))
+end
+if tonumber(ARGV[1]) > 0 then
+    redis.call("EXPIRE", KEYS[1], ARGV[1])
+end
+local pttl = redis.call("PTTL", KEYS[1])
+for i = 2, #KEYS do
+    local field = ARGV[pairs_end + 2 * i - 3]
+    local value = ARGV[pairs_end + 2 * i - 2]
+    -- States written before the split keep sub-documents inline in the hash
+    redis.call("HDEL", KEYS[1], field)
+    if value == "" then
+        redis.call("DEL", KEYS[i])
+    elseif pttl > 0 then
+        redis.call("SET", KEYS[i], value, "PX", pttl)
+    else
+        redis.call("SET", KEYS[i], value)
+    end
+end
+return 1
+"""
+
+# Encoded None: lazy fields with this value are stored as a missing key
+NULL_VALUE = CODEC_JSON + "null"
+
+
+def current_datetime_fields() -> dict[str, str]:
+    """Volatile date and time fields, computed at read time instead of being stored"""
+    now = datetime.now()
+    return {
+        "current_date": now.strftime("%Y-%m-%d"),
+        "current_time": now.strftime("%H:%M:%S"),
+        "current_weekday": now.strftime("%A"),
+    }
+
+
+_connection_pool = None
+_connection_pool_lock = threading.Lock()
+
+
+def get_connection_pool() -> redis.BlockingConnectionPool:
+    """Process-wide Redis connection pool configured from settings"""
+    global _connection_pool
+    if _connection_pool is None:
+        with _connection_pool_lock:
+            if _connection_pool is None:
+                _connection_pool = redis.BlockingConnectionPool(
+                    host=settings.REDIS_HOST,
+                    port=settings.REDIS_PORT,
+                    db=settings.REDIS_DB,
+                    decode_responses=True,
+                    max_connections=settings.REDIS_MAX_CONNECTIONS,
+                    timeout=settings.REDIS_POOL_TIMEOUT,
+                    socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+                    socket_connect_timeout=settings.REDIS_SOCKET_CONNECT_TIMEOUT,
+                    socket_keepalive=True,
+                    retry_on_timeout=settings.REDIS_RETRY_ON_TIMEOUT,
+                    health_check_interval=settings.REDIS_HEALTH_CHECK_INTERVAL,
+                )
+    return _connection_pool
+
+
+def get_redis() -> redis.Redis:
+    """Redis connection backed by the shared pool, cheap to create per call"""
+    return redis.Redis(connection_pool=get_connection_pool())
+
+
+class NearCache:
+    """
+    Bounded in-process LRU of decoded user states in front of Redis
+
+    Entries are dropped on keyspace notifications from any process, and the cache
+    is only used while that subscription is live and verified by a probe write.
+    Redis must run with notify-keyspace-events including "K$gh" (plus "x" and "e"
+    if states can expire or be evicted).
+    """
+
+    def __init__(
+        self,
+        client: redis.Redis,
+        prefix: str,
+        size: int,
+        key_to_user: Callable[[str], str | None],
+    ):
+        self.client = client
+        self.prefix = prefix
+        self.key_to_user = key_to_user
+        self.size = size
+        self.active = False
+        self.version = 0
+        self._entries: OrderedDict[str, UserState] = OrderedDict()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def get(self, user_name: str) -> UserState | None:
+        """Cached state or None; starts the invalidation listener on first use"""
+        self._ensure_listening()
+        with self._lock:
+            state = self._entries.get(user_name) if self.active else None
+            if state is not None:
+                self._entries.move_to_end(user_name)
+            return state
+
+    def put(self, user_name: str, state: UserState, version: int):
+        """Caches a state read at the given version unless it was invalidated since"""
+        with self._lock:
+            if not self.active or version != self.version:
+                return
+            self._entries[user_name] = state
+            self._entries.move_to_end(user_name)
+            while len(self._entries) > self.size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, user_name: str | None = None):
+        """Drops one user (or everything) and fences reads that are in flight"""
+        with self._lock:
+            self.version += 1
+            if user_name is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(user_name, None)
+
+    def _ensure_listening(self):
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(
+                        target=self._listen, name="redis-near-cache", daemon=True
+                    )
+                    self._thread.start()
+
+    def _listen(self):
+        """Keyspace notification loop, the cache is off whenever it is not running"""
+        db = self.client.connection_pool.connection_kwargs.get("db", 0)
+        channel_prefix = f"__keyspace@{db}__:{self.prefix}"
+        while True:
+            try:
+                pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+                pubsub.psubscribe(f"{channel_prefix}*")
+                self._probe(pubsub, channel_prefix)
+                with self._lock:
+                    self.active = True
+                logger.info(
+                    f"redis_client_011: Near cache active for {self.size} user states"
+                )
+                # Short reads keep socket_timeout from firing on an idle channel
+                while True:
+                    message = pubsub.get_message(timeout=1.0)
+                    if message and message["type"] == "pmessage":
+                        user_name = self.key_to_user(
+                            message["channel"][len(channel_prefix) :]
+                        )
+                        if user_name is not None:
+                            self.invalidate(user_name)
+            except Exception as e:
+                logger.error(f"redis_client_012: Near cache disabled: {e}")
+                pubsub.close()
+            with self._lock:
+                self.active = False
+            self.invalidate()
+            time.sleep(5)
+
+    def _probe(self, pubsub, channel_prefix: str):
+        """Checks that hash, string and generic keyspace events actually reach the subscriber"""
+        probe_key = f"{self.prefix}__near_cache_probe__"
+        self.client.hset(probe_key, "probe", 1)
+        self.client.delete(probe_key)
+        self.client.set(probe_key, 1)
+        self.client.delete(probe_key)
+        expected = {"hset", "set", "del"}
+        deadline = time.monotonic() + 2
+        while expected and time.monotonic() < deadline:
+            message = pubsub.get_message(timeout=0.1)
+            if (
+                message
+                and message["channel"] == f"{channel_prefix}__near_cache_probe__"
+            ):
+                expected.discard(message["data"])
+        if expected:
+            raise RuntimeError(
+                "keyspace notifications are off (notify-keyspace-events)"
+            )
+
+
+class UserStateStorage:
+    """Key layout and encoding shared by the sync and async user state clients
+
+    Scalar attributes live in one hash, every heavy UserState.LAZY_FIELDS
+    sub-document under its own key, so common reads skip the dashboard.
+    """
 
     def _get_user_key_by_name(self, user_name: str) -> str:
-        """Generates key for user state by username"""
+        """Generates key for user state hash by username"""
+        return f"user_state:hash:{user_name}"
+
+    def _get_doc_key_by_name(self, user_name: str, field: str) -> str:
+        """Generates key for a lazy sub-document of the user state"""
+        return f"user_state:doc:{user_name}:{field}"
+
+    def _get_legacy_key_by_name(self, user_name: str) -> str:
+        """Generates key for user state stored as a single JSON string"""
         return f"user_state:name:{user_name}"
 
-    def get_user_state_by_name(self, user_name: str) -> UserState | None:
-        """Gets user state from Redis by username, auto-updates current datetime"""
+    def _legacy_request(self, pipe, user_name: str):
+        """Queues reads of the legacy JSON state, its TTL and whether the hash exists"""
+        legacy_key = self._get_legacy_key_by_name(user_name)
+        pipe.get(legacy_key)
+        pipe.ttl(legacy_key)
+        pipe.exists(self._get_user_key_by_name(user_name))
+
+    def _get_state_keys(self, user_name: str) -> list[str]:
+        """Hash and sub-document keys of a user state"""
+        return [
+            self._get_user_key_by_name(user_name),
+            *(
+                self._get_doc_key_by_name(user_name, field)
+                for field in UserState.LAZY_FIELDS
+            ),
+        ]
+
+    def _get_user_name_by_key(self, key: str) -> str | None:
+        """User name from any user state key, None for unrelated keys"""
+        kind, _, rest = key.partition(":")
+        if kind in ("hash", "name"):
+            return rest
+        if kind == "doc":
+            return rest.rpartition(":")[0]
+        return None
+
+    def _write_state(self, pipe, user_name: str, state: UserState, ttl: int | None):
+        """Queues a full replace of the user state on a sync or async pipeline"""
+        key = self._get_user_key_by_name(user_name)
+        fields = encode_state(state)
+        pipe.delete(*self._get_state_keys(user_name))
+        pipe.hset(
+            key,
+            mapping={
+                field: value
+                for field, value in fields.items()
+                if field not in UserState.LAZY_FIELDS
+            },
+        )
+        if ttl:
+            pipe.expire(key, ttl)
+        for field in UserState.LAZY_FIELDS:
+            if fields[field] != NULL_VALUE:
+                pipe.set(
+                    self._get_doc_key_by_name(user_name, field), fields[field], ex=ttl
+                )
+        if not settings.REDIS_LEGACY_STATE_CLEANUP:
+            pipe.set(
+                self._get_legacy_key_by_name(user_name), state.model_dump_json(), ex=ttl
+            )
+
+    def _write_fields(
+        self, pipe, user_name: str, values: dict[str, Any], ttl: int | None
+    ):
+        """Queues an upsert of the given fields on a sync or async pipeline"""
+        key = self._get_user_key_by_name(user_name)
+        fields = encode_fields(values)
+        scalars = {
+            field: value
+            for field, value in fields.items()
+            if field not in UserState.LAZY_FIELDS
+        }
+        if scalars:
+            pipe.hset(key, mapping=scalars)
+        if ttl:
+            pipe.expire(key, ttl)
+        for field in UserState.LAZY_FIELDS:
+            if field not in fields:
+                continue
+            doc_key = self._get_doc_key_by_name(user_name, field)
+            if fields[field] == NULL_VALUE:
+                pipe.delete(doc_key)
+            else:
+                pipe.set(doc_key, fields[field], ex=ttl)
+
+    def _mirror_request(self, pipe, user_names: list[str]):
+        """Queues full state reads and TTLs for refreshing the legacy JSON copies"""
+        for user_name in user_names:
+            self._state_request(pipe, user_name, lazy=False)
+            pipe.ttl(self._get_user_key_by_name(user_name))
+
+    def _mirror_write(self, pipe, user_names: list[str], responses: list):
+        """Queues legacy JSON copies of the states read by _mirror_request"""
+        for index, user_name in enumerate(user_names):
+            values, docs, ttl = responses[3 * index : 3 * index + 3]
+            state_dict = self._state_response([values, docs])
+            if state_dict:
+                pipe.set(
+                    self._get_legacy_key_by_name(user_name),
+                    UserState(**state_dict).model_dump_json(),
+                    ex=ttl if ttl > 0 else None,
+                )
+
+    def _update_args(
+        self, user_name: str, updates: dict[str, Any], ttl: int | None
+    ) -> tuple[list, list]:
+        """Script keys and arguments for a partial update, see UPDATE_FIELDS_SCRIPT"""
+        fields = encode_fields(updates)
+        keys = [self._get_user_key_by_name(user_name)]
+        pairs, docs = [], []
+        for field, value in fields.items():
+            if field in UserState.LAZY_FIELDS:
+                keys.append(self._get_doc_key_by_name(user_name, field))
+                docs.extend((field, "" if value == NULL_VALUE else value))
+            else:
+                pairs.extend((field, value))
+        return keys, [ttl or 0, len(pairs) // 2, *pairs, *docs]
+
+    def _fields_request(self, pipe, user_name: str, fields: list[str]):
+        """Queues reads of the requested fields: HMGET of the hash, MGET of sub-documents"""
+        # user_id is always set, so it tells an empty field from a missing state
+        pipe.hmget(self._get_user_key_by_name(user_name), ["user_id", *fields])
+        docs = [field for field in fields if field in UserState.LAZY_FIELDS]
+        if docs:
+            pipe.mget([self._get_doc_key_by_name(user_name, field) for field in docs])
+        return docs
+
+    def _fields_response(
+        self, fields: list[str], docs: list[str], responses: list
+    ) -> dict[str, str] | None:
+        """Encoded values of the requested fields, None if the state does not exist"""
+        user_id, *values = responses[0]
+        if user_id is None:
+            return None
+        result = {
+            field: value for field, value in zip(fields, values) if value is not None
+        }
+        if docs:
+            result.update(
+                {
+                    field: value
+                    for field, value in zip(docs, responses[1])
+                    if value is not None
+                }
+            )
+        return result
+
+    def _state_request(self, pipe, user_name: str, lazy: bool):
+        """Queues a full state read: the hash and, unless lazy, every sub-document"""
+        pipe.hgetall(self._get_user_key_by_name(user_name))
+        if not lazy:
+            pipe.mget(
+                [
+                    self._get_doc_key_by_name(user_name, field)
+                    for field in UserState.LAZY_FIELDS
+                ]
+            )
+
+    def _state_response(self, responses: list) -> dict[str, Any]:
+        """Decoded state fields from a _state_request pipeline"""
+        values = responses[0]
+        if values and len(responses) > 1:
+            values.update(
+                {
+                    field: value
+                    for field, value in zip(UserState.LAZY_FIELDS, responses[1])
+                    if value is not None
+                }
+            )
+        return decode_fields(values)
+
+
+class RedisClient(UserStateStorage):
+    """Redis client for user state caching"""
+
+    def __init__(self, client: redis.Redis | None = None, cache_size: int = 0):
+        self.redis_client = client or get_redis()
+        self._update_fields = self.redis_client.register_script(UPDATE_FIELDS_SCRIPT)
+        self.near_cache = (
+            NearCache(
+                self.redis_client, "user_state:", cache_size, self._get_user_name_by_key
+            )
+            if cache_size
+            else None
+        )
+
+    def _invalidate(self, user_name: str):
+        """Drops the local cache entry right away, other processes get the notification"""
+        if self.near_cache:
+            self.near_cache.invalidate(user_name)
+
+    def _get_cached_state(self, user_name: str) -> UserState | None:
+        return self.near_cache.get(user_name) if self.near_cache else None
+
+    def _mirror_legacy_states(self, user_names: list[str]):
+        """Refreshes the legacy JSON copies after partial updates of the hash"""
+        if settings.REDIS_LEGACY_STATE_CLEANUP or not user_names:
+            return
         try:
-            key = self._get_user_key_by_name(user_name)
-            data = self.redis_client.get(key)
-
-            if data:
-                state_dict = json.loads(data)
-                now = datetime.now()
-                state_dict["current_date"] = now.strftime("%Y-%m-%d")
-                state_dict["current_time"] = now.strftime("%H:%M:%S")
-                state_dict["current_weekday"] = now.strftime("%A")
-                self.redis_client.set(key, json.dumps(state_dict))
-                return UserState(**state_dict)
+            pipe = self.pipeline(transaction=False)
+            self._mirror_request(pipe, user_names)
+            responses = pipe.execute()
+            pipe = self.pipeline(transaction=False)
+            self._mirror_write(pipe, user_names, responses)
+            pipe.execute()
+        except Exception as e:
+            logger.error(
+                f"redis_client_015: Error mirroring legacy states of {user_names}: {e}"
+            )
+
+    def migrate_legacy_state(self, user_name: str) -> dict[str, Any] | None:
+        """
+        Copies a legacy JSON user state into the hash, returns the migrated fields
+
+        Until REDIS_LEGACY_STATE_CLEANUP is on, the legacy key is kept and
+        rewritten on every save; then it is deleted. An existing hash is never
+        overwritten.
+        """
+        legacy_key = self._get_legacy_key_by_name(user_name)
+        pipe = self.pipeline(transaction=False)
+        self._legacy_request(pipe, user_name)
+        data, ttl, migrated = pipe.execute()
+        if not data or migrated:
             return None
 
+        state = UserState(**json.loads(data))
+        pipe = self.redis_client.pipeline()
+        self._write_state(pipe, user_name, state, ttl if ttl > 0 else None)
+        if settings.REDIS_LEGACY_STATE_CLEANUP:
+            pipe.delete(legacy_key)
+        pipe.execute()
+
+        logger.info(
+            f"redis_client_008: Migrated legacy user state of {user_name} to hash"
+        )
+        return state.model_dump()
+
+    def migrate_legacy_states(self) -> int:
+        """Migrates all legacy JSON user states that have no hash yet"""
+        prefix = self._get_legacy_key_by_name("")
+        user_names = [
+            key[len(prefix) :]
+            for key in self.redis_client.scan_iter(match=f"{prefix}*")
+        ]
+        if not user_names:
+            return 0
+        # Mirrored legacy keys already have a hash, check them all in one round trip
+        pipe = self.pipeline(transaction=False)
+        for user_name in user_names:
+            pipe.exists(self._get_user_key_by_name(user_name))
+        exists = pipe.execute()
+        migrated = 0
+        for user_name, has_hash in zip(user_names, exists):
+            if not has_hash and self.migrate_legacy_state(user_name):
+                migrated += 1
+        return migrated
+
+    def get_user_state_by_name(
+        self, user_name: str, lazy: bool = False
+    ) -> UserState | None:
+        """
+        Gets user state from Redis by username with current datetime, never writes
+
+        Args:
+            user_name: User name
+            lazy: Skip UserState.LAZY_FIELDS sub-documents, state.get_lazy() fetches them
+        """
+        try:
+            cached = self._get_cached_state(user_name)
+            if cached:
+                return cached.model_copy(update=current_datetime_fields(), deep=True)
+
+            version = self.near_cache.version if self.near_cache else 0
+            pipe = self.pipeline(transaction=False)
+            self._state_request(pipe, user_name, lazy)
+            state_dict = self._state_response(pipe.execute())
+            if not state_dict:
+                state_dict = self.migrate_legacy_state(user_name)
+                lazy = False
+
+            if not state_dict:
+                return None
+            state = UserState(**state_dict)
+            if lazy:
+                state = state.model_copy(update=current_datetime_fields())
+                return state.bind_loader(
+                    lambda field: self.get_user_field(user_name, field)
+                )
+            if self.near_cache:
+                self.near_cache.put(user_name, state, version)
+            return state.model_copy(update=current_datetime_fields(), deep=True)
+
         except Exception as e:
             logger.error(
                 f"redis_client_006: Error getting user state by name {user_name}: {e}"
@@ -59,13 +600,10 @@ class RedisClient:
             ttl: Time to live in seconds (default: None)
         """
         try:
-            key = self._get_user_key_by_name(user_name)
-            data = state.model_dump_json()
-
-            if ttl:
-                self.redis_client.setex(key, ttl, data)
-            else:
-                self.redis_client.set(key, data)
+            pipe = self.redis_client.pipeline()
+            self._write_state(pipe, user_name, state, ttl)
+            pipe.execute()
+            self._invalidate(user_name)
 
             return True
 
@@ -73,11 +611,40 @@ class RedisClient:
             logger.error(f"redis_client_002: Error saving user state {user_name}: {e}")
             return False
 
+    def merge_user_states(
+        self, fields_by_user: dict[str, dict[str, Any]], ttl: int | None = None
+    ) -> bool:
+        """
+        Writes the given fields into several users' states in one pipelined round trip
+
+        Unlike set_user_state, other fields of an existing state are kept and a
+        missing state is created from the given fields.
+        """
+        try:
+            pipe = self.pipeline(transaction=False)
+            for user_name, fields in fields_by_user.items():
+                self._write_fields(pipe, user_name, fields, ttl)
+            pipe.execute()
+            for user_name in fields_by_user:
+                self._invalidate(user_name)
+            self._mirror_legacy_states(list(fields_by_user))
+            return True
+
+        except Exception as e:
+            logger.error(
+                f"redis_client_014: Error merging {len(fields_by_user)} user states: {e}"
+            )
+            return False
+
+    def pipeline(self, transaction: bool = True) -> redis.client.Pipeline:
+        """Pipeline on the shared pool for batching commands into one round trip"""
+        return self.redis_client.pipeline(transaction=transaction)
+
     def update_user_state(
         self, user_name: str, updates: dict[str, Any], ttl: int | None = None
     ) -> bool:
         """
-        Partially updates user state
+        Atomically updates the given fields of an existing user state
 
         Args:
             user_name: User name
@@ -85,18 +652,18 @@ class RedisClient:
             ttl: Record lifetime in seconds
         """
         try:
-            current_state = self.get_user_state_by_name(user_name)
+            keys, args = self._update_args(user_name, updates, ttl)
 
-            if current_state is None:
-                logger.error(f"redis_client_007: User state not found for {user_name}")
-                return False
+            if self._update_fields(keys=keys, args=args) or (
+                self.migrate_legacy_state(user_name)
+                and self._update_fields(keys=keys, args=args)
+            ):
+                self._invalidate(user_name)
+                self._mirror_legacy_states([user_name])
+                return True
 
-            # Update fields
-            state_dict = current_state.model_dump()
-            state_dict.update(updates)
-
-            updated_state = UserState(**state_dict)
-            return self.set_user_state(user_name, updated_state, ttl)
+            logger.error(f"redis_client_007: User state not found for {user_name}")
+            return False
 
         except Exception as e:
             logger.error(
@@ -104,11 +671,37 @@ class RedisClient:
             )
             return False
 
+    def update_user_states(
+        self, updates_by_user: dict[str, dict[str, Any]], ttl: int | None = None
+    ) -> dict[str, bool]:
+        """Atomically updates several users' states in one pipelined round trip"""
+        try:
+            pipe = self.pipeline(transaction=False)
+            for user_name, updates in updates_by_user.items():
+                keys, args = self._update_args(user_name, updates, ttl)
+                self._update_fields(keys=keys, args=args, client=pipe)
+            results = pipe.execute()
+            for user_name in updates_by_user:
+                self._invalidate(user_name)
+            saved = {
+                user_name: bool(result)
+                for user_name, result in zip(updates_by_user, results)
+            }
+            self._mirror_legacy_states([name for name, ok in saved.items() if ok])
+            return saved
+
+        except Exception as e:
+            logger.error(f"redis_client_010: Error updating user states: {e}")
+            return {user_name: False for user_name in updates_by_user}
+
     def delete_user_state(self, user_name: str) -> bool:
         """Deletes user state from Redis"""
         try:
-            key = self._get_user_key_by_name(user_name)
-            result = self.redis_client.delete(key)
+            result = self.redis_client.delete(
+                *self._get_state_keys(user_name),
+                self._get_legacy_key_by_name(user_name),
+            )
+            self._invalidate(user_name)
             return result > 0
 
         except Exception as e:
@@ -117,12 +710,50 @@ class RedisClient:
             )
             return False
 
+    def get_user_fields(self, user_name: str, fields: list[str]) -> dict[str, Any]:
+        """Gets several fields from user state: HMGET plus MGET of sub-documents, one round trip"""
+        fields = [field for field in fields if field in FIELD_ADAPTERS]
+        if not fields:
+            return {}
+        try:
+            cached = self._get_cached_state(user_name)
+            if cached:
+                result = {
+                    field: copy.deepcopy(getattr(cached, field)) for field in fields
+                }
+                current = current_datetime_fields()
+                result.update(
+                    {field: current[field] for field in fields if field in current}
+                )
+                return result
+
+            pipe = self.pipeline(transaction=False)
+            docs = self._fields_request(pipe, user_name, fields)
+            values = self._fields_response(fields, docs, pipe.execute())
+            if values is None:
+                state_dict = self.migrate_legacy_state(user_name)
+                if state_dict is None:
+                    return {}
+                result = {field: state_dict.get(field) for field in fields}
+            else:
+                result = {
+                    field: decode_field(field, value) for field, value in values.items()
+                }
+            current = current_datetime_fields()
+            result.update(
+                {field: current[field] for field in fields if field in current}
+            )
+            return result
+
+        except Exception as e:
+            logger.error(
+                f"redis_client_009: Error getting fields {fields} of {user_name}: {e}"
+            )
+            return {}
+
     def get_user_field(self, user_name: str, field: str) -> Any | None:
         """Gets specific field from user state"""
-        state = self.get_user_state_by_name(user_name)
-        if state:
-            return getattr(state, field, None)
-        return None
+        return self.get_user_fields(user_name, [field]).get(field)
 
     def set_user_field(
         self, user_name: str, field: str, value: Any, ttl: int | None = None
@@ -131,14 +762,8 @@ class RedisClient:
         return self.update_user_state(user_name, {field: value}, ttl)
 
     def update_current_datetime(self, user_name: str) -> bool:
-        """Updates current date and time for user"""
-        now = datetime.now()
-        updates = {
-            "current_date": now.strftime("%Y-%m-%d"),
-            "current_time": now.strftime("%H:%M:%S"),
-            "current_weekday": now.strftime("%A"),
-        }
-        return self.update_user_state(user_name, updates)
+        """Stores current date and time for user, reads compute them anyway"""
+        return self.update_user_state(user_name, current_datetime_fields())
 
     def ping(self) -> bool:
         """Check Redis connection"""
@@ -150,4 +775,4 @@ class RedisClient:
 
 
 # Global client instance
-redis_client = RedisClient()
+redis_client = RedisClient(cache_size=settings.REDIS_NEAR_CACHE_SIZE)
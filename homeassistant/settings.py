@@ -150,6 +150,68 @@ LOGGING = {
 REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
 REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
 REDIS_DB = int(os.getenv("REDIS_DB", 0))
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", 50))
+REDIS_POOL_TIMEOUT = float(os.getenv("REDIS_POOL_TIMEOUT", 5))
+REDIS_SOCKET_TIMEOUT = float(os.getenv("REDIS_SOCKET_TIMEOUT", 5))
+REDIS_SOCKET_CONNECT_TIMEOUT = float(os.getenv("REDIS_SOCKET_CONNECT_TIMEOUT", 2))
+REDIS_RETRY_ON_TIMEOUT = os.getenv("REDIS_RETRY_ON_TIMEOUT", "True") == "True"
+REDIS_HEALTH_CHECK_INTERVAL = int(os.getenv("REDIS_HEALTH_CHECK_INTERVAL", 30))
+# User state fields larger than this many bytes are stored zlib-compressed (0 disables)
+REDIS_COMPRESS_MIN_SIZE = int(os.getenv("REDIS_COMPRESS_MIN_SIZE", 1024))
+# In-process LRU of user states, needs notify-keyspace-events "K$ghxe" on the server (0 disables)
+REDIS_NEAR_CACHE_SIZE = int(os.getenv("REDIS_NEAR_CACHE_SIZE", 256))
+# Off: every save also rewrites the legacy user_state:name:* JSON, so other Archie
+# services on shared_network keep reading current state; their writes to that key
+# are not read back. Switch them to the hash first, then turn this on: migration
+# deletes the legacy key and saves stop writing it.
+REDIS_LEGACY_STATE_CLEANUP = os.getenv("REDIS_LEGACY_STATE_CLEANUP", "False") == "True"
+# Approximate number of events kept per device class stream (XADD MAXLEN ~)
+DEVICE_EVENTS_MAXLEN = int(os.getenv("DEVICE_EVENTS_MAXLEN", 10000))
+
+# Yeelight connection pool
+YEELIGHT_COMMANDS_PER_MINUTE = int(os.getenv("YEELIGHT_COMMANDS_PER_MINUTE", 60))
+YEELIGHT_RATE_LIMIT_MAX_WAIT = float(os.getenv("YEELIGHT_RATE_LIMIT_MAX_WAIT", 2))
+YEELIGHT_KEEPALIVE_IDLE = int(os.getenv("YEELIGHT_KEEPALIVE_IDLE", 30))
+YEELIGHT_RECONNECT_BACKOFF_BASE = float(os.getenv("YEELIGHT_RECONNECT_BACKOFF_BASE", 1))
+YEELIGHT_RECONNECT_BACKOFF_MAX = float(os.getenv("YEELIGHT_RECONNECT_BACKOFF_MAX", 60))
+YEELIGHT_FANOUT_WORKERS = int(os.getenv("YEELIGHT_FANOUT_WORKERS", 16))
+YEELIGHT_DEVICE_DEADLINE = float(os.getenv("YEELIGHT_DEVICE_DEADLINE", 3))
+YEELIGHT_NOTIFY_ENABLED = os.getenv("YEELIGHT_NOTIFY_ENABLED", "True") == "True"
+YEELIGHT_MUSIC_MODE_HOST = os.getenv("YEELIGHT_MUSIC_MODE_HOST")
+# Fixed port: a random one (0) cannot be published from the Docker bridge network.
+# Music mode is per process, so the web app must run as a single worker to use it
+YEELIGHT_MUSIC_MODE_PORT = int(os.getenv("YEELIGHT_MUSIC_MODE_PORT", 55440))
+YEELIGHT_MUSIC_MODE_IDLE_TIMEOUT = float(
+    os.getenv("YEELIGHT_MUSIC_MODE_IDLE_TIMEOUT", 60)
+)
+YEELIGHT_DISCOVERY_ENABLED = os.getenv("YEELIGHT_DISCOVERY_ENABLED", "True") == "True"
+YEELIGHT_DISCOVERY_INTERVAL = float(os.getenv("YEELIGHT_DISCOVERY_INTERVAL", 60))
+YEELIGHT_DISCOVERY_TTL = float(os.getenv("YEELIGHT_DISCOVERY_TTL", 180))
+# Long-poll cap of /light/api/devices/scan/?wait=, each wait holds a worker thread
+YEELIGHT_DISCOVERY_MAX_WAIT = float(os.getenv("YEELIGHT_DISCOVERY_MAX_WAIT", 5))
+
+# Light schedules runtime
+LIGHT_SCHEDULER_MISFIRE_GRACE = float(os.getenv("LIGHT_SCHEDULER_MISFIRE_GRACE", 60))
+LIGHT_SCHEDULER_CHANNEL = os.getenv("LIGHT_SCHEDULER_CHANNEL", "light:schedules")
+# Lamp and group edits, listened to by every process that keeps a device registry
+LIGHT_DEVICES_CHANNEL = os.getenv("LIGHT_DEVICES_CHANNEL", "light:devices")
+
+# Device polling (poll_devices): per-source interval, jitter and timeout in seconds
+POLL_WORKERS = int(os.getenv("POLL_WORKERS", 4))
+POLL_LIGHT_INTERVAL = float(os.getenv("POLL_LIGHT_INTERVAL", 30))
+POLL_CLIMATE_INTERVAL = float(os.getenv("POLL_CLIMATE_INTERVAL", 30))
+POLL_JITTER = float(os.getenv("POLL_JITTER", 3))
+POLL_TIMEOUT = float(os.getenv("POLL_TIMEOUT", 10))
+POLL_MAX_BACKOFF = float(os.getenv("POLL_MAX_BACKOFF", 300))
+# Adaptive cadence: fast while the dashboard heartbeat or a recent command is live,
+# doubling up to POLL_MAX_INTERVAL while polled values stay unchanged
+POLL_FAST_INTERVAL = float(os.getenv("POLL_FAST_INTERVAL", 2))
+POLL_MAX_INTERVAL = float(os.getenv("POLL_MAX_INTERVAL", 300))
+POLL_ACTIVE_TTL = float(os.getenv("POLL_ACTIVE_TTL", 60))
+# Commands wake the pollers at most once per this many seconds (slider drags send ~20/s)
+POLL_COMMAND_WAKEUP_INTERVAL = float(os.getenv("POLL_COMMAND_WAKEUP_INTERVAL", 1))
+# Dashboard SSE streams served by WSGI worker threads at once; past it browsers poll
+DASHBOARD_STREAM_MAX_THREADS = int(os.getenv("DASHBOARD_STREAM_MAX_THREADS", 8))
 
 # Spotify OAuth
 SPOTIFY_CLIENT_ID = os.getenv("SPOTIFY_CLIENT_ID")
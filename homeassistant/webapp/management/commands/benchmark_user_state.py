@@ -0,0 +1,95 @@
+"""Django management command to compare UserState serialization paths"""
+
+import json
+import time
+
+from archie_shared.user.models import UserState
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+
+from homeassistant.redis_client import decode_fields, encode_state
+from homeassistant.webapp.views_dashboard import _get_fallback_dashboard
+
+
+def build_state(devices: int) -> UserState:
+    """Dashboard-laden user state similar to what poll_devices and the AI agent write"""
+    light_devices = [
+        {
+            "id": str(i),
+            "name": f"Лампа {i}",
+            "ip": f"192.168.1.{100 + i}",
+            "room": "Гостиная",
+            "is_on": i % 2 == 0,
+            "brightness": 40 + i % 60,
+            "color_temp": 2700,
+            "rgb_color": "#FFB46B",
+        }
+        for i in range(devices)
+    ]
+    dashboard = _get_fallback_dashboard()
+    dashboard["light"]["devices"] = light_devices
+    return UserState(
+        user_id="1",
+        user_name="Niko",
+        default_city="Berlin",
+        persona="friendly",
+        transport_preferences=["bike", "public_transport"],
+        smarthome_light={"devices": light_devices, "total": devices},
+        smarthome_climate={"devices": [{"name": "Кондиционер", "temperature": 22}]},
+        smarthome_dashboard=dashboard,
+    )
+
+
+class Command(BaseCommand):
+    help = "Benchmark encode/decode time and payload size of UserState codecs"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--iterations", type=int, default=2000)
+        parser.add_argument("--devices", type=int, default=20)
+
+    def measure(self, encode, decode, iterations: int):
+        """Average encode and decode time in microseconds and payload size"""
+        started = time.perf_counter()
+        for _ in range(iterations):
+            payload = encode()
+        encode_time = (time.perf_counter() - started) / iterations * 1e6
+        started = time.perf_counter()
+        for _ in range(iterations):
+            decode(payload)
+        decode_time = (time.perf_counter() - started) / iterations * 1e6
+        if isinstance(payload, dict):
+            size = sum(len(k) + len(v.encode()) for k, v in payload.items())
+        else:
+            size = len(payload.encode())
+        return encode_time, decode_time, size
+
+    def handle(self, *args, **options):
+        state = build_state(options["devices"])
+        iterations = options["iterations"]
+
+        results = {
+            "legacy json blob": self.measure(
+                state.model_dump_json,
+                lambda data: UserState(**json.loads(data)),
+                iterations,
+            )
+        }
+        with override_settings(REDIS_COMPRESS_MIN_SIZE=0):
+            results["hash, json"] = self.measure(
+                lambda: encode_state(state),
+                lambda fields: UserState(**decode_fields(fields)),
+                iterations,
+            )
+        results["hash, json + zlib"] = self.measure(
+            lambda: encode_state(state),
+            lambda fields: UserState(**decode_fields(fields)),
+            iterations,
+        )
+
+        self.stdout.write(
+            f"{'codec':<20}{'encode, us':>12}{'decode, us':>12}{'bytes':>10}"
+        )
+        for name, (encode_time, decode_time, size) in results.items():
+            self.stdout.write(
+                f"{name:<20}{encode_time:>12.1f}{decode_time:>12.1f}{size:>10}"
+            )
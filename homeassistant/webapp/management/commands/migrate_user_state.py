@@ -0,0 +1,18 @@
+"""Django management command to move legacy JSON user states into Redis hashes"""
+
+import logging
+
+from django.core.management.base import BaseCommand
+
+from homeassistant.redis_client import redis_client
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Convert user_state:name:* JSON strings into per-field user state hashes"
+
+    def handle(self, *args, **options):
+        migrated = redis_client.migrate_legacy_states()
+        logger.info(f"migrate_user_state_001: Migrated {migrated} user states")
+        self.stdout.write(self.style.SUCCESS(f"Migrated {migrated} user states"))
@@ -1,42 +1,48 @@
 """Django management command to poll smart home devices and save state to Redis"""
 
 import logging
-import time
 
+from django.conf import settings
 from django.core.management.base import BaseCommand
 
 from homeassistant.climate.services import ClimateStateService
+from homeassistant.device_events import is_active
+from homeassistant.light.device_registry import device_registry
 from homeassistant.light.services import LightStateService
+from homeassistant.webapp.polling import Poller, PollingEngine
 
 logger = logging.getLogger(__name__)
 
 
 class Command(BaseCommand):
-    help = "Poll smart home devices every 30 seconds and save state to Redis"
+    help = "Poll smart home devices concurrently and save state to Redis for every active user"
 
     def handle(self, *args, **options):
         self.stdout.write(self.style.SUCCESS("Starting device polling service..."))
         logger.info("poll_devices_001: Device polling service started")
 
-        light_service = LightStateService()
-        climate_service = ClimateStateService()
-
-        while True:
-            try:
-                logger.info("poll_devices_002: Polling devices...")
-
-                # Poll light devices
-                light_service.save_to_redis()
-
-                # Poll climate devices
-                climate_service.save_to_redis()
-
-                logger.info(
-                    "poll_devices_003: Device state saved to Redis successfully"
+        engine = PollingEngine(workers=settings.POLL_WORKERS, activity=is_active)
+        sources = [
+            ("light", LightStateService(), settings.POLL_LIGHT_INTERVAL),
+            ("climate", ClimateStateService(), settings.POLL_CLIMATE_INTERVAL),
+        ]
+        for name, service, interval in sources:
+            engine.register(
+                Poller(
+                    name,
+                    service.save_to_redis,
+                    interval=interval,
+                    jitter=settings.POLL_JITTER,
+                    timeout=settings.POLL_TIMEOUT,
+                    max_backoff=settings.POLL_MAX_BACKOFF,
+                    fast_interval=settings.POLL_FAST_INTERVAL,
+                    max_interval=settings.POLL_MAX_INTERVAL,
                 )
-
-            except Exception as e:
-                logger.error(f"poll_devices_error_001: Error polling devices: {e}")
-
-            # Wait 30 seconds before next poll
-            time.sleep(30)
+            )
+            logger.info(
+                f"poll_devices_002: Registered {name} poller every {interval}s ({settings.POLL_FAST_INTERVAL}s while active, up to {settings.POLL_MAX_INTERVAL}s while stable)"
+            )
+
+        # Lamps and groups edited in the admin reach this process over Redis
+        device_registry.start_listening()
+        engine.run_forever()
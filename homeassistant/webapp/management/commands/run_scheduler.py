@@ -0,0 +1,27 @@
+"""Django management command to execute LightSchedule rows at their exact times"""
+
+import logging
+
+from django.core.management.base import BaseCommand
+
+from homeassistant.light.scheduler import light_scheduler
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = "Run light schedules from an in-memory timer heap, reloading on changes"
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.SUCCESS("Starting light scheduler..."))
+        logger.info("run_scheduler_001: Light scheduler started")
+
+        light_scheduler.start_listening()
+        try:
+            light_scheduler.run_forever()
+        except KeyboardInterrupt:
+            light_scheduler.stop()
+        finally:
+            logger.info(
+                f"run_scheduler_002: Light scheduler stopped, metrics: {light_scheduler.get_metrics()}"
+            )
@@ -73,36 +73,52 @@ class UserProfile(models.Model):
     def __str__(self):
         return f"{self.user.username} Profile"
 
-    def sync_to_redis(self):
-        """Syncs user profile to Redis cache"""
+    @property
+    def state_name(self) -> str:
+        """Redis user state key: the name the dashboard and the pollers use"""
+        return self.user_name or self.user.username
+
+    def build_profile_fields(self) -> dict:
+        """UserState fields owned by the profile, the rest of the state belongs to other services"""
+        return {
+            "user_id": str(self.user.id),
+            "user_name": self.state_name,
+            "default_city": self.default_city,
+            "default_country": self.default_country,
+            "persona": self.persona,
+            "user_timezone": self.user_timezone,
+            "measurement_units": self.measurement_units,
+            "language": self.language,
+            "currency": self.currency,
+            "date_format": self.date_format,
+            "time_format": self.time_format,
+            "commercial_holidays": self.commercial_holidays,
+            "commercial_check_open_now": self.commercial_check_open_now,
+            "transport_preferences": self.transport_preferences or [],
+            "cuisine_preferences": self.cuisine_preferences or [],
+        }
+
+    def build_user_state(self):
+        """Builds the Redis UserState for this profile"""
         from datetime import datetime
 
         from archie_shared.user.models import UserState
 
-        from homeassistant.redis_client import redis_client
-
         now = datetime.now()
-        state = UserState(
-            user_id=str(self.user.id),
-            user_name=self.user_name or self.user.username,
-            default_city=self.default_city,
-            default_country=self.default_country,
-            persona=self.persona,
-            user_timezone=self.user_timezone,
-            measurement_units=self.measurement_units,
-            language=self.language,
-            currency=self.currency,
-            date_format=self.date_format,
-            time_format=self.time_format,
-            commercial_holidays=self.commercial_holidays,
-            commercial_check_open_now=self.commercial_check_open_now,
-            transport_preferences=self.transport_preferences or [],
-            cuisine_preferences=self.cuisine_preferences or [],
+        return UserState(
+            **self.build_profile_fields(),
             current_date=now.strftime("%Y-%m-%d"),
             current_time=now.strftime("%H:%M:%S"),
             current_weekday=now.strftime("%A"),
         )
-        return redis_client.set_user_state(str(self.user.id), state)
+
+    def sync_to_redis(self):
+        """Merges profile fields into the user state in Redis, device and dashboard state stay"""
+        from homeassistant.redis_client import redis_client
+
+        return redis_client.merge_user_states(
+            {self.state_name: self.build_profile_fields()}
+        )
 
 
 @receiver(post_save, sender=UserProfile)
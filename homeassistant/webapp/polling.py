@@ -0,0 +1,225 @@
+import logging
+import random
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable
+
+from django.db import close_old_connections
+
+logger = logging.getLogger(__name__)
+
+# Upper bound of a loop sleep, so the loop notices changes made outside tick()
+MAX_SLEEP = 60
+# Cap on the backoff and slowdown exponents: the delay is clamped to its maximum long
+# before, and an unbounded 2**n of a long streak would overflow the float multiply
+MAX_BACKOFF_EXPONENT = 16
+
+
+def get_active_user_names() -> list[str]:
+    """Redis user state names of every active user with a profile, see UserProfile.state_name"""
+    from homeassistant.webapp.models import UserProfile
+
+    profiles = UserProfile.objects.filter(user__is_active=True).values_list(
+        "user_name", "user__username"
+    )
+    return [user_name or username for user_name, username in profiles]
+
+
+class Poller:
+    """
+    A polling source with its own adaptive cadence, timeout and failure backoff
+
+    poll(user_names) returns the number of changed values, or None on failure.
+    While activity is reported the source runs every fast_interval; otherwise
+    every run without changes doubles the interval up to max_interval.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        poll: Callable[[list[str]], int | None],
+        interval: float,
+        jitter: float = 0.0,
+        timeout: float = 10.0,
+        max_backoff: float = 300.0,
+        fast_interval: float | None = None,
+        max_interval: float | None = None,
+    ):
+        self.name = name
+        self.poll = poll
+        self.interval = interval
+        self.jitter = jitter
+        self.timeout = timeout
+        self.max_backoff = max_backoff
+        self.fast_interval = fast_interval or interval
+        self.max_interval = max_interval or interval
+        self.next_run = 0.0
+        self.failures = 0
+        self.stable_runs = 0
+        self.last_success = None
+        self.future: Future | None = None
+        self.started_at = 0.0
+        self.timed_out = False
+
+    def schedule_next(self, now: float, changed: int | None, active: bool = False):
+        """Next run by activity and change rate, or after an exponential backoff on failure"""
+        if changed is None:
+            self.failures += 1
+            exponent = min(self.failures, MAX_BACKOFF_EXPONENT)
+            delay = min(self.interval * 2**exponent, self.max_backoff)
+        else:
+            self.failures = 0
+            self.last_success = now
+            self.stable_runs = (
+                0 if changed else min(self.stable_runs + 1, MAX_BACKOFF_EXPONENT)
+            )
+            if active:
+                delay = self.fast_interval
+            else:
+                delay = min(self.interval * 2**self.stable_runs, self.max_interval)
+        # Jitter keeps sources that share an interval from hitting the LAN together
+        self.next_run = now + delay + random.uniform(0, self.jitter)
+
+
+class PollingEngine:
+    """
+    Runs registered pollers concurrently on a thread pool
+
+    The loop only submits and collects jobs, so a slow or hung source delays
+    nobody else: it is timed out, backed off and not resubmitted until its
+    stuck call returns.
+    """
+
+    def __init__(
+        self,
+        users_provider: Callable[[], list[str]] = get_active_user_names,
+        workers: int = 4,
+        activity: Callable[[], bool] = lambda: False,
+    ):
+        self.users_provider = users_provider
+        self.activity = activity
+        self.pollers: dict[str, Poller] = {}
+        self.executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="poller"
+        )
+        self._stop_event = threading.Event()
+        self._wakeup = threading.Event()
+        self._activity_requested = False
+
+    def register(self, poller: Poller):
+        self.pollers[poller.name] = poller
+
+    def _run_job(self, poller: Poller) -> tuple[int | None, bool]:
+        close_old_connections()
+        try:
+            user_names = self.users_provider()
+            if not user_names:
+                logger.info(f"polling_001: No active users, skipping {poller.name}")
+                return 0, False
+            return poller.poll(user_names), self.activity()
+        finally:
+            close_old_connections()
+
+    def _collect(self, poller: Poller, now: float):
+        """Reschedules a poller whose job finished or ran over its timeout"""
+        future = poller.future
+        if future.done():
+            poller.future = None
+            if poller.timed_out:
+                # Already counted as a failure when it timed out
+                poller.timed_out = False
+                return
+            try:
+                changed, active = future.result()
+            except Exception as e:
+                logger.error(f"polling_error_001: {poller.name} poll failed: {e}")
+                changed, active = None, False
+            poller.schedule_next(now, changed, active)
+            if changed is None:
+                logger.info(
+                    f"polling_002: {poller.name} failed {poller.failures} times, next in {poller.next_run - now:.1f}s"
+                )
+        elif not poller.timed_out and now - poller.started_at > poller.timeout:
+            poller.timed_out = True
+            poller.schedule_next(now, None)
+            logger.error(
+                f"polling_error_002: {poller.name} timed out after {poller.timeout}s"
+            )
+
+    def tick(self, now: float | None = None) -> float:
+        """Collects finished jobs, submits due ones, returns seconds until the next event"""
+        now = time.monotonic() if now is None else now
+        wake_at = now + MAX_SLEEP
+        activity_requested, self._activity_requested = self._activity_requested, False
+        for poller in self.pollers.values():
+            if activity_requested:
+                poller.next_run = min(poller.next_run, now)
+            if poller.future is not None:
+                self._collect(poller, now)
+            if poller.future is None and poller.next_run <= now:
+                poller.started_at = now
+                poller.future = self.executor.submit(self._run_job, poller)
+                poller.future.add_done_callback(lambda _: self._wakeup.set())
+            # A timed out job that is still stuck wakes the loop when it returns
+            if poller.future is None:
+                wake_at = min(wake_at, poller.next_run)
+            elif not poller.timed_out:
+                wake_at = min(wake_at, poller.started_at + poller.timeout)
+        return max(wake_at - now, 0.05)
+
+    def get_status(self, now: float | None = None) -> dict[str, dict]:
+        """Per-source freshness: age of the last successful poll, failures, next run"""
+        now = time.monotonic() if now is None else now
+        return {
+            name: {
+                "age": (
+                    now - poller.last_success
+                    if poller.last_success is not None
+                    else None
+                ),
+                "failures": poller.failures,
+                "stable_runs": poller.stable_runs,
+                "running": poller.future is not None,
+                "next_run_in": max(poller.next_run - now, 0),
+            }
+            for name, poller in self.pollers.items()
+        }
+
+    def request_activity(self):
+        """Activity just started: every idle source polls right away"""
+        self._activity_requested = True
+        self._wakeup.set()
+
+    def listen_for_activity(self):
+        """Redis subscription: a dashboard heartbeat or command cuts any backoff short"""
+        from homeassistant.device_events import ACTIVITY_CHANNEL, device_event_log
+
+        while not self._stop_event.is_set():
+            try:
+                pubsub = device_event_log.redis_client.pubsub(
+                    ignore_subscribe_messages=True
+                )
+                pubsub.subscribe(ACTIVITY_CHANNEL)
+                while not self._stop_event.is_set():
+                    if pubsub.get_message(timeout=1.0):
+                        self.request_activity()
+            except Exception as e:
+                logger.error(f"polling_error_003: Activity subscription lost: {e}")
+                time.sleep(5)
+
+    def stop(self):
+        self._stop_event.set()
+        self._wakeup.set()
+
+    def run_forever(self):
+        """Main loop: sleeps until the nearest due run, timeout, finished job or activity"""
+        self._stop_event.clear()
+        threading.Thread(
+            target=self.listen_for_activity, name="poller-activity", daemon=True
+        ).start()
+        while not self._stop_event.is_set():
+            # Cleared before tick(): a job finishing during tick() still wakes the wait
+            self._wakeup.clear()
+            self._wakeup.wait(self.tick())
+        self.executor.shutdown(wait=False, cancel_futures=True)
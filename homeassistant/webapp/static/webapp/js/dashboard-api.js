@@ -1,21 +1,33 @@
 // Dashboard API Client
-// Handles fetching dashboard data from backend and auto-refresh polling
+// Handles fetching dashboard data from backend, live updates over SSE and polling fallback
 
 let dashboardPollingInterval = null;
+let dashboardEventSource = null;
 let currentDashboardData = null;
+let currentDashboardEtag = null;
 
 /**
  * Fetch dashboard data from backend
- * @returns {Promise<Object>} Dashboard data
+ * Sends the last ETag, so an unchanged dashboard costs a header-only 304
+ * @returns {Promise<Object|null>} Dashboard data or null if not modified
  */
 async function fetchDashboard() {
     try {
-        const response = await fetch('/api/dashboard/');
+        const headers = {};
+        if (currentDashboardEtag && currentDashboardData) {
+            headers['If-None-Match'] = currentDashboardEtag;
+        }
+        const response = await fetch('/api/dashboard/', { headers });
+        
+        if (response.status === 304) {
+            return null;
+        }
         
         if (!response.ok) {
             throw new Error(`HTTP error! status: ${response.status}`);
         }
         
+        currentDashboardEtag = response.headers.get('ETag');
         const data = await response.json();
         console.log('Dashboard data fetched:', data);
         return data;
@@ -32,35 +44,93 @@ async function fetchDashboard() {
 async function updateDashboard() {
     try {
         const data = await fetchDashboard();
-        currentDashboardData = data;
-        
-        // Update global dashboardData for sidebar
-        if (typeof window !== 'undefined') {
-            window.dashboardData = data;
-        }
-        
-        // Trigger dashboard re-render
-        if (typeof renderDashboardGrid === 'function') {
-            renderDashboardGrid(data);
-            // Re-initialize Lucide icons after render
-            if (typeof lucide !== 'undefined' && lucide.createIcons) {
-                lucide.createIcons();
-            }
-        }
-        
-        // Update sidebar if needed
-        if (typeof renderRightSidebar === 'function') {
-            renderRightSidebar();
-            if (typeof lucide !== 'undefined' && lucide.createIcons) {
-                lucide.createIcons();
-            }
+        if (data) {
+            applyDashboardData(data);
         }
-        
     } catch (error) {
         console.error('Failed to update dashboard:', error);
     }
 }
 
+/**
+ * Store dashboard data and re-render dashboard and sidebar
+ * @param {Object} data - Full dashboard data
+ */
+function applyDashboardData(data) {
+    currentDashboardData = data;
+    
+    // Update global dashboardData for sidebar
+    if (typeof window !== 'undefined') {
+        window.dashboardData = data;
+    }
+    
+    // Trigger dashboard re-render
+    if (typeof renderDashboardGrid === 'function') {
+        renderDashboardGrid(data);
+        // Re-initialize Lucide icons after render
+        if (typeof lucide !== 'undefined' && lucide.createIcons) {
+            lucide.createIcons();
+        }
+    }
+    
+    // Update sidebar if needed
+    if (typeof renderRightSidebar === 'function') {
+        renderRightSidebar();
+        if (typeof lucide !== 'undefined' && lucide.createIcons) {
+            lucide.createIcons();
+        }
+    }
+}
+
+/**
+ * Start live dashboard updates over Server-Sent Events
+ * The server sends the full dashboard on connect and then only changed tiles.
+ * Falls back to polling when the browser or the server can't keep a stream open.
+ */
+function startDashboardStream() {
+    stopDashboardStream();
+    stopDashboardPolling();
+    
+    if (typeof EventSource === 'undefined') {
+        startDashboardPolling(30000);
+        return;
+    }
+    
+    console.log('Starting dashboard stream');
+    dashboardEventSource = new EventSource('/api/dashboard/stream/');
+    
+    dashboardEventSource.addEventListener('dashboard', (event) => {
+        applyDashboardData(JSON.parse(event.data));
+    });
+    
+    dashboardEventSource.addEventListener('tiles', (event) => {
+        if (!currentDashboardData) {
+            return;
+        }
+        applyDashboardData({ ...currentDashboardData, ...JSON.parse(event.data) });
+    });
+    
+    dashboardEventSource.onerror = () => {
+        // EventSource reconnects by itself unless the server refused the stream
+        if (dashboardEventSource.readyState === EventSource.CLOSED) {
+            console.warn('Dashboard stream closed, falling back to polling');
+            stopDashboardStream();
+            startDashboardPolling(30000);
+        }
+    };
+}
+
+/**
+ * Stop live dashboard updates
+ */
+function stopDashboardStream() {
+    if (dashboardEventSource) {
+        console.log('Stopping dashboard stream');
+        dashboardEventSource.close();
+        dashboardEventSource = null;
+    }
+}
+
 /**
  * Start automatic dashboard polling
  * @param {number} interval - Polling interval in milliseconds (default: 30000ms = 30sec)
@@ -8,7 +8,10 @@ function showChatView() {
     leftSidebar.classList.remove('hidden'); // Показываем левый сайдбар в режиме чата
     updateSidebarActiveState('archie');
     
-    // Stop dashboard polling when leaving dashboard
+    // Stop dashboard updates when leaving dashboard
+    if (typeof stopDashboardStream === 'function') {
+        stopDashboardStream();
+    }
     if (typeof stopDashboardPolling === 'function') {
         stopDashboardPolling();
     }
@@ -22,9 +25,9 @@ function showDashboardView() {
     leftSidebar.classList.add('hidden'); // Скрываем левый сайдбар в режиме дашборда
     updateSidebarActiveState('home');
     
-    // Start dashboard polling when showing dashboard
-    if (typeof startDashboardPolling === 'function') {
-        startDashboardPolling(30000); // Poll every 30 seconds
+    // Start live dashboard updates when showing dashboard
+    if (typeof startDashboardStream === 'function') {
+        startDashboardStream(); // Falls back to polling every 30 seconds
     }
 }
 
@@ -94,7 +97,7 @@ document.addEventListener('DOMContentLoaded', () => {
         } else if (category === 'home') {
             e.preventDefault();
             
-            // Show dashboard view - will trigger updateDashboard() via startDashboardPolling
+            // Show dashboard view - will open the dashboard stream via startDashboardStream
             showDashboardView();
         } else if (category === 'light' || category === 'climate' || category === 'music' || category === 'documents') {
             e.preventDefault();
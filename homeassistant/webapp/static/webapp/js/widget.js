@@ -70,6 +70,79 @@ async function setLightRGB(deviceId, red, green, blue) {
     }
 }
 
+async function setLightMusicMode(deviceId, enabled) {
+    try {
+        const response = await fetch(`/light/api/device/${deviceId}/music/`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ enabled })
+        });
+        return await response.json();
+    } catch (error) {
+        console.error('Error switching music mode:', error);
+        return { success: false, message: error.message };
+    }
+}
+
+// Music mode streaming: lamp connects back to the server, so slider drags
+// can send 20+ updates per second without hitting the Yeelight rate limit
+const LIGHT_STREAM_INTERVAL_MS = 50;
+// Music mode stays on this long after the slider is released, so the final value goes out first
+const LIGHT_MUSIC_RELEASE_DELAY_MS = 1000;
+const musicModeDevices = new Set();
+const musicModeRequests = new Map();
+const musicModeReleaseTimers = new Map();
+
+async function ensureLightMusicMode(deviceId) {
+    clearTimeout(musicModeReleaseTimers.get(deviceId));
+    musicModeReleaseTimers.delete(deviceId);
+    if (musicModeDevices.has(deviceId) || musicModeRequests.has(deviceId)) return;
+    const request = setLightMusicMode(deviceId, true);
+    musicModeRequests.set(deviceId, request);
+    const result = await request;
+    musicModeRequests.delete(deviceId);
+    // Stream only once the server confirmed the lamp is in music mode
+    if (result.success) {
+        musicModeDevices.add(deviceId);
+    } else {
+        console.error('Music mode failed:', result.message);
+    }
+}
+
+function releaseLightMusicMode(deviceId) {
+    clearTimeout(musicModeReleaseTimers.get(deviceId));
+    musicModeReleaseTimers.set(deviceId, setTimeout(async () => {
+        musicModeReleaseTimers.delete(deviceId);
+        await musicModeRequests.get(deviceId);
+        if (!musicModeDevices.delete(deviceId)) return;
+        const result = await setLightMusicMode(deviceId, false);
+        if (!result.success) {
+            console.error('Music mode release failed:', result.message);
+        }
+    }, LIGHT_MUSIC_RELEASE_DELAY_MS));
+}
+
+function createLightStreamer(send) {
+    let pendingArgs = null;
+    let timer = null;
+    return (...args) => {
+        pendingArgs = args;
+        if (timer) return;
+        timer = setTimeout(() => {
+            timer = null;
+            send(...pendingArgs);
+        }, LIGHT_STREAM_INTERVAL_MS);
+    };
+}
+
+function hexToRgb(hexColor) {
+    return [
+        parseInt(hexColor.slice(1, 3), 16),
+        parseInt(hexColor.slice(3, 5), 16),
+        parseInt(hexColor.slice(5, 7), 16)
+    ];
+}
+
 function transformApiDeviceToWidget(apiDevice) {
     const isOn = apiDevice.is_on;
     const hasRgbColor = apiDevice.rgb_color && apiDevice.rgb_color !== '#ffffff';
@@ -650,13 +723,26 @@ function renderLightWidget(data) {
         });
     });
     
+    // Stream intermediate values while dragging (music mode, fire-and-forget)
+    container.querySelectorAll('.brightness-slider, .colortemp-slider, .rgb-picker').forEach(input => {
+        input.addEventListener('pointerdown', () => ensureLightMusicMode(input.dataset.deviceId));
+        // Interaction over: turn music mode off so the lamp reports its state again
+        ['pointerup', 'pointercancel', 'change'].forEach(type => {
+            input.addEventListener(type, () => releaseLightMusicMode(input.dataset.deviceId));
+        });
+    });
+
     // Add change handlers for brightness sliders
     container.querySelectorAll('.brightness-slider').forEach(slider => {
         let debounceTimer;
+        const streamBrightness = createLightStreamer(setLightBrightness);
         slider.addEventListener('input', (e) => {
             // Update visual value immediately
             const valueSpan = slider.parentElement.querySelector('.brightness-value');
             if (valueSpan) valueSpan.textContent = `${slider.value}%`;
+            if (musicModeDevices.has(slider.dataset.deviceId)) {
+                streamBrightness(slider.dataset.deviceId, parseInt(slider.value));
+            }
         });
         slider.addEventListener('change', async (e) => {
             clearTimeout(debounceTimer);
@@ -675,6 +761,12 @@ function renderLightWidget(data) {
     // Add change handlers for color temperature sliders
     container.querySelectorAll('.colortemp-slider').forEach(slider => {
         let debounceTimer;
+        const streamColorTemp = createLightStreamer(setLightColorTemp);
+        slider.addEventListener('input', (e) => {
+            if (musicModeDevices.has(slider.dataset.deviceId)) {
+                streamColorTemp(slider.dataset.deviceId, parseInt(slider.value));
+            }
+        });
         slider.addEventListener('change', async (e) => {
             clearTimeout(debounceTimer);
             debounceTimer = setTimeout(async () => {
@@ -691,14 +783,17 @@ function renderLightWidget(data) {
     
     // Add change handlers for RGB color pickers
     container.querySelectorAll('.rgb-picker').forEach(picker => {
+        const streamRGB = createLightStreamer(setLightRGB);
+        picker.addEventListener('input', (e) => {
+            if (musicModeDevices.has(picker.dataset.deviceId)) {
+                streamRGB(picker.dataset.deviceId, ...hexToRgb(picker.value));
+            }
+        });
         picker.addEventListener('change', async (e) => {
             const deviceId = picker.dataset.deviceId;
-            const hexColor = picker.value;
             
             // Convert hex to RGB
-            const r = parseInt(hexColor.slice(1, 3), 16);
-            const g = parseInt(hexColor.slice(3, 5), 16);
-            const b = parseInt(hexColor.slice(5, 7), 16);
+            const [r, g, b] = hexToRgb(picker.value);
             
             const result = await setLightRGB(deviceId, r, g, b);
             if (!result.success) {
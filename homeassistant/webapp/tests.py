@@ -1,3 +1,319 @@
-from django.test import TestCase
+import json
+import threading
+import time
+from unittest import skipIf
+from unittest.mock import patch
 
-# Create your tests here.
+from archie_shared.user.models import UserState
+from django.contrib.auth.models import User
+from django.test import SimpleTestCase, TestCase
+
+from homeassistant import device_events
+from homeassistant.async_redis_client import AsyncRedisClient
+from homeassistant.device_events import DeviceEventLog
+from homeassistant.redis_client import RedisClient
+
+from .polling import Poller, PollingEngine, get_active_user_names
+from .views_dashboard import (
+    _dashboard_events,
+    _dashboard_patch,
+    _is_for_user,
+    _iterate_in_loop,
+)
+
+try:
+    import fakeredis
+    import lupa  # noqa: F401
+except ImportError:
+    fakeredis = None
+
+
+class PollingEngineTest(SimpleTestCase):
+    def setUp(self):
+        self.engine = PollingEngine(users_provider=lambda: ["Niko"], workers=4)
+        self.release = threading.Event()
+        self.addCleanup(self.release.set)
+
+    def run_engine(self, seconds: float):
+        deadline = time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            time.sleep(min(self.engine.tick(), 0.01))
+
+    def test_hung_source_does_not_stall_others(self):
+        calls = {"fast": 0, "hung": 0}
+
+        def fast(user_names):
+            calls["fast"] += 1
+            return True
+
+        def hung(user_names):
+            calls["hung"] += 1
+            self.release.wait(5)
+            return True
+
+        self.engine.register(Poller("fast", fast, interval=0.02))
+        self.engine.register(Poller("hung", hung, interval=0.02, timeout=0.1))
+
+        self.run_engine(0.4)
+
+        status = self.engine.get_status()
+        self.assertGreater(calls["fast"], 5)
+        self.assertEqual(calls["hung"], 1)
+        self.assertEqual(status["hung"]["failures"], 1)
+        self.assertTrue(status["hung"]["running"])
+        self.assertLess(status["fast"]["age"], 0.1)
+        self.assertIsNone(status["hung"]["age"])
+
+    def test_failures_back_off_exponentially(self):
+        poller = Poller("light", lambda user_names: False, interval=10, max_backoff=50)
+
+        delays = []
+        for _ in range(4):
+            poller.schedule_next(0, None)
+            delays.append(poller.next_run)
+        poller.schedule_next(0, 1)
+
+        self.assertEqual(delays, [20, 40, 50, 50])
+        self.assertEqual((poller.failures, poller.next_run), (0, 10))
+
+    def test_long_failure_streak_stays_at_max_backoff(self):
+        poller = Poller("light", None, interval=10.0, max_backoff=50.0)
+
+        for _ in range(2000):
+            poller.schedule_next(0, None)
+
+        self.assertEqual((poller.failures, poller.next_run), (2000, 50))
+
+    def test_cadence_adapts_to_activity_and_change_rate(self):
+        poller = Poller("light", None, interval=30, fast_interval=2, max_interval=300)
+
+        delays = []
+        for changed in (0, 0, 0, 0, 0):
+            poller.schedule_next(0, changed)
+            delays.append(poller.next_run)
+        poller.schedule_next(0, 0, active=True)
+        delays.append(poller.next_run)
+        poller.schedule_next(0, 2)
+        delays.append(poller.next_run)
+
+        self.assertEqual(delays, [60, 120, 240, 300, 300, 2, 30])
+
+    def test_long_stable_streak_stays_at_max_interval(self):
+        poller = Poller("light", None, interval=30.0, max_interval=300.0)
+
+        for _ in range(2000):
+            poller.schedule_next(0, 0)
+
+        self.assertEqual(poller.next_run, 300)
+
+    def test_activity_cuts_backoff_short(self):
+        calls = []
+        self.engine.register(
+            Poller(
+                "light",
+                lambda user_names: calls.append(time.monotonic()) or 0,
+                interval=60,
+            )
+        )
+        self.run_engine(0.05)
+
+        self.engine.request_activity()
+        self.run_engine(0.05)
+
+        self.assertEqual(len(calls), 2)
+
+    def test_exception_counts_as_failure(self):
+        def broken(user_names):
+            raise ConnectionError("bulb unreachable")
+
+        self.engine.register(Poller("broken", broken, interval=0.01))
+
+        self.run_engine(0.1)
+
+        self.assertGreaterEqual(self.engine.get_status()["broken"]["failures"], 1)
+
+
+class ActiveUsersTest(TestCase):
+    def test_only_active_users_with_profiles_are_polled(self):
+        from .models import UserProfile
+
+        for username, is_active in (("niko", True), ("anna", True), ("old", False)):
+            user = User.objects.create(username=username, is_active=is_active)
+            UserProfile.objects.create(
+                user=user, user_name="Niko" if username == "niko" else ""
+            )
+        User.objects.create(username="no_profile")
+
+        self.assertEqual(sorted(get_active_user_names()), ["Niko", "anna"])
+
+    @skipIf(fakeredis is None, "fakeredis with lupa (Lua scripting) is not installed")
+    def test_profile_synced_user_receives_polled_state(self):
+        from .models import UserProfile
+
+        redis = fakeredis.FakeRedis(decode_responses=True)
+        storage = RedisClient(redis)
+        publisher = device_events.AggregatePublisher("climate", "smarthome_climate")
+        with patch("homeassistant.redis_client.redis_client", storage), patch.object(
+            device_events, "device_event_log", DeviceEventLog(redis)
+        ):
+            # The profile sync is the only writer that creates the state
+            UserProfile.objects.create(
+                user=User.objects.create(username="niko"), user_name="Niko"
+            )
+            version = publisher.publish({"devices": []}, get_active_user_names())
+            repeated = publisher.publish({"devices": []}, get_active_user_names())
+
+        self.assertEqual(
+            storage.get_user_field("Niko", "smarthome_climate"),
+            {"devices": [], "version": version},
+        )
+        self.assertIsNone(repeated)
+
+
+class DashboardStreamTest(SimpleTestCase):
+    def test_patch_holds_only_changed_tiles(self):
+        old = {"light": {"subtitle": "0 of 2 on"}, "climate": {"subtitle": "21°C"}}
+        new = {"light": {"subtitle": "1 of 2 on"}, "climate": {"subtitle": "21°C"}}
+
+        self.assertEqual(
+            _dashboard_patch(old, new), ("tiles", {"light": {"subtitle": "1 of 2 on"}})
+        )
+        self.assertIsNone(_dashboard_patch(new, dict(new)))
+        self.assertEqual(
+            _dashboard_patch(old, {"light": {}}), ("dashboard", {"light": {}})
+        )
+
+    @skipIf(fakeredis is None, "fakeredis with lupa (Lua scripting) is not installed")
+    def test_stream_sends_dashboard_then_changed_tiles(self):
+        server = fakeredis.FakeServer()
+        sync_redis = fakeredis.FakeRedis(server=server, decode_responses=True)
+        client = RedisClient(sync_redis)
+        client.set_user_state("Niko", UserState(user_id="1"))
+
+        with patch.object(
+            device_events, "device_event_log", DeviceEventLog(sync_redis)
+        ), patch.object(
+            AsyncRedisClient,
+            "_client_factory",
+            lambda _: fakeredis.FakeAsyncRedis(server=server, decode_responses=True),
+        ):
+            frames = _iterate_in_loop(_dashboard_events("Niko"))
+            first = next(frames)
+            client.update_user_state(
+                "Niko",
+                {"smarthome_light": {"devices": [], "on_count": 1, "total_count": 2}},
+            )
+            sync_redis.publish(
+                device_events.UPDATES_CHANNEL, json.dumps({"class": "light"})
+            )
+            second = next(frames)
+            with self.assertLogs("homeassistant.webapp.views_dashboard") as logs:
+                frames.close()
+
+        self.assertIn("event: dashboard", first)
+        event, data = second.split("\n", 1)
+        tiles = json.loads(data.removeprefix("data: "))
+        self.assertEqual(event, "event: tiles")
+        self.assertEqual(list(tiles), ["light"])
+        self.assertEqual(tiles["light"]["subtitle"], "1 of 2 on")
+        self.assertIn("dashboard_010", logs.output[-1])
+
+    def test_stream_skips_other_users_dashboard_saves(self):
+        def message(**data):
+            return {"data": json.dumps(data)}
+
+        self.assertTrue(_is_for_user(message(**{"class": "light"}), "Niko"))
+        self.assertTrue(
+            _is_for_user(message(**{"class": "dashboard", "user": "Niko"}), "Niko")
+        )
+        self.assertFalse(
+            _is_for_user(message(**{"class": "dashboard", "user": "Anna"}), "Niko")
+        )
+
+    def test_streams_past_the_thread_cap_fall_back_to_polling(self):
+        async def events(user_name):
+            yield "retry: 3000\n"
+
+        slots = threading.BoundedSemaphore(1)
+        with patch(
+            "homeassistant.webapp.views_dashboard.wsgi_stream_slots", slots
+        ), patch("homeassistant.webapp.views_dashboard._dashboard_events", events):
+            served = self.client.get("/api/dashboard/stream/")
+            refused = self.client.get("/api/dashboard/stream/")
+            frames = list(served.streaming_content)
+            served.close()
+            reopened = self.client.get("/api/dashboard/stream/")
+
+        self.assertEqual((served.status_code, refused.status_code), (200, 503))
+        self.assertEqual(frames, [b"retry: 3000\n"])
+        self.assertEqual(reopened.status_code, 200)
+
+
+@skipIf(fakeredis is None, "fakeredis with lupa (Lua scripting) is not installed")
+class DashboardConditionalGetTest(SimpleTestCase):
+    def setUp(self):
+        self.redis = fakeredis.FakeRedis(decode_responses=True)
+        self.log = DeviceEventLog(self.redis)
+        client = RedisClient(self.redis)
+        client.set_user_state("Niko", UserState(user_id="1"))
+        for patcher in (
+            patch.object(device_events, "device_event_log", self.log),
+            patch("homeassistant.webapp.views_dashboard.device_event_log", self.log),
+            patch.object(
+                device_events,
+                "activity_tracker",
+                device_events.ActivityTracker(self.redis),
+            ),
+            patch("homeassistant.webapp.views_dashboard.redis_client", client),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_unchanged_dashboard_is_answered_with_304(self):
+        first = self.client.get("/api/dashboard/")
+
+        with patch(
+            "homeassistant.webapp.views_dashboard._load_dashboard_state"
+        ) as load:
+            second = self.client.get(
+                "/api/dashboard/", HTTP_IF_NONE_MATCH=first["ETag"]
+            )
+        self.log.next_version("dashboard:Niko")
+        third = self.client.get("/api/dashboard/", HTTP_IF_NONE_MATCH=first["ETag"])
+
+        self.assertEqual(first.status_code, 200)
+        self.assertRegex(first["ETag"], r'^"[0-9a-f]{8}-0-0-0"$')
+        self.assertEqual(second.status_code, 304)
+        self.assertEqual(second.content, b"")
+        load.assert_not_called()
+        self.assertEqual(third.status_code, 200)
+        self.assertEqual(third["ETag"], first["ETag"].replace('-0"', '-1"'))
+
+    def test_fallback_dashboard_is_sent_without_etag(self):
+        fallback = self.client.get("/api/dashboard/", {"user_name": "Anna"})
+        RedisClient(self.redis).merge_user_states({"Anna": {"user_id": "2"}})
+
+        created = self.client.get("/api/dashboard/", {"user_name": "Anna"})
+
+        self.assertEqual(fallback.status_code, 200)
+        self.assertNotIn("ETag", fallback)
+        self.assertEqual(created.status_code, 200)
+        self.assertIn("ETag", created)
+
+    def test_etag_is_per_user(self):
+        RedisClient(self.redis).set_user_state("Anna", UserState(user_id="2"))
+        niko = self.client.get("/api/dashboard/", {"user_name": "Niko"})
+        self.log.next_version("dashboard:Anna")
+
+        anna = self.client.get(
+            "/api/dashboard/",
+            {"user_name": "Anna"},
+            HTTP_IF_NONE_MATCH=niko["ETag"],
+        )
+        again = self.client.get(
+            "/api/dashboard/", {"user_name": "Niko"}, HTTP_IF_NONE_MATCH=niko["ETag"]
+        )
+
+        self.assertEqual(anna.status_code, 200)
+        self.assertNotEqual(anna["ETag"], niko["ETag"])
+        self.assertEqual(again.status_code, 304)
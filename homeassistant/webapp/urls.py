@@ -1,8 +1,14 @@
 from django.urls import path
 
-from .views import (IndexView, LoginPageView, get_profile_choices,
-                    get_user_profile, logout_view, update_user_profile)
-from .views_dashboard import dashboard_action, dashboard_initial
+from .views import (
+    IndexView,
+    LoginPageView,
+    get_profile_choices,
+    get_user_profile,
+    logout_view,
+    update_user_profile,
+)
+from .views_dashboard import dashboard_action, dashboard_initial, dashboard_stream
 
 urlpatterns = [
     path("", IndexView.as_view(), name="index"),
@@ -13,4 +19,5 @@ urlpatterns = [
     path("api/profile/choices/", get_profile_choices, name="get_profile_choices"),
     path("api/dashboard/", dashboard_initial, name="dashboard_initial"),
     path("api/dashboard/action/", dashboard_action, name="dashboard_action"),
+    path("api/dashboard/stream/", dashboard_stream, name="dashboard_stream"),
 ]
@@ -1,12 +1,39 @@
+import asyncio
+import hashlib
 import json
 import logging
-
-from django.http import HttpResponse, JsonResponse
+import threading
+
+from archie_shared.user.models import UserState
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.test import RequestFactory
+from django.utils.cache import get_conditional_response
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 
+from homeassistant.ai_assistant.views import proxy_chat
+from homeassistant.async_redis_client import AsyncRedisClient
+from homeassistant.device_events import (
+    UPDATES_CHANNEL,
+    device_event_log,
+    mark_activity,
+    notify_update,
+)
+from homeassistant.light.scenes import find_scene
+from homeassistant.redis_client import redis_client
+
 logger = logging.getLogger(__name__)
 
+# A comment line this often keeps proxies from closing an idle stream
+STREAM_KEEPALIVE = 15
+# Updates published within this window are folded into one rebuild
+STREAM_COALESCE = 0.05
+
+# Every stream served under WSGI holds a worker thread for as long as it is open
+wsgi_stream_slots = threading.BoundedSemaphore(settings.DASHBOARD_STREAM_MAX_THREADS)
+
 
 def _get_fallback_dashboard():
     """Return fallback dashboard when Redis is empty"""
@@ -96,7 +123,10 @@ def add_cors_headers(response):
     """Add CORS headers to response"""
     response["Access-Control-Allow-Origin"] = "*"
     response["Access-Control-Allow-Methods"] = "GET, POST, OPTIONS"
-    response["Access-Control-Allow-Headers"] = "Content-Type, Authorization"
+    response["Access-Control-Allow-Headers"] = (
+        "Content-Type, Authorization, If-None-Match"
+    )
+    response["Access-Control-Expose-Headers"] = "ETag"
     return response
 
 
@@ -105,6 +135,7 @@ def add_cors_headers(response):
 def dashboard_action(request):
     """
     Handle dashboard button clicks:
+    0. If the request matches a light scene - apply it and return current Dashboard
     1. Send request to AI agent
     2. Save full Dashboard response to Redis under smarthome_dashboard
     3. Return updated Dashboard to frontend
@@ -127,7 +158,16 @@ def dashboard_action(request):
             f"dashboard_002: User \033[36m{user_name}\033[0m requested: \033[33m{assistant_request}\033[0m"
         )
 
-        from homeassistant.ai_assistant.views import proxy_chat
+        # Buttons bound to a light scene are applied directly, skipping the AI agent
+        scene = find_scene(assistant_request)
+        if scene:
+            results = scene.apply()
+            mark_activity(command=True)
+            logger.info(
+                f"dashboard_008: Applied scene \033[35m{scene.name}\033[0m to \033[33m{sum(results.values())}/{len(results)}\033[0m devices without AI"
+            )
+            json_response = JsonResponse(_load_dashboard(user_name))
+            return add_cors_headers(json_response)
 
         # Build ChatRequest for AI agent
         chat_request = {
@@ -139,8 +179,6 @@ def dashboard_action(request):
             "previous_message_id": None,
         }
 
-        from django.test import RequestFactory
-
         factory = RequestFactory()
         chat_request_obj = factory.post(
             "/ai-assistant/api/chat/",
@@ -160,11 +198,15 @@ def dashboard_action(request):
             raise ValueError("AI agent did not return dashboard")
 
         # Save full Dashboard to Redis
-        from homeassistant.redis_client import redis_client
-
-        redis_client.update_user_state(
+        saved = redis_client.update_user_state(
             user_name, {"smarthome_dashboard": dashboard}, ttl=None
         )
+        if saved:
+            notify_update(
+                "dashboard",
+                device_event_log.next_version(_get_dashboard_version_class(user_name)),
+                user_name=user_name,
+            )
         logger.info(
             f"dashboard_004: Saved AI dashboard to Redis for user \033[36m{user_name}\033[0m"
         )
@@ -183,8 +225,10 @@ def dashboard_action(request):
 def dashboard_initial(request):
     """
     Get dashboard state from Redis:
+    0. If If-None-Match matches the user's light, climate and dashboard versions - return 304
     1. If smarthome_dashboard exists (from AI) - use it with updated device states
     2. If not - build default dashboard from device states only
+    3. If the user state is missing - fallback dashboard, sent without an ETag
     """
     logger.info("dashboard_005: Fetching dashboard state from Redis")
 
@@ -194,41 +238,28 @@ def dashboard_initial(request):
 
     try:
         user_name = request.GET.get("user_name", "Niko")
-
-        from homeassistant.redis_client import redis_client
-
-        user_state_obj = redis_client.get_user_state_by_name(user_name)
-
-        if not user_state_obj:
-            logger.warning(
-                f"dashboard_warning_001: No user state in Redis for \033[36m{user_name}\033[0m, using fallback"
-            )
-            dashboard = _get_fallback_dashboard()
-            json_response = JsonResponse(dashboard)
-            return add_cors_headers(json_response)
-
-        user_state = user_state_obj.model_dump()
-
-        # Check if AI agent has saved a dashboard
-        saved_dashboard = user_state.get("smarthome_dashboard")
-
-        if saved_dashboard:
-            # Update device states in saved dashboard
-            logger.info(
-                "dashboard_006: Using saved AI dashboard, updating device states"
-            )
-            dashboard = _update_dashboard_devices(saved_dashboard, user_state)
-        else:
-            # Build default dashboard from device states
-            logger.info(
-                "dashboard_006: No saved dashboard, building from device states"
-            )
-            dashboard = _build_dashboard_from_devices(user_state)
+        # Heartbeat: pollers refresh devices every few seconds while the dashboard is open;
+        # debounced, so conditional polls write to Redis once per window at most
+        mark_activity()
+        # Read before the state: a write in between only costs one more full response
+        etag = _get_dashboard_etag(user_name)
+        if etag:
+            not_modified = get_conditional_response(request, etag=etag)
+            if not_modified:
+                return add_cors_headers(not_modified)
+
+        user_state = _load_dashboard_state(user_name)
+        dashboard = _render_dashboard(user_name, user_state)
 
         logger.info(
             f"dashboard_007: Returning dashboard for user \033[36m{user_name}\033[0m"
         )
         json_response = JsonResponse(dashboard)
+        # The fallback has no version of its own: a state created later without a
+        # dashboard version bump (profile sync) must still reach the browser
+        if etag and user_state:
+            json_response["ETag"] = etag
+            json_response["Cache-Control"] = "no-cache"
         return add_cors_headers(json_response)
 
     except Exception as e:
@@ -237,6 +268,180 @@ def dashboard_initial(request):
         return add_cors_headers(error_response)
 
 
+def _get_dashboard_version_class(user_name: str) -> str:
+    """Version counter of a user's saved dashboard, device_version:dashboard:{user}"""
+    return f"dashboard:{user_name}"
+
+
+def _get_dashboard_etag(user_name: str) -> str | None:
+    """ETag from the user, the published light and climate and their saved dashboard versions"""
+    dashboard_class = _get_dashboard_version_class(user_name)
+    try:
+        versions = device_event_log.get_versions("light", "climate", dashboard_class)
+    except Exception as e:
+        logger.error(f"dashboard_error_005: Failed to read dashboard versions: {e}")
+        return None
+    # Hashed: user names may hold characters a header can't carry
+    user_tag = hashlib.blake2b(user_name.encode(), digest_size=4).hexdigest()
+    return f'"{user_tag}-{versions["light"]}-{versions["climate"]}-{versions[dashboard_class]}"'
+
+
+@csrf_exempt
+@require_http_methods(["GET", "OPTIONS"])
+def dashboard_stream(request):
+    """
+    Server-Sent Events stream of the dashboard:
+    1. "dashboard" event with the full dashboard on connect
+    2. "tiles" event with only the changed top-level tiles on every published update
+    """
+    if request.method == "OPTIONS":
+        response = HttpResponse()
+        return add_cors_headers(response)
+
+    user_name = request.GET.get("user_name", "Niko")
+    # ASGI serves the stream on the event loop, a WSGI worker thread drives its own loop
+    wsgi = not isinstance(request, ASGIRequest)
+    if wsgi and not wsgi_stream_slots.acquire(blocking=False):
+        # The browser treats the refusal as final and polls /api/dashboard/ instead
+        logger.info(
+            f"dashboard_011: Stream limit reached, user \033[36m{user_name}\033[0m falls back to polling"
+        )
+        response = HttpResponse(status=503)
+        response["Retry-After"] = str(STREAM_KEEPALIVE)
+        return add_cors_headers(response)
+
+    logger.info(
+        f"dashboard_009: Opening dashboard stream for user \033[36m{user_name}\033[0m"
+    )
+    events = _dashboard_events(user_name)
+    if wsgi:
+        events = _iterate_in_loop(events, on_close=wsgi_stream_slots.release)
+    response = StreamingHttpResponse(events, content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"
+    return add_cors_headers(response)
+
+
+def _format_event(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def _dashboard_patch(old: dict, new: dict) -> tuple[str, dict] | None:
+    """Event for the browser: changed tiles, full dashboard if the layout changed"""
+    if old.keys() != new.keys():
+        return "dashboard", new
+    tiles = {key: value for key, value in new.items() if old[key] != value}
+    return ("tiles", tiles) if tiles else None
+
+
+async def _dashboard_events(user_name: str):
+    """Rebuilds the dashboard on devices:updates messages, yields SSE frames"""
+    # Own client per stream: the stream may outlive the loop of the shared one
+    storage = AsyncRedisClient()
+    pubsub = storage.redis_client.pubsub(ignore_subscribe_messages=True)
+    try:
+        await pubsub.subscribe(UPDATES_CHANNEL)
+        # Consumes the subscribe confirmation, which comes back as None
+        await pubsub.get_message(timeout=STREAM_KEEPALIVE)
+        # Open stream counts as dashboard activity, pollers stay on the fast cadence
+        await asyncio.to_thread(mark_activity)
+        dashboard = await _aload_dashboard(storage, user_name)
+        yield "retry: 3000\n" + _format_event("dashboard", dashboard)
+
+        while True:
+            message = await pubsub.get_message(timeout=STREAM_KEEPALIVE)
+            if message is None:
+                await asyncio.to_thread(mark_activity)
+                yield ": keepalive\n\n"
+                continue
+            relevant = _is_for_user(message, user_name)
+            while message := await pubsub.get_message(timeout=STREAM_COALESCE):
+                relevant = relevant or _is_for_user(message, user_name)
+            if not relevant:
+                # Another user's dashboard was saved, nothing to rebuild here
+                continue
+
+            fresh = await _aload_dashboard(storage, user_name)
+            patch = _dashboard_patch(dashboard, fresh)
+            dashboard = fresh
+            if patch:
+                yield _format_event(*patch)
+    finally:
+        await pubsub.aclose()
+        await storage.aclose()
+        logger.info(
+            f"dashboard_010: Closed dashboard stream for user \033[36m{user_name}\033[0m"
+        )
+
+
+def _is_for_user(message: dict, user_name: str) -> bool:
+    """Whether a devices:updates message changes this user's dashboard"""
+    try:
+        target = json.loads(message["data"]).get("user")
+    except (TypeError, ValueError, AttributeError):
+        return True
+    return target is None or target == user_name
+
+
+def _iterate_in_loop(events, on_close=None):
+    """Drives an async stream from a WSGI worker thread, one frame at a time"""
+    loop = asyncio.new_event_loop()
+    try:
+        while True:
+            try:
+                yield loop.run_until_complete(events.__anext__())
+            except StopAsyncIteration:
+                return
+    finally:
+        # Client went away: run the stream's cleanup before dropping the loop
+        try:
+            loop.run_until_complete(events.aclose())
+            loop.close()
+        finally:
+            if on_close:
+                on_close()
+
+
+async def _aload_dashboard(storage, user_name: str) -> dict:
+    """Async counterpart of _load_dashboard"""
+    user_state = await storage.get_user_fields(
+        user_name, ["user_id", *UserState.LAZY_FIELDS]
+    )
+    return _render_dashboard(user_name, user_state)
+
+
+def _load_dashboard_state(user_name: str) -> dict:
+    """Smarthome fields of the user state, empty if the state does not exist"""
+    # Only the smarthome sub-documents are needed, user_id tells whether the state exists
+    return redis_client.get_user_fields(user_name, ["user_id", *UserState.LAZY_FIELDS])
+
+
+def _load_dashboard(user_name: str) -> dict:
+    """Dashboard from Redis with current device states, fallback if user state is empty"""
+    return _render_dashboard(user_name, _load_dashboard_state(user_name))
+
+
+def _render_dashboard(user_name: str, user_state: dict) -> dict:
+    """Dashboard from the smarthome fields of a user state"""
+    if not user_state:
+        logger.warning(
+            f"dashboard_warning_001: No user state in Redis for \033[36m{user_name}\033[0m, using fallback"
+        )
+        return _get_fallback_dashboard()
+
+    # Check if AI agent has saved a dashboard
+    saved_dashboard = user_state.get("smarthome_dashboard")
+
+    if saved_dashboard:
+        # Update device states in saved dashboard
+        logger.info("dashboard_006: Using saved AI dashboard, updating device states")
+        return _update_dashboard_devices(saved_dashboard, user_state)
+
+    # Build default dashboard from device states
+    logger.info("dashboard_006: No saved dashboard, building from device states")
+    return _build_dashboard_from_devices(user_state)
+
+
 def _update_dashboard_devices(dashboard: dict, user_state: dict) -> dict:
     """Update device lists in saved dashboard with current states from Redis"""
     light_aggregate = user_state.get("smarthome_light", {})